@@ -1,21 +1,31 @@
 #!/usr/bin/env python3
 import argparse
+import functools
 import json
 import os
 import re
-import subprocess
 import sys
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 
-import yaml
+from scripts.py.container_exec import ContainerError, for_spec, spec_worktree
+from scripts.py.fingerprints import repo_root
+from scripts.py.proc_runner import NETWORK_TIMEOUT, label, output
+from scripts.py.proc_runner import run as run_cmd
+from scripts.py.spec_docs import SpecDocError, load_tasks as load_spec_tasks
+from scripts.py.workers import build_and_test_remote, verify_remote
 
-from .llm import call_llm
+from .edits import EDIT_FORMAT_INSTRUCTIONS, EditError, apply_response
+from .ledger import ApplyLedger, trailers
+from .llm import LLMError, call_llm
+from .prompts import PromptBuilder, PromptStats
+from .speculate import speculate
+from .transplant import lookup, record as record_transplant, transplant
+from .verify import verify, verify_in
 
 
-def run(cmd: List[str], cwd: Optional[Path] = None) -> None:
-    print(f"$ {' '.join(cmd)}")
-    subprocess.run(cmd, cwd=cwd, check=True)
+def run(cmd: List[str], cwd: Optional[Path] = None, timeout: Optional[float] = None) -> None:
+    run_cmd(cmd, cwd=cwd, timeout=timeout)
 
 
 def load_tasks(spec_dir: Path) -> List[Dict]:
@@ -23,12 +33,9 @@ def load_tasks(spec_dir: Path) -> List[Dict]:
     if not y.exists():
         raise SystemExit(f"tasks.yaml not found at {y}")
     try:
-        data = yaml.safe_load(y.read_text(encoding="utf-8")) or []
-        if not isinstance(data, list):
-            raise ValueError("tasks.yaml must be a list of task objects")
-        return data
-    except Exception as e:
-        raise SystemExit(f"Failed to parse {y}: {e}")
+        return load_spec_tasks(y)
+    except SpecDocError as e:
+        raise SystemExit(str(e))
 
 
 def select_tasks(tasks: List[Dict], repo: str, task_id: Optional[str]) -> List[Dict]:
@@ -44,41 +51,68 @@ def select_tasks(tasks: List[Dict], repo: str, task_id: Optional[str]) -> List[D
     return sorted(filtered, key=sort_key)
 
 
-def llm_propose_patch(repo: str, task: Dict, worktree: Path) -> str:
-    title = task.get("title", "")
-    detail = task.get("detail", "")
-    tid = task.get("id", "T-?")
-    instructions = (
-        "You will propose a unified diff patch that applies to the repository root.\n"
-        "Respond ONLY with patch content between markers.\n"
-        "Use standard 'diff --git a/.. b/..' hunks and file headers.\n"
-        "Avoid commentary.\n"
-        "Markers:\n---PATCH START---\n<patch>\n---PATCH END---\n"
+PATCH_SYSTEM = "You are a careful code assistant that outputs precise, content-anchored file edits."
+PATCH_INSTRUCTIONS = (
+    "You will propose edits to the repository; paths are relative to the repository root.\n"
+    f"{EDIT_FORMAT_INSTRUCTIONS}\n"
+    "Respond ONLY with edit blocks between markers. Avoid commentary.\n"
+    "Markers:\n---PATCH START---\n<edit blocks>\n---PATCH END---\n"
+)
+
+
+def patch_prompt_builder(repo: str, worktree: Path, stats: Optional[PromptStats] = None) -> PromptBuilder:
+    """Shared prefix for every task in a run: system text, patch instructions and repository context."""
+    return PromptBuilder(
+        PATCH_SYSTEM,
+        f"{PATCH_INSTRUCTIONS}\nRepository: {repo}\nWorktree: {worktree}",
+        stats=stats,
     )
-    messages = [
-        {"role": "system", "content": "You are a careful code assistant that outputs correct unified diffs."},
-        {
-            "role": "user",
-            "content": (
-                f"Repository: {repo}\n"
-                f"Worktree: {worktree}\n\n"
-                f"Task {tid}: {title}\n\n{detail}\n\n"
-                f"{instructions}"
-            ),
-        },
-    ]
-    resp = call_llm(messages)
-    content = (resp or {}).get("content") or ""
+
+
+def extract_patch(content: str) -> str:
     m = re.search(r"---PATCH START---\s*(.*?)\s*---PATCH END---", content, re.DOTALL)
     if not m:
-        # fall back: try to use full content if it looks like a diff
-        if content.strip().startswith("diff --git "):
+        # fall back: use the full content if it carries edit blocks or a diff
+        if re.search(r"^(<{7} (SEARCH|FILE)|diff --git )", content, re.MULTILINE):
             return content
         raise SystemExit("LLM response did not include a patch between markers")
     return m.group(1).strip()
 
 
-def main() -> int:
+def patch_messages(repo: str, task: Dict, worktree: Path, builder: Optional[PromptBuilder] = None) -> List[Dict]:
+    title = task.get("title", "")
+    detail = task.get("detail", "")
+    tid = task.get("id", "T-?")
+    builder = builder or patch_prompt_builder(repo, worktree)
+    return builder.messages(f"Task {tid}: {title}\n\n{detail}")
+
+
+def llm_propose_patch(repo: str, task: Dict, worktree: Path, builder: Optional[PromptBuilder] = None) -> str:
+    tid = task.get("id", "T-?")
+    try:
+        resp = call_llm(patch_messages(repo, task, worktree, builder))
+    except LLMError as e:
+        raise SystemExit(f"LLM call failed for {tid}: {e}")
+    return extract_patch((resp or {}).get("content") or "")
+
+
+def try_transplant(target: Path, repo: str, entry: Dict, check: Callable[[Path, str], bool] = verify) -> bool:
+    """Apply and verify a sibling repo's patch; False (tree left clean) when the LLM is needed after all."""
+    print(f"[transplant] reusing the patch of {entry['source_repo']} {entry['source_task']}")
+    try:
+        changed = transplant(target, entry)
+    except EditError as e:
+        print(f"[transplant] does not fit this repo; falling back to the LLM.\n{e}")
+        return False
+    print(f"[edits] staged {len(changed)} file(s): {', '.join(changed)}")
+    if check(target, repo):
+        return True
+    print("[transplant] build/test failed; reverting and falling back to the LLM.")
+    run(["git", "reset", "--hard"], cwd=target)
+    return False
+
+
+def main(argv=None) -> int:
     p = argparse.ArgumentParser(description="Apply a Spec task via LLM-generated patch")
     p.add_argument("--spec", required=True)
     p.add_argument("--slug", required=True)
@@ -86,9 +120,20 @@ def main() -> int:
     p.add_argument("--branch", required=True, help="Existing branch to work on (e.g., spec/003-tiered-...)")
     p.add_argument("--task-id", default=None, help="Optional single task id (e.g., T-3)")
     p.add_argument("--base", default="main")
-    args = p.parse_args()
-
-    root = Path(__file__).resolve().parents[2]
+    p.add_argument("--target", default=None,
+                   help="Target repo checkout (default: ./target as in the workflow, or the spec worktree with --container)")
+    p.add_argument("--candidates", type=int, default=int(os.environ.get("LABLAB_CANDIDATES", "1")),
+                   help="speculative mode: request N patches and keep the first that builds and passes tests")
+    backend = p.add_mutually_exclusive_group()
+    backend.add_argument("--workers", action="store_true",
+                         help="build and test on the worker pool (LABLAB_WORKERS / configs/workers.json) instead of locally")
+    backend.add_argument("--container", nargs="?", const="", default=None, metavar="NAME",
+                         help="build and test via docker exec in the spec container (default spec-<spec>-<repo>), "
+                              "keeping its build servers and outputs warm between tasks")
+    p.add_argument("--restart", action="store_true", help="ignore the ledger and commit trailers; start from the first task")
+    args = p.parse_args(argv)
+
+    root = repo_root()
     spec_dir = root / "specs" / f"{args.spec}-{args.slug}"
     tasks = load_tasks(spec_dir)
     tasks_sel = select_tasks(tasks, args.repo, args.task_id)
@@ -96,45 +141,97 @@ def main() -> int:
         print("No tasks selected for this repo.")
         return 0
 
-    # Target repo should be checked out at ./target by the workflow
-    target = root / "target"
+    # Target repo should be checked out at ./target by the workflow (or passed by batch_apply.py); with
+    # --container it is the spec worktree the container mounts
+    if args.target:
+        target = Path(args.target).resolve()
+    else:
+        target = spec_worktree(args.spec, args.repo) if args.container is not None else root / "target"
     if not target.exists():
         raise SystemExit(f"Missing target checkout at {target}")
 
     # Ensure we are on the requested branch
-    run(["git", "fetch", "origin", args.branch], cwd=target)
+    run(["git", "fetch", "origin", args.branch], cwd=target, timeout=NETWORK_TIMEOUT)
     run(["git", "checkout", args.branch], cwd=target)
-    run(["git", "pull", "--ff-only", "origin", args.branch], cwd=target)
-
-    for task in tasks_sel:
-        tid = task.get("id", "T-?")
-        print(f"\n=== Applying {tid}: {task.get('title','')} ===")
-        patch_text = llm_propose_patch(args.repo, task, target)
-        (target / "_proposed.patch").write_text(patch_text, encoding="utf-8")
-
-        try:
-            run(["git", "apply", "--whitespace=fix", "--index", "_proposed.patch"], cwd=target)
-        except subprocess.CalledProcessError:
-            print("git apply failed; aborting this task.")
-            return 1
+    run(["git", "pull", "--ff-only", "origin", args.branch], cwd=target, timeout=NETWORK_TIMEOUT)
+
+    ledger = ApplyLedger(args.spec, args.repo, args.branch)
+    if args.restart:
+        ledger.reset()
+    done = {} if args.restart else ledger.completed(target)
+    pending = [t for t in tasks_sel if str(t.get("id")) not in done]
+    for tid in sorted(set(str(t.get("id")) for t in tasks_sel) & set(done)):
+        print(f"[ledger] {tid} already applied in {done[tid][:12]}; skipping")
+    if not pending:
+        print("All selected tasks are already applied.")
+        return 0
 
-        # Build and test for .NET repos (best-effort; skip if no solution found)
+    builder = patch_prompt_builder(args.repo, target)
+    # Build/test here, in the spec container, or on the least-loaded worker host
+    check = verify_remote if args.workers else verify
+    if args.container is not None:
         try:
-            run(["dotnet", "restore"], cwd=target)
-            run(["dotnet", "build", "--configuration", "Release", "--no-restore"], cwd=target)
-            run(["dotnet", "test", "--configuration", "Release", "--no-build", "--verbosity", "minimal"], cwd=target)
-        except subprocess.CalledProcessError:
-            print("Build/test failed; reverting staged changes for this task.")
-            run(["git", "reset", "--hard"], cwd=target)
-            return 1
-
-        # Commit and push
-        msg = f"spec({args.spec}): {tid} apply task via agent"
-        run(["git", "add", "."], cwd=target)
-        run(["git", "-c", "user.name=automation-bot", "-c", "user.email=automation-bot@example.com",
-             "commit", "-m", msg], cwd=target)
-        run(["git", "push", "origin", args.branch], cwd=target)
-
+            box = for_spec(args.spec, args.repo, target, name=args.container or None)
+        except ContainerError as e:
+            raise SystemExit(f"--container: {e}")
+        print(f"[container] building in {box.name}:{box.workdir}")
+        check = functools.partial(verify_in, box)
+    for task in pending:
+        with label(f"{args.repo} {task.get('id', 'T-?')}"):
+            tid = task.get("id", "T-?")
+            print(f"\n=== Applying {tid}: {task.get('title','')} ===")
+            ledger.mark(tid, "applying")
+            # An equivalent task already applied in a sibling repo is transplanted before asking the LLM
+            entry = lookup(args.spec, args.repo, task)
+            if entry and try_transplant(target, args.repo, entry, check):
+                patch_text = entry["patch"]
+            else:
+                if args.candidates > 1:
+                    # Candidates were applied, built and tested in their own worktrees; the winner is replayed here
+                    # Candidates build on the worker pool with --workers; the spec container does not mount
+                    # their worktrees, so with --container they build on the host and the winner is re-checked
+                    patch_text = speculate(patch_messages(args.repo, task, target, builder), extract_patch, target,
+                                           args.repo, args.candidates, label=f"{args.repo} {tid}",
+                                           check=build_and_test_remote if args.workers else None)
+                    if patch_text is None:
+                        print(f"No candidate out of {args.candidates} applied, built and passed tests; aborting this task.")
+                        ledger.mark(tid, "failed", error="no passing candidate")
+                        return 1
+                else:
+                    try:
+                        patch_text = llm_propose_patch(args.repo, task, target, builder)
+                    except SystemExit as e:
+                        ledger.mark(tid, "failed", error=str(e))
+                        raise
+
+                # Edit blocks (or a unified diff) are matched on content in memory, then staged in one step
+                try:
+                    changed = apply_response(target, patch_text)
+                except EditError as e:
+                    print(f"Edits did not apply; aborting this task.\n{e}")
+                    ledger.mark(tid, "failed", error=str(e))
+                    return 1
+                print(f"[edits] staged {len(changed)} file(s): {', '.join(changed)}")
+
+                # Build and test for .NET repos (build cache + balanced test shards; non-.NET repos pass).
+                # A speculative winner was already checked on the chosen backend, except with --container
+                if (args.candidates <= 1 or args.container is not None) and not check(target, args.repo):
+                    print("Build/test failed; reverting staged changes for this task.")
+                    run(["git", "reset", "--hard"], cwd=target)
+                    ledger.mark(tid, "failed", error="build/test failed")
+                    return 1
+
+            # Commit and push what the edits/transplant staged; untracked files in the worktree (specctl's
+            # docker-compose.yml, build leftovers) are never swept in
+            msg = f"spec({args.spec}): {tid} apply task via agent"
+            run(["git", "-c", "user.name=automation-bot", "-c", "user.email=automation-bot@example.com",
+                 "commit", "-m", msg, "-m", trailers(args.spec, tid)], cwd=target)
+            run(["git", "push", "origin", args.branch], cwd=target, timeout=NETWORK_TIMEOUT)
+            sha = output(["git", "rev-parse", "HEAD"], cwd=target)
+            ledger.mark(tid, "done", sha)
+            record_transplant(args.spec, args.repo, task, patch_text, sha)
+
+    print(builder.stats.report())
     print("\nAll selected tasks applied and pushed.")
     return 0
 
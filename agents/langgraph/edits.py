@@ -0,0 +1,309 @@
+"""
+Content-anchored edit protocol and in-memory applier.
+
+The LLM answers with edit blocks instead of line-numbered hunks:
+
+    path/to/File.cs
+    <<<<<<< SEARCH
+    exact lines currently in the file
+    =======
+    lines to put there instead
+    >>>>>>> REPLACE
+
+    path/to/New.cs
+    <<<<<<< FILE
+    entire new content of the file
+    >>>>>>> FILE
+
+Unified diffs are still accepted: each hunk becomes a search/replace of its context and removed lines,
+with the hunk's line number only used to choose between identical matches.
+
+SEARCH text is located exactly first, then ignoring indentation/trailing whitespace, then fuzzily
+(best window by difflib ratio >= LLM_EDIT_FUZZ, default 0.9). All edits are applied in memory; only
+when every block applies are files written and the index updated in one `git update-index
+--index-info` call. Failures raise EditError naming the file, the block and the closest match.
+"""
+import difflib
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+SEARCH_RE = re.compile(
+    r"^(?P<path>[^\n<>=]+?)[ \t]*\n(?:```[^\n]*\n)?<{5,9} SEARCH[ \t]*\n(?P<search>.*?)^={5,9}[ \t]*\n"
+    r"(?P<replace>.*?)^>{5,9} REPLACE[ \t]*$",
+    re.DOTALL | re.MULTILINE,
+)
+FILE_RE = re.compile(
+    r"^(?P<path>[^\n<>=]+?)[ \t]*\n(?:```[^\n]*\n)?<{5,9} FILE[ \t]*\n(?P<content>.*?)^>{5,9} FILE[ \t]*$",
+    re.DOTALL | re.MULTILINE,
+)
+HUNK_RE = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+EDIT_FORMAT_INSTRUCTIONS = (
+    "Describe every change as edit blocks, anchored on the current file content (no line numbers).\n"
+    "To change part of a file, give its path on one line, then:\n"
+    "<<<<<<< SEARCH\n<exact existing lines, enough to be unique>\n=======\n<replacement lines>\n>>>>>>> REPLACE\n"
+    "To create or fully rewrite a file, give its path on one line, then:\n"
+    "<<<<<<< FILE\n<entire file content>\n>>>>>>> FILE\n"
+    "Use several blocks for several changes. Keep SEARCH sections short but unique."
+)
+
+
+class EditError(Exception):
+    pass
+
+
+class Edit:
+    def __init__(self, path: str, search: Optional[str], replace: str, kind: str = "replace",
+                 line_hint: Optional[int] = None, block: int = 0):
+        self.path, self.search, self.replace = path.strip().strip("`"), search, replace
+        self.kind, self.line_hint, self.block = kind, line_hint, block
+
+    def __repr__(self) -> str:
+        return f"Edit({self.kind} {self.path} #{self.block})"
+
+
+def _diff_path(line: str) -> Optional[str]:
+    p = line.split(None, 1)[1].strip() if " " in line else ""
+    p = p.split("\t", 1)[0]
+    if p == "/dev/null":
+        return None
+    return p[2:] if p[:2] in ("a/", "b/") else p
+
+
+def parse_unified_diff(text: str, first_block: int = 1) -> List[Edit]:
+    edits: List[Edit] = []
+    lines = text.splitlines()
+    old_path = new_path = None
+    i, block = 0, first_block
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("--- "):
+            old_path = _diff_path(line)
+        elif line.startswith("+++ "):
+            new_path = _diff_path(line)
+            if new_path is None:
+                edits.append(Edit(old_path or "", None, "", kind="delete", block=block))
+                block += 1
+        elif HUNK_RE.match(line) and (new_path or old_path):
+            start = int(HUNK_RE.match(line).group(1))
+            old_lines, new_lines = [], []
+            i += 1
+            while i < len(lines) and not lines[i].startswith(("@@", "--- ", "diff --git ")):
+                h = lines[i]
+                if h.startswith("\\"):
+                    pass
+                elif h.startswith("-"):
+                    old_lines.append(h[1:])
+                elif h.startswith("+"):
+                    new_lines.append(h[1:])
+                else:
+                    ctx = h[1:] if h.startswith(" ") else h
+                    old_lines.append(ctx)
+                    new_lines.append(ctx)
+                i += 1
+            if new_path is not None:
+                if old_path is None:
+                    edits.append(Edit(new_path, None, "\n".join(new_lines) + "\n", kind="write", block=block))
+                else:
+                    search = "\n".join(old_lines) + "\n" if old_lines else ""
+                    edits.append(Edit(new_path, search, "\n".join(new_lines) + "\n" if new_lines else "",
+                                      line_hint=start, block=block))
+                block += 1
+            continue
+        i += 1
+    return edits
+
+
+def parse_edits(text: str) -> List[Edit]:
+    """Edits in the order they appear; SEARCH/REPLACE and FILE blocks first, else a unified diff."""
+    found: List[Tuple[int, Edit]] = []
+    for m in SEARCH_RE.finditer(text):
+        found.append((m.start(), Edit(m.group("path"), m.group("search"), m.group("replace"))))
+    for m in FILE_RE.finditer(text):
+        found.append((m.start(), Edit(m.group("path"), None, m.group("content"), kind="write")))
+    found.sort(key=lambda x: x[0])
+    edits = [e for _, e in found]
+    if not edits and re.search(r"^(diff --git |--- )", text, re.MULTILINE):
+        edits = parse_unified_diff(text)
+    for n, e in enumerate(edits, 1):
+        e.block = n
+    if not edits:
+        raise EditError("response contains no SEARCH/REPLACE blocks, FILE blocks or unified diff")
+    return edits
+
+
+def _norm(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _reindent(replace_lines: List[str], search_first: str, file_first: str) -> List[str]:
+    s_ind = search_first[: len(search_first) - len(search_first.lstrip())]
+    f_ind = file_first[: len(file_first) - len(file_first.lstrip())]
+    if f_ind.endswith(s_ind) and f_ind != s_ind:
+        extra = f_ind[: len(f_ind) - len(s_ind)]
+        return [extra + ln if ln.strip() else ln for ln in replace_lines]
+    if s_ind.endswith(f_ind) and s_ind != f_ind:
+        cut = len(s_ind) - len(f_ind)
+        return [ln[cut:] if ln[:cut].strip() == "" else ln for ln in replace_lines]
+    return replace_lines
+
+
+def _pick(starts: List[int], hint: Optional[int], what: str, edit: Edit) -> int:
+    if len(starts) == 1:
+        return starts[0]
+    if hint is not None:
+        return min(starts, key=lambda s: abs(s + 1 - hint))
+    lines = ", ".join(str(s + 1) for s in starts[:10])
+    raise EditError(f"{edit.path} block {edit.block}: SEARCH text matches {len(starts)} places ({what}) "
+                    f"at lines {lines}; add surrounding lines to make it unique")
+
+
+def apply_edit(content: str, edit: Edit, fuzz: float) -> str:
+    search = edit.search or ""
+    if not search.strip():
+        raise EditError(f"{edit.path} block {edit.block}: empty SEARCH on an existing file; use a FILE block")
+    # 1) exact substring
+    hits, pos = [], content.find(search)
+    while pos != -1:
+        hits.append(pos)
+        pos = content.find(search, pos + 1)
+    if hits:
+        line_starts = [content.count("\n", 0, h) for h in hits]
+        start = hits[line_starts.index(_pick(line_starts, edit.line_hint, "exact", edit))]
+        return content[:start] + edit.replace + content[start + len(search):]
+
+    file_lines = content.splitlines(keepends=True)
+    s_lines = search.splitlines()
+    r_lines = edit.replace.splitlines()
+    k = len(s_lines)
+    keyed = [_norm(ln) for ln in file_lines]
+    target = [_norm(ln) for ln in s_lines]
+    # 2) same lines ignoring indentation / whitespace runs
+    starts = [i for i in range(len(file_lines) - k + 1) if keyed[i:i + k] == target]
+    how = "whitespace-insensitive"
+    if not starts:
+        # 3) fuzzy: best window of k lines by similarity
+        best, best_i = 0.0, -1
+        joined = "\n".join(target)
+        sm = difflib.SequenceMatcher(autojunk=False)
+        sm.set_seq2(joined)
+        for i in range(len(file_lines) - k + 1):
+            sm.set_seq1("\n".join(keyed[i:i + k]))
+            if sm.real_quick_ratio() < fuzz or sm.quick_ratio() < fuzz:
+                continue
+            r = sm.ratio()
+            if r > best:
+                best, best_i = r, i
+        if best < fuzz:
+            raise EditError(_miss_report(edit, file_lines, s_lines))
+        starts, how = [best_i], f"fuzzy {best:.2f}"
+    i = _pick(starts, edit.line_hint, how, edit)
+    first_nonblank = next((j for j in range(k) if s_lines[j].strip()), 0)
+    new = _reindent(r_lines, s_lines[first_nonblank], file_lines[i + first_nonblank].rstrip("\r\n"))
+    eol = "\r\n" if file_lines and file_lines[0].endswith("\r\n") else "\n"
+    tail_nl = file_lines[i + k - 1].endswith(("\n", "\r\n")) if k and i + k - 1 < len(file_lines) else True
+    replacement = eol.join(new) + (eol if new and tail_nl else "")
+    return "".join(file_lines[:i]) + replacement + "".join(file_lines[i + k:])
+
+
+def _miss_report(edit: Edit, file_lines: List[str], s_lines: List[str]) -> str:
+    k = max(1, len(s_lines))
+    best, best_i = 0.0, 0
+    needle = "\n".join(_norm(s) for s in s_lines)
+    for i in range(max(1, len(file_lines) - k + 1)):
+        r = difflib.SequenceMatcher(None, "\n".join(_norm(x) for x in file_lines[i:i + k]), needle).ratio()
+        if r > best:
+            best, best_i = r, i
+    closest = "".join(file_lines[best_i:best_i + k]).rstrip()
+    return (f"{edit.path} block {edit.block}: SEARCH text not found (closest match {best:.2f} at line "
+            f"{best_i + 1}):\n--- expected\n" + "\n".join(s_lines) + "\n--- found\n" + closest)
+
+
+def _safe_path(root: Path, rel: str) -> Path:
+    p = (root / rel).resolve()
+    if p != root and root not in p.parents:
+        raise EditError(f"{rel}: path escapes the worktree")
+    if ".git" in Path(rel).parts:
+        raise EditError(f"{rel}: refusing to edit inside .git")
+    return p
+
+
+def _read(path: Path, rel: str) -> Optional[str]:
+    """File content with its line endings intact (no universal-newline translation), None if missing."""
+    if not path.is_file():
+        return None
+    try:
+        with open(path, encoding="utf-8", newline="") as f:
+            return f.read()
+    except UnicodeDecodeError as e:
+        raise EditError(f"{rel}: not a UTF-8 text file ({e.reason} at byte {e.start})")
+
+
+def plan_edits(root: Path, edits: List[Edit], fuzz: Optional[float] = None) -> Dict[str, Optional[str]]:
+    """Apply edits in memory; returns {relative path: new content or None for delete}."""
+    fuzz = float(os.environ.get("LLM_EDIT_FUZZ", "0.9")) if fuzz is None else fuzz
+    root = root.resolve()
+    state: Dict[str, Optional[str]] = {}
+    errors: List[str] = []
+    for e in edits:
+        path = _safe_path(root, e.path)
+        rel = path.relative_to(root).as_posix()
+        if rel not in state:
+            state[rel] = _read(path, rel)
+        try:
+            if e.kind == "write":
+                state[rel] = e.replace
+            elif e.kind == "delete":
+                if state[rel] is None:
+                    raise EditError(f"{rel} block {e.block}: cannot delete a file that does not exist")
+                state[rel] = None
+            elif state[rel] is None:
+                if e.search and e.search.strip():
+                    raise EditError(f"{rel} block {e.block}: file does not exist")
+                state[rel] = e.replace
+            else:
+                state[rel] = apply_edit(state[rel], e, fuzz)
+        except EditError as err:
+            errors.append(str(err))
+    if errors:
+        raise EditError("\n\n".join(errors))
+    return state
+
+
+def write_and_stage(root: Path, planned: Dict[str, Optional[str]]) -> List[str]:
+    """Write planned files and stage them with a single index update; returns the changed paths."""
+    root = root.resolve()
+    index_lines: List[str] = []
+    for rel, content in sorted(planned.items()):
+        if content is None:
+            index_lines.append(f"0 {'0' * 40}\t{rel}")
+            continue
+        sha = subprocess.run(["git", "hash-object", "-w", "--stdin", "--path", rel], cwd=root,
+                             input=content.encode("utf-8"), capture_output=True, check=True).stdout.decode().strip()
+        mode = "100755" if os.access(root / rel, os.X_OK) and (root / rel).is_file() else "100644"
+        index_lines.append(f"{mode} {sha}\t{rel}")
+    # Blobs exist before anything in the worktree changes; the index flips in one call
+    for rel, content in planned.items():
+        path = root / rel
+        if content is None:
+            if path.exists():
+                path.unlink()
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.lablab-tmp")
+        tmp.write_text(content, encoding="utf-8", newline="")
+        if path.exists():
+            shutil.copymode(path, tmp)  # keep the x bit of edited scripts
+        tmp.replace(path)
+    subprocess.run(["git", "update-index", "--add", "--remove", "--index-info"], cwd=root,
+                   input=("\n".join(index_lines) + "\n").encode("utf-8"), check=True)
+    return sorted(planned)
+
+
+def apply_response(root: Path, text: str, fuzz: Optional[float] = None) -> List[str]:
+    """Parse an LLM response, apply it in memory and stage the result; raises EditError on any miss."""
+    return write_and_stage(root, plan_edits(root, parse_edits(text), fuzz))
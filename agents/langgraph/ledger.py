@@ -0,0 +1,117 @@
+"""
+Resumable apply ledger.
+
+Per {spec, repo, branch} and task id, records the task state (applying / failed / done) and the commit
+SHA in ${LABLAB_STATE_DIR:-~/.lablab/state}/apply-ledger.sqlite. Commits made by apply_task also carry
+`Spec:` and `Spec-Task:` trailers, so the spec branch itself is a second record: a rerun on another
+machine (or after the SQLite file is gone) still sees which tasks landed, and a task whose recorded
+commit was dropped from the branch is applied again.
+"""
+import sqlite3
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from scripts.py.fingerprints import state_dir
+
+SPEC_TRAILER = "Spec"
+TASK_TRAILER = "Spec-Task"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    spec TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    sha TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (spec, repo, branch, task_id)
+)
+"""
+
+
+def trailers(spec: str, task_id: str) -> str:
+    return f"{SPEC_TRAILER}: {spec}\n{TASK_TRAILER}: {task_id}"
+
+
+def _git(args, cwd: Path) -> subprocess.CompletedProcess:
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True)
+
+
+def history_tasks(worktree: Path, spec: str) -> Dict[str, str]:
+    """Map task id -> newest commit SHA carrying this spec's trailers on HEAD's history."""
+    if _git(["rev-parse", "--is-shallow-repository"], worktree).stdout.strip() == b"true":
+        # Ledger checks need the branch's own history; blobless clones fetch commits and trees only
+        _git(["fetch", "--unshallow", "--quiet", "origin"], worktree)
+    fmt = f"%H%x1f%(trailers:key={SPEC_TRAILER},valueonly,separator=%x2c)%x1f%(trailers:key={TASK_TRAILER},valueonly,separator=%x2c)"
+    p = _git(["log", f"--format={fmt}", "HEAD"], worktree)
+    found: Dict[str, str] = {}
+    for line in p.stdout.decode("utf-8", "ignore").splitlines():
+        parts = line.split("\x1f")
+        if len(parts) != 3 or not parts[2]:
+            continue
+        sha, specs, tasks = parts
+        if spec not in {s.strip() for s in specs.split(",")}:
+            continue
+        for tid in tasks.split(","):
+            found.setdefault(tid.strip(), sha)
+    return found
+
+
+class ApplyLedger:
+    def __init__(self, spec: str, repo: str, branch: str, path: Optional[Path] = None):
+        self.spec, self.repo, self.branch = spec, repo, branch
+        self.path = path or state_dir() / "apply-ledger.sqlite"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path), timeout=30)
+        self.db.execute(SCHEMA)
+        self.db.commit()
+
+    def rows(self) -> Dict[str, Dict]:
+        cur = self.db.execute(
+            "SELECT task_id, state, sha, error FROM tasks WHERE spec=? AND repo=? AND branch=?",
+            (self.spec, self.repo, self.branch),
+        )
+        return {tid: {"state": state, "sha": sha, "error": error} for tid, state, sha, error in cur}
+
+    def mark(self, task_id: str, state: str, sha: Optional[str] = None, error: Optional[str] = None) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO tasks (spec, repo, branch, task_id, state, sha, error, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.spec, self.repo, self.branch, task_id, state, sha, error, time.time()),
+        )
+        self.db.commit()
+
+    def reset(self) -> None:
+        self.db.execute("DELETE FROM tasks WHERE spec=? AND repo=? AND branch=?", (self.spec, self.repo, self.branch))
+        self.db.commit()
+
+    def completed(self, worktree: Path) -> Dict[str, str]:
+        """Task ids that are done and still on the branch, mapped to their commit SHA.
+
+        Ledger rows whose commit is no longer in history are marked stale (and so re-applied); commits
+        with our trailers that the ledger doesn't know about are adopted as done.
+        """
+        in_history = history_tasks(worktree, self.spec)
+        done: Dict[str, str] = {}
+        for tid, row in self.rows().items():
+            if row["state"] != "done":
+                continue
+            if tid in in_history:
+                done[tid] = in_history[tid]
+            elif row["sha"] and _git(["merge-base", "--is-ancestor", row["sha"], "HEAD"], worktree).returncode == 0:
+                done[tid] = row["sha"]
+            else:
+                print(f"[ledger] {tid} was recorded as {row['sha']} but is not on {self.branch}; re-applying")
+                self.mark(tid, "stale", row["sha"])
+        for tid, sha in in_history.items():
+            if tid not in done:
+                self.mark(tid, "done", sha)
+                done[tid] = sha
+        return done
+
+    def close(self) -> None:
+        self.db.close()
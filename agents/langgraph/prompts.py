@@ -0,0 +1,141 @@
+"""
+Prompt builder for multi-task LLM calls.
+
+Messages are laid out so everything shared across tasks (system text, instructions, repository and
+spec context) forms one byte-identical prefix, and only the per-task text changes at the end. That
+lets provider-side prompt caching reuse the prefix on every call after the first.
+
+Also:
+- `dedupe_tasks` collapses tasks repeated across repos (same title + detail) into back-references.
+- Prompt tokens are measured before sending (tiktoken when installed, ~4 chars/token otherwise) and
+  trimmed to LLM_PROMPT_BUDGET tokens (0 = unlimited).
+- `PromptStats` tracks tokens sent vs. the naive layout so each run can report its savings.
+"""
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+TRUNCATION_POLICIES = ("context", "task", "error")
+
+_encoder = None
+
+
+def count_tokens(text: str) -> int:
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken  # optional
+
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text))
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, limit: int) -> str:
+    """Keep the head of `text` so it fits in `limit` tokens, with a visible marker."""
+    if limit <= 0:
+        return ""
+    total = count_tokens(text)
+    if total <= limit:
+        return text
+    marker = "\n[... truncated {n} tokens to fit prompt budget]"
+    keep = max(0, int(len(text) * (limit - count_tokens(marker)) / total))
+    while keep > 0 and count_tokens(text[:keep]) + count_tokens(marker) > limit:
+        keep = int(keep * 0.9)
+    return text[:keep] + marker.format(n=total - count_tokens(text[:keep]))
+
+
+def task_key(task: Dict) -> Tuple[str, str]:
+    norm = lambda s: " ".join(str(s or "").split()).lower()  # noqa: E731
+    return norm(task.get("title")), norm(task.get("detail"))
+
+
+def dedupe_tasks(tasks: List[Dict]) -> Tuple[List[str], int]:
+    """Render task lines, replacing repeated title/detail with a reference to the first occurrence.
+
+    Returns (lines, number_of_duplicates_collapsed).
+    """
+    seen: Dict[Tuple[str, str], str] = {}
+    lines: List[str] = []
+    dupes = 0
+    for t in tasks:
+        tid = t.get("id", "T-?")
+        head = f"- {tid} [{t.get('repo', '')}] ({t.get('stage', '')})"
+        key = task_key(t)
+        if key in seen:
+            lines.append(f"{head} same as {seen[key]}")
+            dupes += 1
+            continue
+        seen[key] = str(tid)
+        lines.append(f"{head} {t.get('title', '')}\n  {t.get('detail', '')}")
+    return lines, dupes
+
+
+class PromptStats:
+    def __init__(self):
+        self.calls = 0
+        self.sent_tokens = 0
+        self.naive_tokens = 0
+        self.cacheable_tokens = 0
+        self.truncated_tokens = 0
+
+    def record(self, sent: int, naive: int, prefix: int, truncated: int = 0) -> None:
+        if self.calls:
+            self.cacheable_tokens += prefix
+        self.calls += 1
+        self.sent_tokens += sent
+        self.naive_tokens += naive
+        self.truncated_tokens += truncated
+
+    def report(self) -> str:
+        saved = self.naive_tokens - self.sent_tokens
+        return (
+            f"[prompt] calls={self.calls} sent={self.sent_tokens} tokens "
+            f"(naive={self.naive_tokens}, dedup saved={saved}, cacheable prefix on repeat calls={self.cacheable_tokens}, "
+            f"truncated={self.truncated_tokens})"
+        )
+
+
+class PromptBuilder:
+    """Build [system(prefix), user(task)] messages with a stable shared prefix and a token budget."""
+
+    def __init__(self, system: str, shared_context: str, budget: Optional[int] = None, policy: str = "context",
+                 task_reserve: float = 0.25, stats: Optional[PromptStats] = None):
+        if policy not in TRUNCATION_POLICIES:
+            raise ValueError(f"Unknown truncation policy: {policy} (expected one of {', '.join(TRUNCATION_POLICIES)})")
+        self.budget = int(os.getenv("LLM_PROMPT_BUDGET", "0")) if budget is None else budget
+        self.policy = policy
+        self.stats = stats or PromptStats()
+        self._context_truncated = 0
+        prefix = f"{system}\n\n{shared_context}".strip()
+        if self.budget and policy == "context":
+            # Trim once up front so the prefix stays identical for every task
+            limit = int(self.budget * (1 - task_reserve))
+            trimmed = truncate_to_tokens(prefix, limit)
+            self._context_truncated = count_tokens(prefix) - count_tokens(trimmed) if trimmed != prefix else 0
+            prefix = trimmed
+        self.prefix = prefix
+        self.prefix_tokens = count_tokens(prefix)
+
+    def messages(self, task_text: str, naive_tokens: Optional[int] = None) -> List[Dict[str, str]]:
+        truncated = 0 if self.stats.calls else self._context_truncated
+        task_tokens = count_tokens(task_text)
+        if self.budget and self.prefix_tokens + task_tokens > self.budget:
+            if self.policy == "error":
+                raise ValueError(
+                    f"Prompt needs {self.prefix_tokens + task_tokens} tokens; budget is {self.budget}"
+                )
+            trimmed = truncate_to_tokens(task_text, self.budget - self.prefix_tokens)
+            truncated += task_tokens - count_tokens(trimmed)
+            task_text = trimmed
+            task_tokens = count_tokens(task_text)
+        sent = self.prefix_tokens + task_tokens
+        self.stats.record(sent, naive_tokens if naive_tokens is not None else sent, self.prefix_tokens, truncated)
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "user", "content": task_text},
+        ]
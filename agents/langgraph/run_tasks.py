@@ -13,9 +13,21 @@ import subprocess
 import sys
 from pathlib import Path
 
-import yaml
+from scripts.py.fingerprints import repo_root
+from scripts.py.spec_docs import SpecDocError, load_tasks
 
-from .llm import call_llm
+from .llm import LLMError, call_llm
+from .prompts import PromptBuilder, count_tokens, dedupe_tasks
+
+SYSTEM = (
+    "You are a helpful code assistant. Read tasks.md and propose concrete steps and code patches "
+    "for ONLY the specified repository."
+)
+CONSTRAINTS = (
+    "- Only modify files under the repository worktree.\n"
+    "- Prefer minimal diffs and small, verifiable steps.\n"
+    "- Output proposed unified diffs where applicable."
+)
 
 
 def run_cmd(cmd, cwd=None):
@@ -23,14 +35,14 @@ def run_cmd(cmd, cwd=None):
     return subprocess.run(cmd, cwd=cwd, check=True)
 
 
-def main():
+def main(argv=None):
     p = argparse.ArgumentParser()
     p.add_argument("--spec", required=True, help="spec id")
     p.add_argument("--slug", required=True)
     p.add_argument("--repo", required=True, help="target repo for tasks")
-    args = p.parse_args()
+    args = p.parse_args(argv)
 
-    root = Path(__file__).resolve().parents[2]
+    root = repo_root()
     spec_dir = root / "specs" / f"{args.spec}-{args.slug}"
 
     # Prefer Spec‑Kit tasks.yaml if present; fallback to tasks.md
@@ -38,11 +50,12 @@ def main():
     tasks_md = spec_dir / "tasks.md"
 
     context_blob = ""
+    naive_blob = ""
     if tasks_yaml.exists():
         try:
-            tasks = yaml.safe_load(tasks_yaml.read_text(encoding="utf-8")) or []
-        except Exception as e:
-            raise SystemExit(f"Failed to parse {tasks_yaml}: {e}")
+            tasks = load_tasks(tasks_yaml)
+        except SpecDocError as e:
+            raise SystemExit(str(e))
 
         # Filter to the selected repo and stage 'implement' by default
         filtered = []
@@ -59,17 +72,16 @@ def main():
             # If nothing matched, fall back to all tasks for visibility
             filtered = [t for t in tasks if isinstance(t, dict)]
 
-        lines = [
-            "Tasks (from tasks.yaml, filtered for repo where applicable):",
-        ]
-        for t in filtered:
-            tid = t.get("id", "T-?")
-            title = t.get("title", "")
-            repo = t.get("repo", "")
-            detail = t.get("detail", "")
-            stage = t.get("stage", "")
-            lines.append(f"- {tid} [{repo}] ({stage}) {title}\n  {detail}")
-        context_blob = "\n".join(lines)
+        header = "Tasks (from tasks.yaml, filtered for repo where applicable):"
+        # Tasks repeated across repos (same title/detail) are sent once and back-referenced
+        lines, dupes = dedupe_tasks(filtered)
+        context_blob = "\n".join([header] + lines)
+        naive_blob = "\n".join([header] + [
+            f"- {t.get('id', 'T-?')} [{t.get('repo', '')}] ({t.get('stage', '')}) {t.get('title', '')}\n  {t.get('detail', '')}"
+            for t in filtered
+        ])
+        if dupes:
+            print(f"[prompt] collapsed {dupes} duplicate task(s)")
 
     elif tasks_md.exists():
         # Pass through tasks.md for human-authored context
@@ -82,12 +94,20 @@ def main():
     print(f"Spec: {args.spec}-{args.slug}\nRepo: {args.repo}\nWorktree: {worktree}")
 
     print("\n=== Suggested implementation plan for repo ===")
-    messages = [
-        {"role": "system", "content": "You are a helpful code assistant. Read tasks.md and propose concrete steps and code patches for ONLY the specified repository."},
-        {"role": "user", "content": f"Repository: {args.repo}\nWorktree: {worktree}\n\nTasks context (YAML preferred, MD fallback):\n\n{context_blob}\n\nConstraints:\n- Only modify files under the repository worktree.\n- Prefer minimal diffs and small, verifiable steps.\n- Output proposed unified diffs where applicable."},
-    ]
-    resp = call_llm(messages)
+    # Stable prefix (system + constraints + repo) first; the tasks context varies per spec/repo
+    builder = PromptBuilder(
+        SYSTEM,
+        f"Constraints:\n{CONSTRAINTS}\n\nRepository: {args.repo}\nWorktree: {worktree}",
+    )
+    user = f"Tasks context (YAML preferred, MD fallback):\n\n{context_blob}"
+    naive = builder.prefix_tokens + count_tokens(f"Tasks context (YAML preferred, MD fallback):\n\n{naive_blob or context_blob}")
+    messages = builder.messages(user, naive_tokens=naive)
+    try:
+        resp = call_llm(messages)
+    except LLMError as e:
+        raise SystemExit(f"LLM call failed: {e}")
     print(resp.get("content"))
+    print(builder.stats.report())
 
     print("\nDone. Apply suggested changes manually or extend runner to apply patches automatically.")
 
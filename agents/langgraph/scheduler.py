@@ -0,0 +1,410 @@
+"""
+Central scheduler for LLM calls shared by every agent in the process.
+
+- Priority queue (lower number runs first) drained by a bounded pool of worker threads.
+- Per-provider requests-per-minute and tokens-per-minute budgets over a sliding 60s window.
+- Per-request timeouts and retries with jittered exponential backoff; a 429/503 `Retry-After` is honored
+  (capped at LLM_RETRY_AFTER_MAX seconds), and a 200 whose body is not a chat completion is retried too.
+- Failover across the OpenAI-compatible providers in configs/llm.example.env (GLM first, then OpenAI).
+- Metrics: queue depth, in-flight calls, retries, failovers and per-provider latency.
+
+Env knobs (all optional):
+  LLM_CONCURRENCY (4)  LLM_TIMEOUT (120s)  LLM_RETRIES (3 per provider)  LLM_BACKOFF (1.0s)
+  LLM_RETRY_AFTER_MAX (60s)  GLM_RPM / GLM_TPM, OPENAI_RPM / OPENAI_TPM (0 = unlimited)
+
+Usage:
+  python3 -m agents.langgraph.scheduler selftest   # retries, Retry-After and failover against a local mock server
+"""
+from __future__ import annotations
+
+import argparse
+import email.utils
+import heapq
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+WINDOW_SECONDS = 60.0
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRY_AFTER_MAX = float(os.getenv("LLM_RETRY_AFTER_MAX", "60"))
+
+
+class LLMError(RuntimeError):
+    """Raised when a call failed on every configured provider."""
+
+
+class Provider:
+    def __init__(self, name: str, base_url: str, api_key: str, model: str, rpm: int = 0, tpm: int = 0):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.limits = RateWindow(rpm, tpm)
+        self.latencies: deque = deque(maxlen=500)
+
+    def __repr__(self) -> str:
+        return f"Provider({self.name}, {self.base_url}, {self.model})"
+
+
+def providers_from_env() -> List[Provider]:
+    """GLM first (primary), then OpenAI as failover; providers without key/base_url are skipped."""
+    out: List[Provider] = []
+    specs = [
+        ("glm", "GLM", None, "glm-4"),
+        ("openai", "OPENAI", "https://api.openai.com/v1", "gpt-4o-mini"),
+    ]
+    for name, prefix, default_url, default_model in specs:
+        key = os.getenv(f"{prefix}_API_KEY")
+        url = os.getenv(f"{prefix}_BASE_URL") or default_url
+        if not key or not url:
+            continue
+        out.append(Provider(
+            name,
+            url,
+            key,
+            os.getenv(f"{prefix}_MODEL", default_model),
+            rpm=int(os.getenv(f"{prefix}_RPM", "0")),
+            tpm=int(os.getenv(f"{prefix}_TPM", "0")),
+        ))
+    return out
+
+
+def retry_after(resp: requests.Response) -> float:
+    """Seconds asked for by a `Retry-After` header (delta-seconds or HTTP date), 0 when absent."""
+    value = (resp.headers.get("Retry-After") or "").strip()
+    if not value:
+        return 0.0
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return 0.0
+    return min(max(seconds, 0.0), RETRY_AFTER_MAX)
+
+
+def parse_completion(resp: requests.Response) -> Dict[str, Any]:
+    """The chat completion in a 200 response; ValueError when the body is not one."""
+    try:
+        data = resp.json()
+        msg = data["choices"][0]["message"]
+        usage = data.get("usage") or {}
+        return {"role": msg.get("role", "assistant"), "content": msg.get("content"), "usage": usage,
+                "total_tokens": int(usage.get("total_tokens") or 0)}
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+        raise ValueError(f"malformed completion ({type(e).__name__}: {e}): {resp.text[:200]}") from None
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> int:
+    """Cheap pre-send estimate (~4 chars/token) used for TPM admission; reconciled from `usage` after."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + 4 * len(messages) + (max_tokens or 0)
+
+
+class RateWindow:
+    """Sliding-window RPM/TPM budget. Thread-safe."""
+
+    def __init__(self, rpm: int = 0, tpm: int = 0, window: float = WINDOW_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self.clock = clock
+        self._events: deque = deque()  # [timestamp, tokens]
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float) -> None:
+        while self._events and now - self._events[0][0] >= self.window:
+            self._events.popleft()
+
+    def try_reserve(self, tokens: int):
+        """Return (entry, 0.0) when admitted, or (None, seconds_to_wait)."""
+        with self._lock:
+            now = self.clock()
+            self._trim(now)
+            used = sum(e[1] for e in self._events)
+            over_rpm = self.rpm and len(self._events) >= self.rpm
+            # A single request larger than the whole budget is admitted once the window is empty
+            over_tpm = self.tpm and self._events and used + tokens > self.tpm
+            if not over_rpm and not over_tpm:
+                entry = [now, tokens]
+                self._events.append(entry)
+                return entry, 0.0
+            wait = self._events[0][0] + self.window - now
+            return None, max(wait, 0.01)
+
+    def acquire(self, tokens: int, sleep: Callable[[float], None] = time.sleep):
+        while True:
+            entry, wait = self.try_reserve(tokens)
+            if entry is not None:
+                return entry
+            sleep(wait)
+
+    def settle(self, entry, actual_tokens: int) -> None:
+        with self._lock:
+            entry[1] = actual_tokens
+
+
+class _Job:
+    def __init__(self, messages: List[Dict[str, str]], kwargs: Dict[str, Any]):
+        self.messages = messages
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.enqueued = time.monotonic()
+
+
+class LLMScheduler:
+    def __init__(self, providers: List[Provider], concurrency: int = 4, timeout: float = 120.0,
+                 retries: int = 3, backoff: float = 1.0, session: Optional[requests.Session] = None):
+        if not providers:
+            raise ValueError("LLMScheduler needs at least one provider")
+        self.providers = providers
+        self.timeout = timeout
+        self.retries = max(1, retries)
+        self.backoff = backoff
+        self.session = session or requests.Session()
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._in_flight = 0
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "retries": 0, "failovers": 0}
+        self._queue_waits: deque = deque(maxlen=500)
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"llm-worker-{i}", daemon=True)
+            for i in range(max(1, concurrency))
+        ]
+        for w in self._workers:
+            w.start()
+
+    # ---- public API ----
+    def submit(self, messages: List[Dict[str, str]], priority: int = 10, **kwargs) -> Future:
+        job = _Job(messages, kwargs)
+        with self._cv:
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            self._counters["submitted"] += 1
+            self._cv.notify()
+        return job.future
+
+    def call(self, messages: List[Dict[str, str]], priority: int = 10, **kwargs) -> Dict[str, Any]:
+        return self.submit(messages, priority=priority, **kwargs).result()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cv:
+            out: Dict[str, Any] = dict(self._counters)
+            out["queue_depth"] = len(self._heap)
+            out["in_flight"] = self._in_flight
+            out["queue_wait_avg_s"] = _avg(self._queue_waits)
+        out["providers"] = {
+            p.name: {
+                "calls": len(p.latencies),
+                "latency_avg_s": _avg(p.latencies),
+                "latency_p95_s": _p95(p.latencies),
+            }
+            for p in self.providers
+        }
+        return out
+
+    # ---- internals ----
+    def _worker(self) -> None:
+        while True:
+            with self._cv:
+                while not self._heap:
+                    self._cv.wait()
+                _, _, job = heapq.heappop(self._heap)
+                self._in_flight += 1
+                self._queue_waits.append(time.monotonic() - job.enqueued)
+            if not job.future.set_running_or_notify_cancel():
+                with self._cv:
+                    self._in_flight -= 1
+                continue
+            try:
+                result = self._run(job)
+            except Exception as e:
+                with self._cv:
+                    self._counters["failed"] += 1
+                job.future.set_exception(e)
+            else:
+                with self._cv:
+                    self._counters["completed"] += 1
+                job.future.set_result(result)
+            finally:
+                with self._cv:
+                    self._in_flight -= 1
+
+    def _run(self, job: _Job) -> Dict[str, Any]:
+        errors: List[str] = []
+        est = estimate_tokens(job.messages, job.kwargs.get("max_tokens"))
+        for idx, provider in enumerate(self.providers):
+            if idx:
+                with self._cv:
+                    self._counters["failovers"] += 1
+                print(f"[llm] failing over to {provider.name}")
+            wait_hint = 0.0
+            for attempt in range(self.retries):
+                if attempt:
+                    with self._cv:
+                        self._counters["retries"] += 1
+                    time.sleep(max(wait_hint, self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)))
+                    wait_hint = 0.0
+                entry = provider.limits.acquire(est)
+                started = time.monotonic()
+                try:
+                    resp = self.session.post(
+                        f"{provider.base_url}/chat/completions",
+                        headers={"Authorization": f"Bearer {provider.api_key}"},
+                        json={"model": provider.model, "messages": job.messages, **job.kwargs},
+                        timeout=self.timeout,
+                    )
+                except requests.RequestException as e:
+                    errors.append(f"{provider.name}: {e}")
+                    continue
+                provider.latencies.append(time.monotonic() - started)
+                if resp.status_code == 200:
+                    try:
+                        done = parse_completion(resp)
+                    except ValueError as e:
+                        # Truncated or proxy-mangled bodies are transient: retry, then fail over
+                        errors.append(f"{provider.name}: {e}")
+                        continue
+                    tokens = done.pop("total_tokens")
+                    if tokens:
+                        provider.limits.settle(entry, tokens)
+                    return {**done, "provider": provider.name}
+                errors.append(f"{provider.name}: HTTP {resp.status_code} {resp.text[:200]}")
+                wait_hint = retry_after(resp)
+                if resp.status_code not in RETRYABLE_STATUS:
+                    break  # auth/bad request: retrying the same provider won't help
+        raise LLMError("LLM call failed on all providers: " + "; ".join(errors))
+
+
+def _avg(values) -> Optional[float]:
+    return round(statistics.fmean(values), 3) if values else None
+
+
+def _p95(values) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3)
+
+
+_default: Optional[LLMScheduler] = None
+_default_lock = threading.Lock()
+
+
+def get_scheduler() -> Optional[LLMScheduler]:
+    """Process-wide scheduler built from env; None when no provider is configured."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            providers = providers_from_env()
+            if not providers:
+                return None
+            _default = LLMScheduler(
+                providers,
+                concurrency=int(os.getenv("LLM_CONCURRENCY", "4")),
+                timeout=float(os.getenv("LLM_TIMEOUT", "120")),
+                retries=int(os.getenv("LLM_RETRIES", "3")),
+                backoff=float(os.getenv("LLM_BACKOFF", "1.0")),
+            )
+        return _default
+
+
+# ---- selftest ----
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible /<name>/chat/completions; each name replays its script, repeating the last reply."""
+
+    scripts: Dict[str, List] = {}
+    hits: Dict[str, int] = {}
+
+    def do_POST(self) -> None:
+        name = self.path.strip("/").split("/")[0]
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        n = self.hits[name] = self.hits.get(name, 0) + 1
+        script = self.scripts[name]
+        status, headers, body = script[min(n, len(script)) - 1]
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def _ok(text: str):
+    return 200, {"Content-Type": "application/json"}, json.dumps(
+        {"choices": [{"message": {"role": "assistant", "content": text}}], "usage": {"total_tokens": 7}})
+
+
+def selftest() -> Dict[str, Any]:
+    """Scripted failures against a local mock server: Retry-After, malformed bodies, failover, exhaustion."""
+    _MockHandler.scripts = {
+        "flaky": [(429, {"Retry-After": "1"}, "slow down"), (200, {}, "<html>proxy error</html>"), _ok("flaky ok")],
+        "broken": [(200, {"Content-Type": "application/json"}, '{"choices": []}')],
+        "good": [_ok("good ok")],
+        "denied": [(401, {}, "bad key")],
+    }
+    _MockHandler.hits = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MockHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    def scheduler(*names: str) -> LLMScheduler:
+        return LLMScheduler([Provider(n, f"{url}/{n}", "test", "mock") for n in names],
+                            concurrency=1, timeout=5, retries=3, backoff=0.05)
+
+    checks: Dict[str, Dict[str, Any]] = {}
+    msgs = [{"role": "user", "content": "hi"}]
+    try:
+        s = scheduler("flaky")
+        started = time.monotonic()
+        out = s.call(msgs)
+        wall = time.monotonic() - started
+        checks["retry_after_and_malformed_body"] = {
+            "ok": out["content"] == "flaky ok" and s.metrics()["retries"] == 2 and wall >= 1.0,
+            "wall": round(wall, 2), "retries": s.metrics()["retries"]}
+
+        s = scheduler("broken", "good")
+        out = s.call(msgs)
+        checks["failover_on_bad_shape"] = {
+            "ok": out["provider"] == "good" and s.metrics()["failovers"] == 1 and _MockHandler.hits["broken"] == 3,
+            "provider": out["provider"]}
+
+        s = scheduler("denied", "broken")
+        try:
+            s.call(msgs)
+            checks["exhausted_raises_llm_error"] = {"ok": False, "error": None}
+        except LLMError as e:
+            checks["exhausted_raises_llm_error"] = {"ok": _MockHandler.hits["denied"] == 1, "error": str(e)[:300]}
+    finally:
+        server.shutdown()
+    return {"ok": all(c["ok"] for c in checks.values()), "checks": checks}
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Shared LLM call scheduler")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("selftest", help="exercise retries and failover against a local mock server")
+    p.parse_args(argv)
+    report = selftest()
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
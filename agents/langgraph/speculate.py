@@ -0,0 +1,197 @@
+"""
+Speculative multi-candidate patches.
+
+Instead of one LLM patch per task, request N candidates at once (temperatures from LABLAB_SPEC_TEMPS,
+cycled) and validate them concurrently, each in its own persistent worktree under
+${LABLAB_STATE_DIR:-~/.lablab/state}/speculate/<repo>/cand-<i> (detached at the target's HEAD, ignored
+build outputs kept between tasks so the build cache can warm-start):
+
+  LLM response -> edit blocks applied in memory (the `git apply --check` step) -> build -> test shards
+
+The build/test step is `build_and_test` on the host unless the caller passes another coroutine (the
+worker pool's build_and_test_remote). The first candidate that passes wins; the others are cancelled (queued LLM calls are dropped and
+running build/test processes are killed). Outcomes per candidate slot and temperature are accumulated in
+speculate/metrics.json to tune N:
+
+  python -m agents.langgraph.speculate stats
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from scripts.py.fingerprints import state_dir
+
+from .edits import EditError, apply_response
+from .llm import LLMError, call_llm, get_scheduler
+from .verify import build_and_test
+
+DEFAULT_TEMPS = "0.2,0.6,0.9,0.4"
+Check = Callable[..., Awaitable[bool]]  # (worktree, repo, prefix=...) -> passed
+_metrics_lock = threading.Lock()
+
+
+def temperatures(n: int) -> List[float]:
+    temps = [float(t) for t in os.environ.get("LABLAB_SPEC_TEMPS", DEFAULT_TEMPS).split(",") if t.strip()]
+    return [temps[i % len(temps)] for i in range(n)]
+
+
+def metrics_path() -> Path:
+    return state_dir() / "speculate" / "metrics.json"
+
+
+def load_metrics() -> Dict:
+    path = metrics_path()
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {"tasks": 0, "won": 0, "slots": {}, "temperatures": {}}
+
+
+def record(results: List[Dict]) -> None:
+    with _metrics_lock:
+        m = load_metrics()
+        m["tasks"] += 1
+        m["won"] += any(r["status"] == "won" for r in results)
+        for r in results:
+            for table, key in (("slots", str(r["slot"])), ("temperatures", f"{r['temperature']:.2f}")):
+                row = m[table].setdefault(key, {})
+                row["tries"] = row.get("tries", 0) + 1
+                row[r["status"]] = row.get(r["status"], 0) + 1
+        path = metrics_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(m, indent=2, sort_keys=True), encoding="utf-8")
+        tmp.replace(path)
+
+
+def win_rates(m: Dict) -> Dict:
+    def rates(table: Dict) -> Dict:
+        return {k: {**v, "win_rate": round(v.get("won", 0) / v["tries"], 3)} for k, v in sorted(table.items())}
+    return {"tasks": m["tasks"], "task_success_rate": round(m["won"] / m["tasks"], 3) if m["tasks"] else None,
+            "slots": rates(m["slots"]), "temperatures": rates(m["temperatures"])}
+
+
+def candidate_worktree(target: Path, repo: str, slot: int, sha: str) -> Path:
+    """Persistent detached worktree for `slot`, reset to `sha` (ignored bin/obj survive)."""
+    wt = state_dir() / "speculate" / repo / f"cand-{slot}"
+    registered = subprocess.run(["git", "worktree", "list", "--porcelain"], cwd=target, capture_output=True,
+                                text=True, check=True).stdout
+    if f"worktree {wt}\n" not in registered + "\n":
+        subprocess.run(["git", "worktree", "prune"], cwd=target, check=True)
+        shutil.rmtree(wt, ignore_errors=True)
+        wt.parent.mkdir(parents=True, exist_ok=True)
+        subprocess.run(["git", "worktree", "add", "--force", "--detach", str(wt), sha], cwd=target, check=True,
+                       capture_output=True)
+        return wt
+    for args in (["checkout", "--force", "--detach", sha], ["reset", "--hard", sha], ["clean", "-fdq"]):
+        subprocess.run(["git", *args], cwd=wt, check=True, capture_output=True)
+    return wt
+
+
+async def _candidate(slot: int, temperature: float, future, extract: Callable[[str], str], target: Path,
+                     repo: str, sha: str, label: str, check: Check) -> Dict:
+    result = {"slot": slot, "temperature": temperature, "status": "pending", "patch": None}
+    started = time.monotonic()
+    prefix = f"{label} cand{slot}"
+    try:
+        try:
+            resp = await asyncio.wrap_future(future)
+            result["patch"] = extract((resp or {}).get("content") or "")
+        except (LLMError, SystemExit) as e:
+            result.update(status="no_patch", error=str(e))
+            return result
+        wt = await asyncio.to_thread(candidate_worktree, target, repo, slot, sha)
+        try:
+            await asyncio.to_thread(apply_response, wt, result["patch"])
+        except EditError as e:
+            result.update(status="apply_failed", error=str(e)[:500])
+            return result
+        ok = await check(wt, repo, prefix=prefix)
+        result["status"] = "passed" if ok else "build_failed"
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        result["status"] = "cancelled"
+        raise
+    except (OSError, subprocess.CalledProcessError) as e:
+        result.update(status="error", error=str(e))
+        return result
+    finally:
+        result["seconds"] = round(time.monotonic() - started, 1)
+        print(f"[speculate] {prefix} (t={temperature}): {result['status']} after {result['seconds']}s")
+
+
+async def race(messages: List[Dict[str, str]], extract: Callable[[str], str], target: Path, repo: str, n: int,
+               label: str = "", check: Optional[Check] = None) -> Dict:
+    """Run n candidates; returns {"winner": result or None, "results": [...]}."""
+    check = check or build_and_test
+    sha = subprocess.run(["git", "rev-parse", "HEAD"], cwd=target, capture_output=True, text=True,
+                         check=True).stdout.strip()
+    scheduler = get_scheduler()
+    temps = temperatures(n)
+    if scheduler is None:
+        # Stub LLM: one deterministic candidate is all there is
+        fut: Future = Future()
+        fut.set_result(call_llm(messages))
+        futures = [fut]
+        temps = temps[:1]
+    else:
+        futures = [scheduler.submit(messages, temperature=t) for t in temps]
+    tasks = [asyncio.ensure_future(_candidate(i, t, f, extract, target, repo, sha, label, check))
+             for i, (t, f) in enumerate(zip(temps, futures))]
+    winner = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            res = await next_done
+            if res["status"] == "passed":
+                winner = res
+                break
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    results = []
+    for t, temp, i in zip(tasks, temps, range(len(tasks))):
+        if t.cancelled():
+            results.append({"slot": i, "temperature": temp, "status": "cancelled"})
+        elif t.exception() is not None:
+            results.append({"slot": i, "temperature": temp, "status": "error", "error": str(t.exception())})
+        else:
+            results.append(t.result())
+    if winner:
+        winner["status"] = "won"
+    record(results)
+    return {"winner": winner, "results": results}
+
+
+def speculate(messages: List[Dict[str, str]], extract: Callable[[str], str], target: Path, repo: str, n: int,
+              label: str = "", check: Optional[Check] = None) -> Optional[str]:
+    """Blocking wrapper: the winning patch text, or None when no candidate passed."""
+    outcome = asyncio.run(race(messages, extract, target, repo, n, label, check))
+    for r in outcome["results"]:
+        if r["status"] not in ("won", "cancelled", "passed"):
+            print(f"[speculate] cand{r['slot']} {r['status']}: {r.get('error', '')[:200]}")
+    return outcome["winner"]["patch"] if outcome["winner"] else None
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Speculative candidate metrics")
+    p.add_argument("cmd", choices=["stats", "reset"])
+    args = p.parse_args(argv)
+    if args.cmd == "reset":
+        metrics_path().unlink(missing_ok=True)
+        return 0
+    print(json.dumps(win_rates(load_metrics()), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
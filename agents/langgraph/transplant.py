@@ -0,0 +1,172 @@
+"""
+Cross-repo patch transplanting for repeated tasks.
+
+Multi-repo specs repeat the same task for several repos (same title/detail, different id and repo).
+Once a task's patch has been applied, verified and committed in one repo, it is stored under
+${LABLAB_STATE_DIR:-~/.lablab/state}/transplants/<spec>/<key>.json, keyed on the normalised
+title + detail (prompts.task_key, the same equivalence the prompt dedupe uses). When a sibling repo
+reaches an equivalent task, apply_task first tries to re-anchor that patch instead of calling the LLM:
+
+- each edit's path is mapped onto the target tree: the same path if it exists, else the tracked file
+  with the same name sharing the longest path suffix, else the file whose content contains the edit's
+  SEARCH text (the symbol it anchors on);
+- new files follow the directory mapping learned from the other edits of the patch (e.g.
+  src/LablabBean.Console/ -> src/LablabBean.Game/), or keep their path;
+- the edits are then applied with the usual content matching (edits.plan_edits), so line drift is fine.
+
+Any miss raises EditError and the caller falls back to the LLM; a transplant that fails build/test is
+reverted the same way.
+
+  python -m agents.langgraph.transplant stats --spec 003
+"""
+import argparse
+import hashlib
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional
+
+from scripts.py.fingerprints import state_dir
+
+from .edits import Edit, EditError, parse_edits, plan_edits, write_and_stage
+from .prompts import task_key
+
+
+def store_dir(spec: str) -> Path:
+    return state_dir() / "transplants" / str(spec)
+
+
+def _key_path(spec: str, task: Dict) -> Path:
+    digest = hashlib.sha256("\0".join(task_key(task)).encode("utf-8")).hexdigest()[:20]
+    return store_dir(spec) / f"{digest}.json"
+
+
+def record(spec: str, repo: str, task: Dict, patch_text: str, sha: str) -> None:
+    """Remember a verified patch so equivalent tasks in sibling repos can reuse it."""
+    path = _key_path(spec, task)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    entry = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+    if not entry.get("patch"):
+        entry.update(title=task.get("title", ""), source_repo=repo, source_task=str(task.get("id", "")),
+                     source_sha=sha, patch=patch_text, created=time.time())
+    entry.setdefault("applied", {})[repo] = {"task": str(task.get("id", "")), "sha": sha,
+                                             "via": "llm" if entry["source_repo"] == repo else "transplant"}
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(entry, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def lookup(spec: str, repo: str, task: Dict) -> Optional[Dict]:
+    path = _key_path(spec, task)
+    if not path.exists():
+        return None
+    entry = json.loads(path.read_text(encoding="utf-8"))
+    return entry if entry.get("patch") and entry.get("source_repo") != repo else None
+
+
+def tracked_files(worktree: Path) -> List[str]:
+    out = subprocess.run(["git", "ls-files", "-z"], cwd=worktree, capture_output=True, check=True).stdout
+    return [p for p in out.decode("utf-8", "replace").split("\0") if p]
+
+
+def _suffix_len(a: str, b: str) -> int:
+    pa, pb = PurePosixPath(a).parts[::-1], PurePosixPath(b).parts[::-1]
+    n = 0
+    while n < min(len(pa), len(pb)) and pa[n] == pb[n]:
+        n += 1
+    return n
+
+
+def _grep_anchor(worktree: Path, search: str) -> List[str]:
+    lines = [ln.strip() for ln in search.splitlines() if len(ln.strip()) > 8]
+    if not lines:
+        return []
+    anchor = max(lines, key=len)
+    res = subprocess.run(["git", "grep", "-l", "-F", "-e", anchor], cwd=worktree, capture_output=True, text=True)
+    return [p for p in res.stdout.splitlines() if p]
+
+
+def map_path(worktree: Path, edit: Edit, files: List[str], by_name: Dict[str, List[str]]) -> Optional[str]:
+    if edit.path in files:
+        return edit.path
+    same_name = by_name.get(PurePosixPath(edit.path).name, [])
+    if same_name:
+        ranked = sorted(same_name, key=lambda p: (-_suffix_len(edit.path, p), len(p), p))
+        if len(ranked) == 1 or _suffix_len(edit.path, ranked[0]) > _suffix_len(edit.path, ranked[1]):
+            return ranked[0]
+    if edit.search and edit.search.strip():
+        hits = _grep_anchor(worktree, edit.search)
+        if len(hits) == 1:
+            return hits[0]
+    return None
+
+
+def remap(worktree: Path, edits: List[Edit]) -> List[Edit]:
+    files = tracked_files(worktree)
+    by_name: Dict[str, List[str]] = {}
+    for f in files:
+        by_name.setdefault(PurePosixPath(f).name, []).append(f)
+    dir_map: Dict[str, str] = {}
+    mapped: Dict[int, str] = {}
+    unresolved: List[str] = []
+    for e in edits:
+        if e.kind == "write" and e.path not in files:
+            continue  # new file: placed after the directory mapping is known
+        target = map_path(worktree, e, files, by_name)
+        if target is None:
+            unresolved.append(e.path)
+            continue
+        mapped[e.block] = target
+        src_dir, dst_dir = str(PurePosixPath(e.path).parent), str(PurePosixPath(target).parent)
+        if src_dir != dst_dir:
+            dir_map.setdefault(src_dir, dst_dir)
+    if unresolved:
+        raise EditError("transplant: no counterpart in this repo for " + ", ".join(sorted(set(unresolved))))
+    out: List[Edit] = []
+    for e in edits:
+        path = mapped.get(e.block)
+        if path is None:
+            parent = str(PurePosixPath(e.path).parent)
+            # Longest mapped ancestor directory wins
+            for src in sorted(dir_map, key=len, reverse=True):
+                if parent == src or parent.startswith(src + "/"):
+                    parent = dir_map[src] + parent[len(src):]
+                    break
+            path = str(PurePosixPath(parent) / PurePosixPath(e.path).name)
+        out.append(Edit(path, e.search, e.replace, kind=e.kind, line_hint=e.line_hint, block=e.block))
+    return out
+
+
+def transplant(worktree: Path, entry: Dict) -> List[str]:
+    """Re-anchor a stored patch onto `worktree` and stage it; raises EditError when it doesn't fit."""
+    edits = remap(worktree, parse_edits(entry["patch"]))
+    moved = [f"{a.path} -> {b.path}" for a, b in zip(parse_edits(entry["patch"]), edits) if a.path != b.path]
+    if moved:
+        print("[transplant] re-anchored " + "; ".join(moved))
+    return write_and_stage(worktree, plan_edits(worktree, edits))
+
+
+def stats(spec: str) -> Dict:
+    rows = []
+    for path in sorted(store_dir(spec).glob("*.json")):
+        entry = json.loads(path.read_text(encoding="utf-8"))
+        applied = entry.get("applied", {})
+        rows.append({"title": entry.get("title"), "source": f"{entry.get('source_repo')} {entry.get('source_task')}",
+                     "transplanted": sorted(r for r, a in applied.items() if a.get("via") == "transplant")})
+    saved = sum(len(r["transplanted"]) for r in rows)
+    return {"spec": spec, "tasks": len(rows), "llm_calls_saved": saved, "entries": rows}
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Inspect stored cross-repo patches")
+    p.add_argument("cmd", choices=["stats"])
+    p.add_argument("--spec", required=True)
+    args = p.parse_args(argv)
+    print(json.dumps(stats(args.spec), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
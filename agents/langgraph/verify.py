@@ -0,0 +1,62 @@
+"""
+Build-and-test verification shared by apply_task (one worktree) and speculative candidates (many at once).
+
+.NET worktrees go through the host build cache (restore skipped on a hit) and history-balanced test
+shards; anything else passes. All commands run on the shared process runner, so cancelling the
+coroutine kills the build/test processes.
+
+build_and_test_in runs the same steps through `docker exec` in the spec's container instead, where
+obj/bin, the NuGet folder and the build servers stay warm from the previous task (no host build cache).
+"""
+import asyncio
+import os
+from pathlib import Path
+
+from scripts.py.build_cache import BuildCache, is_dotnet
+from scripts.py.container_exec import BUILD_FLAGS, SpecContainer
+from scripts.py.proc_runner import CommandError, get_runner
+from scripts.py.dotnet_shards import print_report, run_sharded
+
+
+async def build_and_test(worktree: Path, repo: str, prefix: str = "") -> bool:
+    """Restore/build/test `worktree`; False on any build error or a test that fails every rerun."""
+    if not await asyncio.to_thread(is_dotnet, worktree):
+        return True
+    runner = get_runner()
+    cache = BuildCache()
+    plan = await asyncio.to_thread(cache.prepare, worktree)
+    env = {**os.environ, **plan["env"]}
+    try:
+        if plan["restore_needed"]:
+            await runner.run(["dotnet", "restore"], cwd=worktree, env=env, prefix=prefix)
+        await runner.run(["dotnet", "build", "--configuration", "Release", "--no-restore"], cwd=worktree, env=env,
+                         prefix=prefix)
+    except CommandError:
+        return False
+    await asyncio.to_thread(cache.save, worktree, plan)
+    # Balanced parallel shards; flaky tests (pass on rerun) don't fail verification
+    report = await run_sharded(worktree, repo, env=env, prefix=prefix)
+    print_report(report)
+    return report["ok"]
+
+
+async def build_and_test_in(box: SpecContainer, worktree: Path, repo: str, prefix: str = "") -> bool:
+    """Build (implicit incremental restore) and test `worktree` inside the container that mounts it."""
+    if not await asyncio.to_thread(is_dotnet, worktree):
+        return True
+    try:
+        await get_runner().run(box.wrap(["dotnet", "build", "--configuration", "Release", *BUILD_FLAGS]),
+                               cwd=worktree, prefix=prefix)
+    except CommandError:
+        return False
+    report = await run_sharded(worktree, repo, prefix=prefix, wrap=box.wrap)
+    print_report(report)
+    return report["ok"]
+
+
+def verify(worktree: Path, repo: str, prefix: str = "") -> bool:
+    return asyncio.run(build_and_test(worktree, repo, prefix))
+
+
+def verify_in(box: SpecContainer, worktree: Path, repo: str, prefix: str = "") -> bool:
+    return asyncio.run(build_and_test_in(box, worktree, repo, prefix))
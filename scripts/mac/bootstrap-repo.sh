@@ -19,6 +19,11 @@ if [ -z "$TYPE" ] || [ -z "$DEST" ]; then usage; exit 1; fi
 
 ROOT=$(cd "$(dirname "$0")/../.." && pwd)
 
+# Prefer the Python engine (templates/manifest.json, one pass, shared pre-commit cache)
+if command -v python3 >/dev/null 2>&1; then
+  exec python3 "$ROOT/scripts/py/bootstrap_repo.py" --type "$TYPE" --path "$DEST"
+fi
+
 copy_common() {
   cp "$ROOT/templates/common/.editorconfig" "$DEST/.editorconfig" || true
   cp "$ROOT/templates/common/.gitattributes" "$DEST/.gitattributes" || true
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Run many apply matrix entries on one host instead of one fresh CI runner per entry.
+
+Input is the JSON `resolve_apply.py` prints ({"include": [{spec, slug, repo, branch}, ...]}), a bare list
+of such entries, or several of either (files or `-` for stdin). Entries may carry an optional task_id.
+
+- Entries are grouped by repo; each group runs on one worker, so a repo is never applied to twice at
+  once. Groups for different repos run in parallel (--workers).
+- Each repo gets a persistent checkout under ${LABLAB_STATE_DIR:-~/.lablab/state}/apply/<repo>, cloned
+  once with the "apply" clone strategy and then only fetched/reset per entry. Ignored build outputs
+  (bin/obj) survive between entries, and an flock keeps concurrent batches off the same checkout.
+- Toolchain caches are shared across entries: NuGet packages, pip cache and a warm dotnet CLI (no
+  first-run experience or telemetry).
+- Every entry's output goes to its own log; a combined report is printed and written as JSON.
+
+Usage:
+  python3 scripts/py/resolve_apply.py --spec-id 3 --org $LABLAB_ORG | python3 scripts/py/batch_apply.py -
+  python3 scripts/py/batch_apply.py matrix-3.json matrix-5.json --workers 4 --report batch.json
+"""
+import argparse
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+from clone_strategy import clone, load_repos_config
+from fingerprints import repo_root, state_dir
+
+ROOT = repo_root()
+
+
+def load_entries(sources: List[str]) -> List[Dict]:
+    entries: List[Dict] = []
+    for src in sources:
+        data = json.load(sys.stdin) if src == "-" else json.loads(Path(src).read_text(encoding="utf-8"))
+        items = data.get("include", []) if isinstance(data, dict) else data
+        for e in items:
+            missing = [k for k in ("spec", "slug", "repo", "branch") if not e.get(k)]
+            if missing:
+                raise SystemExit(f"Matrix entry {e} is missing {', '.join(missing)}")
+            entries.append(e)
+    # The same entry listed twice (overlapping matrices) runs once
+    seen, unique = set(), []
+    for e in entries:
+        key = (str(e["spec"]), e["slug"], e["repo"], e["branch"], e.get("task_id") or "")
+        if key not in seen:
+            seen.add(key)
+            unique.append(e)
+    return unique
+
+
+def toolchain_env(cache_root: Path) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("NUGET_PACKAGES", str(cache_root / "nuget"))
+    env.setdefault("PIP_CACHE_DIR", str(cache_root / "pip"))
+    env.setdefault("DOTNET_CLI_TELEMETRY_OPTOUT", "1")
+    env.setdefault("DOTNET_SKIP_FIRST_TIME_EXPERIENCE", "1")
+    env.setdefault("DOTNET_NOLOGO", "1")
+    env["GIT_TERMINAL_PROMPT"] = "0"
+    return env
+
+
+def _git(args: List[str], cwd: Path, log) -> None:
+    log.write(f"$ git {' '.join(args)}\n".encode("utf-8"))
+    log.flush()
+    subprocess.run(["git", *args], cwd=cwd, check=True, stdout=log, stderr=subprocess.STDOUT)
+
+
+def prepare_checkout(org: str, repo: str, branch: str, checkout: Path, cfg: Dict, log) -> None:
+    if not (checkout / ".git").exists():
+        checkout.parent.mkdir(parents=True, exist_ok=True)
+        clone(cfg, "apply", f"git@github.com:{org}/{repo}.git", checkout)
+    _git(["fetch", "--depth", "1", "origin", f"+refs/heads/{branch}:refs/remotes/origin/{branch}"], checkout, log)
+    _git(["checkout", "-B", branch, f"origin/{branch}"], checkout, log)
+    _git(["reset", "--hard", f"origin/{branch}"], checkout, log)
+    # Untracked leftovers go, ignored build outputs stay for incremental builds
+    _git(["clean", "-fd"], checkout, log)
+
+
+def run_entry(entry: Dict, org: str, checkout: Path, cfg: Dict, env: Dict[str, str], log_dir: Path) -> Dict:
+    name = f"{entry['spec']}-{entry['slug']}--{entry['repo']}" + (f"--{entry['task_id']}" if entry.get("task_id") else "")
+    log_path = log_dir / f"{name.replace('/', '_')}.log"
+    result = {**entry, "log": str(log_path)}
+    started = time.monotonic()
+    with open(log_path, "wb") as log:
+        try:
+            prepare_checkout(org, entry["repo"], entry["branch"], checkout, cfg, log)
+            cmd = [sys.executable, "-m", "agents.langgraph.apply_task", "--spec", str(entry["spec"]),
+                   "--slug", entry["slug"], "--repo", entry["repo"], "--branch", entry["branch"],
+                   "--target", str(checkout)]
+            if entry.get("task_id"):
+                cmd += ["--task-id", entry["task_id"]]
+            log.write(f"$ {' '.join(cmd)}\n".encode("utf-8"))
+            log.flush()
+            rc = subprocess.run(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT).returncode
+            result["status"] = "ok" if rc == 0 else "failed"
+            result["returncode"] = rc
+        except subprocess.CalledProcessError as e:
+            result["status"] = "checkout failed"
+            result["returncode"] = e.returncode
+    result["seconds"] = round(time.monotonic() - started, 1)
+    print(f"[batch] {name}: {result['status']} in {result['seconds']}s")
+    return result
+
+
+def run_repo(repo: str, entries: List[Dict], org: str, work_root: Path, repos_cfg: Dict,
+             env: Dict[str, str], log_dir: Path, keep_going: bool) -> List[Dict]:
+    checkout = work_root / repo
+    checkout.parent.mkdir(parents=True, exist_ok=True)
+    results: List[Dict] = []
+    with open(work_root / f"{repo}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        for i, entry in enumerate(entries):
+            res = run_entry(entry, org, checkout, repos_cfg.get(repo, {}), env, log_dir)
+            results.append(res)
+            if res["status"] != "ok" and not keep_going:
+                results += [{**e, "status": "skipped", "reason": f"earlier {repo} entry failed"} for e in entries[i + 1:]]
+                break
+    return results
+
+
+def batch(entries: List[Dict], org: str, workers: int = 2, keep_going: bool = True) -> Dict:
+    started = time.monotonic()
+    base = state_dir()
+    work_root = base / "apply"
+    log_dir = base / "batch" / time.strftime("%Y%m%d-%H%M%S")
+    log_dir.mkdir(parents=True, exist_ok=True)
+    env = toolchain_env(base / "cache")
+    repos_cfg = load_repos_config(ROOT)
+
+    groups: Dict[str, List[Dict]] = {}
+    for e in entries:
+        groups.setdefault(e["repo"], []).append(e)
+    # Longest queues first so the pool isn't left waiting on one big repo at the end
+    order = sorted(groups, key=lambda r: -len(groups[r]))
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(order) or 1))) as pool:
+        futures = [pool.submit(run_repo, r, groups[r], org, work_root, repos_cfg, env, log_dir, keep_going)
+                   for r in order]
+        results = [res for f in futures for res in f.result()]
+
+    counts: Dict[str, int] = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    return {
+        "ok": all(r["status"] == "ok" for r in results),
+        "counts": counts,
+        "seconds": round(time.monotonic() - started, 1),
+        "log_dir": str(log_dir),
+        "results": results,
+    }
+
+
+def print_report(report: Dict) -> None:
+    print()
+    for r in report["results"]:
+        task = f" {r['task_id']}" if r.get("task_id") else ""
+        print(f"{r['status']:<16} {r['spec']}-{r['slug']} {r['repo']}{task} ({r.get('seconds', 0)}s)")
+    summary = ", ".join(f"{n} {s}" for s, n in sorted(report["counts"].items()))
+    print(f"\nbatch: {summary} in {report['seconds']}s; logs in {report['log_dir']}")
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Apply many spec matrix entries on one host")
+    p.add_argument("matrix", nargs="+", help="matrix JSON files (resolve_apply.py output), '-' for stdin")
+    p.add_argument("--org", default=os.environ.get("LABLAB_ORG"))
+    p.add_argument("--workers", type=int, default=int(os.environ.get("LABLAB_BATCH_WORKERS", "2")),
+                   help="repos applied in parallel")
+    p.add_argument("--stop-on-failure", action="store_true", help="skip remaining entries of a repo after a failure")
+    p.add_argument("--report", default=None, help="also write the combined JSON report to this path")
+    args = p.parse_args(argv)
+    if not args.org:
+        raise SystemExit("--org or LABLAB_ORG is required")
+
+    entries = load_entries(args.matrix)
+    if not entries:
+        print("[batch] no matrix entries")
+        return 0
+    report = batch(entries, args.org, workers=args.workers, keep_going=not args.stop_on_failure)
+    print_report(report)
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
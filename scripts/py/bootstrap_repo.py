@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Apply repo templates to a worktree in one pass, driven by templates/manifest.json.
+
+- Each repo type (unity|dotnet|python) lists destination -> template paths and may include other sets.
+- Files already identical to the template are left alone; others are written as a reflink (copy-on-write
+  clone: FICLONE on Linux btrfs/XFS, clonefile via `cp -c` on macOS APFS) when the filesystem supports it,
+  falling back to a regular copy. `--link hardlink`
+  shares the template inode instead (same filesystem only; tools that rewrite files in place would then
+  edit the template too, so it is opt-in).
+- pre-commit hook environments live in one shared PRE_COMMIT_HOME (LABLAB_PRE_COMMIT_HOME, else
+  PRE_COMMIT_HOME, else pre-commit's default ~/.cache/pre-commit). Environments for a given
+  .pre-commit-config.yaml are built once (`pre-commit install-hooks`) and reused by every worktree;
+  the git hook itself is only installed when the repo's (shared) hooks dir doesn't already have it.
+  If you pick a custom LABLAB_PRE_COMMIT_HOME, export PRE_COMMIT_HOME to the same path for commits.
+
+Usage:
+  python3 scripts/py/bootstrap_repo.py --type unity --path /srv/specs/123/lablab-bean-unity
+"""
+import argparse
+import filecmp
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+from fingerprints import repo_root
+
+ROOT = repo_root()
+TEMPLATES = ROOT / "templates"
+MANIFEST = TEMPLATES / "manifest.json"
+LINK_MODES = ("auto", "reflink", "hardlink", "copy")
+FICLONE = 0x40049409  # linux/fs.h
+
+
+def pre_commit_home() -> Path:
+    home = os.environ.get("LABLAB_PRE_COMMIT_HOME") or os.environ.get("PRE_COMMIT_HOME")
+    return Path(home) if home else Path.home() / ".cache" / "pre-commit"
+
+
+def load_manifest(path: Path = MANIFEST) -> Dict:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def resolve_files(manifest: Dict, rtype: str, _seen: Optional[set] = None) -> Dict[str, Path]:
+    """Flatten a repo type (and its includes) into {dest_rel_path: template_path}."""
+    if rtype not in manifest:
+        raise SystemExit(f"Unknown type: {rtype} (manifest has {', '.join(sorted(manifest))})")
+    seen = _seen if _seen is not None else set()
+    if rtype in seen:
+        return {}
+    seen.add(rtype)
+    entry = manifest[rtype]
+    files: Dict[str, Path] = {}
+    for inc in entry.get("include", []):
+        files.update(resolve_files(manifest, inc, seen))
+    for dst, src in entry.get("files", {}).items():
+        files[dst] = TEMPLATES / src
+    return files
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    if sys.platform == "darwin":
+        # clonefile(2) has no Python binding; cp -c uses it and fails outside APFS
+        try:
+            ok = subprocess.run(["cp", "-c", str(src), str(dst)], capture_output=True).returncode == 0
+        except OSError:
+            ok = False
+        if not ok:
+            dst.unlink(missing_ok=True)
+        return ok
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        dst.unlink(missing_ok=True)
+        return False
+
+
+def place(src: Path, dst: Path, link: str) -> str:
+    """Write `dst` from `src`; returns how it was written (skip|hardlink|reflink|copy)."""
+    if dst.exists():
+        if dst.samefile(src) or filecmp.cmp(src, dst, shallow=False):
+            return "skip"
+        dst.unlink()
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if link == "hardlink":
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+    if link in ("auto", "reflink") and _reflink(src, dst):
+        shutil.copystat(src, dst)
+        return "reflink"
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def hooks_dir(dest: Path) -> Optional[Path]:
+    try:
+        out = subprocess.check_output(["git", "rev-parse", "--git-path", "hooks"], cwd=dest, stderr=subprocess.DEVNULL)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+    p = Path(out.decode("utf-8", "ignore").strip())
+    return p if p.is_absolute() else dest / p
+
+
+def setup_pre_commit(dest: Path) -> None:
+    config = dest / ".pre-commit-config.yaml"
+    if not config.exists():
+        return
+    if not shutil.which("pre-commit"):
+        print("pre-commit not installed; skip installing hook.")
+        return
+    home = pre_commit_home()
+    home.mkdir(parents=True, exist_ok=True)
+    env = dict(os.environ, PRE_COMMIT_HOME=str(home))
+
+    hooks = hooks_dir(dest)
+    # default_install_hook_types may add pre-push (the LFS history scan) next to pre-commit
+    wanted = ["pre-commit"] + (["pre-push"] if "pre-push" in config.read_text(encoding="utf-8") else [])
+    installed = [t for t in wanted if hooks and (hooks / t).exists()
+                 and "pre-commit" in (hooks / t).read_text(encoding="utf-8", errors="ignore")]
+    if installed == wanted:
+        print(f"[pre-commit] hooks already installed in {hooks}")
+    else:
+        print(f"$ pre-commit install (in {dest})")
+        subprocess.run(["pre-commit", "install"], cwd=dest, env=env, check=True)
+
+    # Build hook environments once per config content; later worktrees reuse them from PRE_COMMIT_HOME
+    digest = hashlib.sha256(config.read_bytes()).hexdigest()[:16]
+    marker = home / f".lablab-warm-{digest}"
+    if marker.exists():
+        print(f"[pre-commit] environments already warm in {home}")
+        return
+    print(f"$ pre-commit install-hooks (PRE_COMMIT_HOME={home})")
+    if subprocess.run(["pre-commit", "install-hooks"], cwd=dest, env=env).returncode == 0:
+        marker.write_text(str(config) + "\n", encoding="utf-8")
+    else:
+        print("[warn] pre-commit install-hooks failed; hooks will build on first commit")
+
+
+def bootstrap(rtype: str, dest: Path, link: str = "auto", install_hooks: bool = True) -> Dict[str, int]:
+    if not dest.exists():
+        raise SystemExit(f"Path not found: {dest}")
+    counts: Dict[str, int] = {}
+    for rel, src in sorted(resolve_files(load_manifest(), rtype).items()):
+        how = place(src, dest / rel, link)
+        counts[how] = counts.get(how, 0) + 1
+    summary = ", ".join(f"{k}={v}" for k, v in sorted(counts.items()))
+    print(f"[bootstrap] {rtype} templates -> {dest} ({summary})")
+    if install_hooks:
+        setup_pre_commit(dest)
+    return counts
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Apply repo templates from templates/manifest.json")
+    p.add_argument("--type", required=True, help="unity|dotnet|python")
+    p.add_argument("--path", required=True)
+    p.add_argument("--link", choices=LINK_MODES, default=os.environ.get("LABLAB_TEMPLATE_LINK", "auto"))
+    p.add_argument("--no-hooks", action="store_true", help="skip pre-commit install")
+    args = p.parse_args(argv)
+
+    bootstrap(args.type, Path(args.path), link=args.link, install_hooks=not args.no_hooks)
+    print(f"Bootstrapped {args.type} repo at {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
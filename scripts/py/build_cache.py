@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Host-local build cache for .NET applies.
+
+- NuGet: the package folder (NUGET_PACKAGES) is keyed on a hash of the restore inputs (packages.lock.json,
+  *.csproj/*.props/*.targets, nuget.config, global.json). A new key is seeded by hard-linking the most
+  recently used folder (packages are immutable per version), so restore only downloads what changed.
+- Build outputs: every obj/ and bin/ under the worktree is archived after a successful build, keyed on
+  the staged tree (`git write-tree`, so no file is re-read), the NuGet key, the worktree path (obj/
+  embeds absolute paths) and the configuration.
+  * exact hit   -> outputs restored and touched, restore skipped, build is a no-op up-to-date check
+  * warm start  -> newest archive for the same NuGet key and path restored; restore skipped and
+                   MSBuild rebuilds incrementally
+- Size-bounded LRU eviction (LABLAB_BUILD_CACHE_MAX_GB, default 20) under an flock on the cache root.
+
+Cache root: LABLAB_BUILD_CACHE or ${LABLAB_STATE_DIR:-~/.lablab/state}/build-cache.
+
+Usage:
+  python3 scripts/py/build_cache.py stats | evict | clear
+"""
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    from fingerprints import state_dir
+except ImportError:  # imported as scripts.py.build_cache from the agents package
+    from .fingerprints import state_dir
+
+RESTORE_INPUT_SUFFIXES = (".csproj", ".fsproj", ".vbproj", ".props", ".targets")
+RESTORE_INPUT_NAMES = {"packages.lock.json", "nuget.config", "global.json"}
+OUTPUT_DIRS = {"obj", "bin"}
+SKIP_DIRS = {".git", "node_modules", "Library", "Temp"}
+
+
+def cache_root() -> Path:
+    return Path(os.environ.get("LABLAB_BUILD_CACHE", str(state_dir() / "build-cache")))
+
+
+def _walk(worktree: Path):
+    for base, dirs, files in os.walk(worktree):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and d not in OUTPUT_DIRS)
+        yield Path(base), dirs, sorted(files)
+
+
+def is_dotnet(worktree: Path) -> bool:
+    return any(f.endswith((".sln", ".csproj", ".fsproj")) for _, _, files in _walk(worktree) for f in files)
+
+
+def nuget_key(worktree: Path) -> str:
+    h = hashlib.sha256()
+    for base, _, files in _walk(worktree):
+        for f in files:
+            if f.endswith(RESTORE_INPUT_SUFFIXES) or f.lower() in RESTORE_INPUT_NAMES:
+                p = base / f
+                h.update(p.relative_to(worktree).as_posix().encode("utf-8") + b"\0")
+                h.update(hashlib.sha256(p.read_bytes()).digest())
+    return h.hexdigest()[:24]
+
+
+def build_key(worktree: Path, nkey: str, config: str) -> str:
+    tree = subprocess.run(["git", "write-tree"], cwd=worktree, capture_output=True, check=True).stdout.strip()
+    h = hashlib.sha256(b"\0".join([tree, nkey.encode(), str(worktree.resolve()).encode(), config.encode()]))
+    return h.hexdigest()[:24]
+
+
+def output_dirs(worktree: Path) -> List[Path]:
+    out = []
+    for base, dirs, files in os.walk(worktree):
+        for d in list(dirs):
+            if d in OUTPUT_DIRS and any(f.endswith((".csproj", ".fsproj", ".vbproj")) for f in files):
+                out.append(Path(base) / d)
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS and d not in OUTPUT_DIRS]
+    return out
+
+
+def _size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file() and not f.is_symlink())
+
+
+class BuildCache:
+    def __init__(self, root: Optional[Path] = None, max_bytes: Optional[int] = None):
+        self.root = root or cache_root()
+        self.max_bytes = max_bytes or int(float(os.environ.get("LABLAB_BUILD_CACHE_MAX_GB", "20")) * 1024 ** 3)
+        (self.root / "nuget").mkdir(parents=True, exist_ok=True)
+        (self.root / "build").mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / "index.json"
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with open(self.root / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            index = json.loads(self.index_path.read_text(encoding="utf-8")) if self.index_path.exists() else {}
+            yield index
+            tmp = self.index_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(index, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+            tmp.replace(self.index_path)
+
+    def _path(self, entry_id: str) -> Path:
+        kind, key = entry_id.split("-", 1)
+        return self.root / kind / (key if kind == "nuget" else f"{key}.tar")
+
+    def prepare(self, worktree: Path, config: str = "Release") -> Dict:
+        """Point NuGet at the keyed folder and restore cached outputs; returns the plan for save()."""
+        worktree = worktree.resolve()
+        nkey = nuget_key(worktree)
+        bkey = build_key(worktree, nkey, config)
+        nuget_dir = self.root / "nuget" / nkey
+        plan = {"nuget_key": nkey, "build_key": bkey, "config": config, "worktree": str(worktree),
+                "nuget_hit": nuget_dir.exists(), "build_hit": None}
+        with self._locked() as index:
+            now = time.time()
+            if not plan["nuget_hit"]:
+                self._seed_nuget(index, nuget_dir)
+            index.setdefault(f"nuget-{nkey}", {"created": now, "size": 0})["last_used"] = now
+            archive = f"build-{bkey}"
+            if archive in index and self._path(archive).exists():
+                chosen, plan["build_hit"] = archive, "exact"
+            else:
+                warm = [k for k, v in index.items() if k.startswith("build-") and v.get("nuget_key") == nkey
+                        and v.get("worktree") == str(worktree) and v.get("config") == config
+                        and self._path(k).exists()]
+                chosen = max(warm, key=lambda k: index[k]["created"]) if warm else None
+                plan["build_hit"] = "warm" if chosen else None
+            if chosen:
+                index[chosen]["last_used"] = now
+        if chosen:
+            for d in output_dirs(worktree):
+                shutil.rmtree(d, ignore_errors=True)
+            with tarfile.open(self._path(chosen)) as tar:
+                tar.extractall(worktree)
+            if plan["build_hit"] == "exact":
+                # Same inputs: make outputs newer than the freshly checked-out sources so MSBuild skips them
+                for d in output_dirs(worktree):
+                    for f in d.rglob("*"):
+                        if f.is_file():
+                            os.utime(f, (now, now))
+        plan["restore_needed"] = not (plan["nuget_hit"] and plan["build_hit"])
+        plan["env"] = {"NUGET_PACKAGES": str(nuget_dir)}
+        print(f"[build-cache] nuget {'hit' if plan['nuget_hit'] else 'miss'} ({nkey}), "
+              f"outputs {plan['build_hit'] or 'miss'} ({bkey})")
+        return plan
+
+    def _seed_nuget(self, index: Dict, nuget_dir: Path) -> None:
+        previous = sorted((k for k in index if k.startswith("nuget-") and self._path(k).exists()),
+                          key=lambda k: index[k].get("last_used", 0))
+        if not previous:
+            nuget_dir.mkdir(parents=True, exist_ok=True)
+            return
+        src = self._path(previous[-1])
+        shutil.copytree(src, nuget_dir, copy_function=os.link, symlinks=True)
+
+    def save(self, worktree: Path, plan: Dict) -> None:
+        """Archive obj/bin after a successful build (skipped on an exact hit) and account sizes."""
+        worktree = worktree.resolve()
+        archive = f"build-{plan['build_key']}"
+        dirs = output_dirs(worktree)
+        if plan["build_hit"] != "exact" and dirs:
+            path = self._path(archive)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            with tarfile.open(tmp, "w") as tar:
+                for d in dirs:
+                    tar.add(d, arcname=d.relative_to(worktree).as_posix())
+            tmp.replace(path)
+        with self._locked() as index:
+            now = time.time()
+            if plan["build_hit"] != "exact" and dirs:
+                index[archive] = {"created": now, "last_used": now, "size": self._path(archive).stat().st_size,
+                                  "nuget_key": plan["nuget_key"], "worktree": plan["worktree"], "config": plan["config"]}
+            nkey = f"nuget-{plan['nuget_key']}"
+            index.setdefault(nkey, {"created": now})
+            index[nkey].update(last_used=now, size=_size(self._path(nkey)))
+            self._evict(index, keep={archive, nkey})
+
+    def _evict(self, index: Dict, keep=frozenset()) -> List[str]:
+        removed = []
+        for k in [k for k in list(index) if not self._path(k).exists()]:
+            index.pop(k)
+        total = sum(v.get("size", 0) for v in index.values())
+        for k in sorted(index, key=lambda k: index[k].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            if k in keep:
+                continue
+            path = self._path(k)
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+            total -= index.pop(k).get("size", 0)
+            removed.append(k)
+        if removed:
+            print(f"[build-cache] evicted {len(removed)} entr{'y' if len(removed) == 1 else 'ies'}")
+        return removed
+
+    def evict(self) -> List[str]:
+        with self._locked() as index:
+            return self._evict(index)
+
+    def stats(self) -> Dict:
+        with self._locked() as index:
+            entries = {k: v for k, v in index.items()}
+        return {"root": str(self.root), "max_bytes": self.max_bytes,
+                "total_bytes": sum(v.get("size", 0) for v in entries.values()), "entries": entries}
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Inspect or trim the host build cache")
+    p.add_argument("cmd", choices=["stats", "evict", "clear"])
+    args = p.parse_args(argv)
+    cache = BuildCache()
+    if args.cmd == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    elif args.cmd == "evict":
+        print(json.dumps(cache.evict()))
+    else:
+        shutil.rmtree(cache.root, ignore_errors=True)
+        print(f"Cleared {cache.root}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
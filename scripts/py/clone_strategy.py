@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Clone strategies for target repos, driven by the optional "clone" block in configs/repos.json.
+
+Each repo may allow any of these knobs (defaults shown):
+  "clone": {"depth": 1, "blobless": true, "sparse": true, "lfs_skip_smudge": true}
+
+Set a knob to 0/false to forbid it for that repo. The orchestrator then picks the cheapest
+combination that still supports the requested operation:
+  spec-docs  only touches specs/** and root files (start_spec.py): shallow + blobless + sparse + no LFS
+  apply      needs the full working tree but not history or LFS content (apply_task.py)
+  worktree   bare mirror that backs long-lived worktrees (specctl.py): blobless only
+
+Usage (prints the chosen strategy and git args):
+  python3 scripts/py/clone_strategy.py --repo lablab-bean-unity --op spec-docs
+"""
+import argparse
+import json
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fingerprints import repo_root
+
+DEFAULT_CLONE = {"depth": 1, "blobless": True, "sparse": True, "lfs_skip_smudge": True}
+
+# What each operation needs from a clone; a True here forbids the knob that would remove it.
+OPERATIONS = {
+    "spec-docs": {"history": False, "full_tree": False, "lfs": False},
+    "apply": {"history": False, "full_tree": True, "lfs": False},
+    "worktree": {"history": True, "full_tree": True, "lfs": True},
+}
+
+# Paths kept by a sparse (cone mode) checkout in addition to root files.
+SPARSE_PATHS = ["specs"]
+
+
+def load_repos_config(root: Optional[Path] = None) -> Dict:
+    root = root or repo_root()
+    return json.loads((root / "configs" / "repos.json").read_text(encoding="utf-8"))
+
+
+def pick_strategy(cfg: Dict, op: str) -> Dict:
+    """Return the cheapest allowed strategy for `op` as a dict of enabled knobs."""
+    if op not in OPERATIONS:
+        raise ValueError(f"Unknown clone operation: {op} (expected one of {', '.join(OPERATIONS)})")
+    needs = OPERATIONS[op]
+    allowed = dict(DEFAULT_CLONE)
+    allowed.update((cfg or {}).get("clone") or {})
+    depth = int(allowed.get("depth") or 0)
+    return {
+        "depth": depth if depth > 0 and not needs["history"] else 0,
+        "blobless": bool(allowed.get("blobless")),
+        "sparse": bool(allowed.get("sparse")) and not needs["full_tree"],
+        "lfs_skip_smudge": bool(allowed.get("lfs_skip_smudge")) and not needs["lfs"],
+    }
+
+
+def describe(strategy: Dict) -> str:
+    parts = []
+    if strategy.get("depth"):
+        parts.append(f"shallow(depth={strategy['depth']})")
+    if strategy.get("blobless"):
+        parts.append("blobless")
+    if strategy.get("sparse"):
+        parts.append("sparse")
+    if strategy.get("lfs_skip_smudge"):
+        parts.append("lfs-skip-smudge")
+    return "+".join(parts) or "full"
+
+
+def clone_args(strategy: Dict, url: str, dest: Path, branch: Optional[str] = None, bare: bool = False) -> List[str]:
+    cmd = ["git", "clone"]
+    if bare:
+        cmd.append("--bare")
+    if branch:
+        cmd += ["--branch", branch, "--single-branch"]
+    if strategy.get("depth"):
+        cmd += ["--depth", str(strategy["depth"])]
+    if strategy.get("blobless"):
+        cmd.append("--filter=blob:none")
+    if strategy.get("sparse") and not bare:
+        cmd.append("--sparse")
+    cmd += [url, str(dest)]
+    return cmd
+
+
+def clone_env(strategy: Dict) -> Dict[str, str]:
+    env = dict(os.environ)
+    if strategy.get("lfs_skip_smudge"):
+        env["GIT_LFS_SKIP_SMUDGE"] = "1"
+    return env
+
+
+def clone(cfg: Dict, op: str, url: str, dest: Path, branch: Optional[str] = None, bare: bool = False) -> Dict:
+    """Clone `url` into `dest` using the cheapest strategy for `op`; returns the strategy used."""
+    strategy = pick_strategy(cfg, op)
+    env = clone_env(strategy)
+    cmd = clone_args(strategy, url, dest, branch=branch, bare=bare)
+    print(f"[clone] {describe(strategy)} for {op}")
+    print(f"$ {' '.join(cmd)}")
+    subprocess.run(cmd, check=True, env=env)
+    if strategy.get("sparse") and not bare:
+        sparse = ["git", "sparse-checkout", "set", *SPARSE_PATHS]
+        print(f"$ {' '.join(sparse)}")
+        subprocess.run(sparse, cwd=dest, check=True, env=env)
+    return strategy
+
+
+def main():
+    p = argparse.ArgumentParser(description="Show the clone strategy chosen for a repo/operation")
+    p.add_argument("--repo", required=True)
+    p.add_argument("--op", required=True, choices=sorted(OPERATIONS))
+    args = p.parse_args()
+
+    cfg = load_repos_config().get(args.repo, {})
+    strategy = pick_strategy(cfg, args.op)
+    print(json.dumps({"repo": args.repo, "op": args.op, "strategy": describe(strategy), **strategy}))
+
+
+if __name__ == "__main__":
+    main()
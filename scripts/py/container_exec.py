@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Run apply-time builds and tests inside the spec's own container.
+
+`specctl start` keeps one `sleep infinity` container per {spec, repo} (named spec-<spec>-<repo>) with
+the spec worktree mounted at /workspace. Running `dotnet build/test` there through `docker exec`
+instead of on the host keeps everything warm between tasks of the same spec:
+- obj/bin stay in the mounted worktree, so each build is incremental;
+- the container's NuGet folder persists, so restores are no-ops unless packages changed;
+- MSBuild worker nodes (-nodeReuse:true), the MSBuild server (DOTNET_CLI_USE_MSBUILD_SERVER) and the
+  Roslyn compiler server (UseSharedCompilation) outlive each `docker exec` because the container does.
+
+Host paths are mapped onto the container through its bind mounts (docker inspect), so any worktree
+mounted into the container works, not only /workspace.
+
+Usage:
+  python3 scripts/py/container_exec.py status --spec 003 --repo lablab-bean
+  python3 scripts/py/container_exec.py shutdown --spec 003 --repo lablab-bean   # stop the build servers
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional
+
+# Keep build servers alive across `docker exec` calls; the container's lifetime bounds them
+BUILD_ENV = {
+    "DOTNET_CLI_USE_MSBUILD_SERVER": "1",
+    "DOTNET_CLI_TELEMETRY_OPTOUT": "1",
+    "DOTNET_NOLOGO": "1",
+    "DOTNET_SKIP_FIRST_TIME_EXPERIENCE": "1",
+}
+BUILD_FLAGS = ["-nodeReuse:true", "-p:UseSharedCompilation=true"]
+
+
+class ContainerError(RuntimeError):
+    pass
+
+
+def container_name(spec: str, repo: str) -> str:
+    """Name given by specctl's compose file (project spec-<spec>-<repo>)."""
+    return f"spec-{spec}-{repo}"
+
+
+def spec_worktree(spec: str, repo: str) -> Path:
+    return Path(os.environ.get("LABLAB_SPECS_BASE", "/srv/specs")) / spec / repo
+
+
+def inspect(name: str) -> Optional[Dict]:
+    try:
+        p = subprocess.run(["docker", "inspect", name], capture_output=True, text=True)
+    except FileNotFoundError:  # no docker on this host
+        return None
+    if p.returncode != 0:
+        return None
+    return json.loads(p.stdout)[0]
+
+
+class SpecContainer:
+    """A running container that bind-mounts `worktree`; wraps host commands into `docker exec`."""
+
+    def __init__(self, name: str, worktree: Path):
+        self.name = name
+        self.worktree = worktree.resolve()
+        info = inspect(name)
+        if info is None:
+            raise ContainerError(f"container {name} not found (run `specctl start` with a container image)")
+        if not info.get("State", {}).get("Running"):
+            raise ContainerError(f"container {name} is not running")
+        self.workdir = self._map(info.get("Mounts") or [])
+
+    def _map(self, mounts: List[Dict]) -> str:
+        # Deepest bind mount containing the worktree wins
+        best = None
+        for m in mounts:
+            src = Path(m.get("Source", "")).resolve()
+            if self.worktree == src or src in self.worktree.parents:
+                if best is None or len(src.parts) > len(best[0].parts):
+                    best = (src, m["Destination"])
+        if best is None:
+            raise ContainerError(f"container {self.name} does not mount {self.worktree}")
+        return str(PurePosixPath(best[1]) / self.worktree.relative_to(best[0]).as_posix())
+
+    def wrap(self, cmd: List[str]) -> List[str]:
+        """`cmd` as run from the worktree root inside the container."""
+        env = [arg for k, v in BUILD_ENV.items() for arg in ("-e", f"{k}={v}")]
+        return ["docker", "exec", "-w", self.workdir, *env, self.name, *cmd]
+
+    def build_servers(self) -> List[str]:
+        """Command lines of the MSBuild/Roslyn server processes currently alive in the container."""
+        p = subprocess.run(["docker", "exec", self.name, "sh", "-c",
+                            "for f in /proc/[0-9]*/cmdline; do tr '\\0' ' ' < $f 2>/dev/null; echo; done"],
+                           capture_output=True, text=True)
+        keys = ("MSBuild.dll", "VBCSCompiler", "nodeReuse", "nodemode")
+        return sorted({ln.strip() for ln in p.stdout.splitlines() if any(k in ln for k in keys)})
+
+    def shutdown(self) -> int:
+        return subprocess.run(self.wrap(["dotnet", "build-server", "shutdown"])).returncode
+
+
+def for_spec(spec: str, repo: str, worktree: Optional[Path] = None, name: Optional[str] = None) -> SpecContainer:
+    return SpecContainer(name or container_name(spec, repo), worktree or spec_worktree(spec, repo))
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Inspect or stop the build servers in a spec container")
+    p.add_argument("cmd", choices=["status", "shutdown"])
+    p.add_argument("--spec", required=True)
+    p.add_argument("--repo", required=True)
+    p.add_argument("--container", default=None, help="default: spec-<spec>-<repo>")
+    args = p.parse_args(argv)
+    try:
+        box = for_spec(args.spec, args.repo, name=args.container)
+    except ContainerError as e:
+        print(f"[container] {e}")
+        return 1
+    if args.cmd == "shutdown":
+        return box.shutdown()
+    print(json.dumps({"container": box.name, "worktree": str(box.worktree), "workdir": box.workdir,
+                      "build_servers": box.build_servers()}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
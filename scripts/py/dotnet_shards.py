@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Sharded `dotnet test` with timing-history balancing and flaky-test reruns.
+
+- Discovery: every test project (IsTestProject or a Microsoft.NET.Test.Sdk reference) is listed with
+  `dotnet test --no-build --list-tests`; parameterised cases collapse onto their method name.
+- History: per-test durations (exponentially weighted) and flaky counts live in
+  ${LABLAB_STATE_DIR:-~/.lablab/state}/test-history/<repo>.json. Unknown tests are costed at the median.
+- Sharding: longest-first greedy packing onto the least-loaded shard (LABLAB_TEST_SHARDS, default
+  half the cores). A shard runs one `dotnet test --filter` per project it touches, all shards at once
+  through the shared process runner (so LABLAB_MAX_PROCS still caps the host).
+- Results come from per-shard TRX files. Failed tests are re-run up to LABLAB_TEST_RERUNS times
+  (default 2): a test that passes on a rerun is reported flaky, one that keeps failing is a failure.
+- A project whose `--list-tests` fails (broken build, listing error) is not dropped: it gets its own
+  unsharded `dotnet test <project>` run next to the shards, and its result counts toward `ok`.
+- A repo with nothing discoverable falls back to a single plain `dotnet test`. So does a repo whose
+  listed names don't match the TRX FullyQualifiedNames (NUnit/MSTest method names, xUnit DisplayName,
+  parameterised NUnit cases): a requested test without a result means the filter selected nothing, so
+  it is never counted as passing; the repo is marked unsharded in its history and later runs go
+  straight to the plain run.
+- Filters are split so that no single `--filter` argument exceeds MAX_FILTER_CHARS (E2BIG).
+- `wrap` (e.g. container_exec.SpecContainer.wrap) runs every command elsewhere with the worktree root
+  as working directory; project and result paths are then passed relative to it.
+
+Usage:
+  python3 scripts/py/dotnet_shards.py --repo lablab-bean [--cwd ./target] [--shards 4] [--report tests.json]
+Exits 1 when any test fails on every attempt.
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from fingerprints import state_dir
+    from proc_runner import get_runner
+except ImportError:  # imported as scripts.py.dotnet_shards from the agents package
+    from .fingerprints import state_dir
+    from .proc_runner import get_runner
+
+CONFIG = "Release"
+FILTER_SPECIALS = re.compile(r"([\\()&|=!~,])")
+TRX_NS = {"t": "http://microsoft.com/schemas/VisualStudio/TeamTest/2010"}
+ALPHA = 0.3  # weight of the newest measurement in the duration history
+MAX_FILTER_CHARS = 32 * 1024  # well under the per-argument limit (128 KiB on Linux)
+Wrap = Optional[Callable[[List[str]], List[str]]]
+
+
+def default_shards() -> int:
+    return int(os.environ.get("LABLAB_TEST_SHARDS") or max(1, (os.cpu_count() or 2) // 2))
+
+
+class TestHistory:
+    def __init__(self, repo: str):
+        self.path = state_dir() / "test-history" / f"{repo}.json"
+        data = json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {}
+        self.durations: Dict[str, float] = data.get("durations", {})
+        self.flaky: Dict[str, int] = data.get("flaky", {})
+        self.unsharded: bool = data.get("unsharded", False)
+
+    def estimate(self, test: str, default: float) -> float:
+        return self.durations.get(test, default)
+
+    def record(self, durations: Dict[str, float], flaky: List[str]) -> None:
+        for test, secs in durations.items():
+            old = self.durations.get(test)
+            self.durations[test] = round(secs if old is None else ALPHA * secs + (1 - ALPHA) * old, 4)
+        for test in flaky:
+            self.flaky[test] = self.flaky.get(test, 0) + 1
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"durations": self.durations, "flaky": self.flaky, "unsharded": self.unsharded},
+                                  indent=1, sort_keys=True), encoding="utf-8")
+        tmp.replace(self.path)
+
+
+def test_projects(root: Path) -> List[Path]:
+    found = []
+    for proj in sorted(root.rglob("*.csproj")):
+        if any(part in ("bin", "obj", ".git") for part in proj.relative_to(root).parts):
+            continue
+        text = proj.read_text(encoding="utf-8", errors="ignore")
+        if "<IsTestProject>true" in text or "Microsoft.NET.Test.Sdk" in text:
+            found.append(proj)
+    return found
+
+
+def parse_list_tests(stdout: str) -> List[str]:
+    """Names printed after 'The following Tests are available:' with parameters stripped."""
+    names, listing = [], False
+    for line in stdout.splitlines():
+        if "The following Tests are available" in line:
+            listing = True
+            continue
+        if listing and line.startswith("    ") and line.strip():
+            name = line.strip().split("(", 1)[0]
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def _wrapped(cmd: List[str], wrap: Wrap) -> List[str]:
+    return wrap(cmd) if wrap else cmd
+
+
+async def discover(root: Path, env: Optional[Dict[str, str]],
+                   wrap: Wrap = None) -> Tuple[Dict[str, List[str]], List[str]]:
+    """({project: listed tests}, projects whose listing failed)."""
+    runner = get_runner()
+    projects = [p.relative_to(root).as_posix() for p in test_projects(root)]
+    results = await runner.gather(*[
+        runner.run(_wrapped(["dotnet", "test", p, "--configuration", CONFIG, "--no-build", "--list-tests"], wrap),
+                   cwd=root, env=env, quiet=True, check=False) for p in projects
+    ])
+    listed = {p: parse_list_tests(r.stdout) for p, r in zip(projects, results) if r.returncode == 0}
+    unlisted = [p for p, r in zip(projects, results) if r.returncode != 0]
+    for p in unlisted:
+        print(f"[tests] --list-tests failed for {p}; it will run unsharded")
+    return listed, unlisted
+
+
+def plan_shards(tests: Dict[str, List[str]], history: TestHistory, shards: int) -> List[Dict]:
+    """Longest-processing-time-first packing of (project, test) pairs onto `shards` bins."""
+    known = [history.durations[t] for ts in tests.values() for t in ts if t in history.durations]
+    default = statistics.median(known) if known else 1.0
+    items = sorted(((history.estimate(t, default), proj, t) for proj, ts in tests.items() for t in ts), reverse=True)
+    count = max(1, min(shards, len(items)))
+    bins = [{"index": i, "estimate": 0.0, "tests": {}} for i in range(count)]
+    heap = [(0.0, i) for i in range(count)]
+    for secs, proj, test in items:
+        load, i = heapq.heappop(heap)
+        bins[i]["tests"].setdefault(proj, []).append(test)
+        bins[i]["estimate"] = round(load + secs, 3)
+        heapq.heappush(heap, (load + secs, i))
+    return [b for b in bins if b["tests"]]
+
+
+def test_filter(tests: List[str]) -> str:
+    return "|".join("FullyQualifiedName=" + FILTER_SPECIALS.sub(r"\\\1", t) for t in tests)
+
+
+def filter_batches(tests: List[str]) -> List[List[str]]:
+    """Split `tests` so each batch's filter stays under MAX_FILTER_CHARS."""
+    batches: List[List[str]] = [[]]
+    size = 0
+    for t in tests:
+        n = len(test_filter([t])) + 1
+        if batches[-1] and size + n > MAX_FILTER_CHARS:
+            batches.append([])
+            size = 0
+        batches[-1].append(t)
+        size += n
+    return batches
+
+
+def _seconds(duration: str) -> float:
+    h, m, s = duration.split(":")
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+
+def parse_trx(path: Path) -> Dict[str, Tuple[str, float]]:
+    """{fully qualified test name: (worst outcome, total seconds)} from one TRX file."""
+    root = ET.parse(path).getroot()
+    names = {}
+    for ut in root.iterfind(".//t:TestDefinitions/t:UnitTest", TRX_NS):
+        method = ut.find("t:TestMethod", TRX_NS)
+        if method is not None:
+            names[ut.get("id")] = f"{method.get('className')}.{method.get('name')}"
+    out: Dict[str, Tuple[str, float]] = {}
+    for r in root.iterfind(".//t:Results/t:UnitTestResult", TRX_NS):
+        name = names.get(r.get("testId"), r.get("testName", "").split("(", 1)[0])
+        outcome = r.get("outcome", "Failed")
+        secs = _seconds(r.get("duration", "0:0:0"))
+        prev = out.get(name)
+        if prev:
+            outcome = prev[0] if prev[0] != "Passed" else outcome
+            secs += prev[1]
+        out[name] = (outcome, secs)
+    return out
+
+
+async def run_filtered(root: Path, project: str, tests: List[str], results_dir: Path, trx: str,
+                       env: Optional[Dict[str, str]], prefix: str, wrap: Wrap = None) -> Dict[str, Tuple[str, float]]:
+    """Outcomes of `tests` (TRX files named <trx>-<batch>.trx); a test with no result is "Missing"."""
+    results_arg = results_dir.relative_to(root).as_posix() if wrap else str(results_dir)
+    out: Dict[str, Tuple[str, float]] = {}
+    for b, batch in enumerate(filter_batches(tests)):
+        name = f"{trx}-{b}.trx"
+        await get_runner().run(
+            _wrapped(["dotnet", "test", project, "--configuration", CONFIG, "--no-build", "--verbosity", "minimal",
+                      "--filter", test_filter(batch), "--logger", f"trx;LogFileName={name}",
+                      "--results-directory", results_arg], wrap),
+            cwd=root, env=env, prefix=prefix, check=False,
+        )
+        path = results_dir / name
+        if not path.exists():
+            # The test host crashed before writing results: count every test in the batch as failed
+            out.update((t, ("Failed", 0.0)) for t in batch)
+            continue
+        results = parse_trx(path)
+        out.update(results)
+        # Selected by name but absent from the results: the filter matched nothing, so it never ran
+        out.update((t, ("Missing", 0.0)) for t in batch if t not in results)
+    return out
+
+
+async def run_shard(root: Path, shard: Dict, results_dir: Path, env, prefix: str, wrap: Wrap = None) -> Dict:
+    started = time.monotonic()
+    results: Dict[str, Tuple[str, float]] = {}
+    for n, (project, tests) in enumerate(sorted(shard["tests"].items())):
+        results.update(await run_filtered(root, project, tests, results_dir, f"shard{shard['index']}-{n}",
+                                          env, f"{prefix} shard {shard['index']}".strip(), wrap))
+    return {"index": shard["index"], "estimate": shard["estimate"], "wall": round(time.monotonic() - started, 2),
+            "tests": sum(len(t) for t in shard["tests"].values()), "results": results}
+
+
+async def run_sharded(root: Path, repo: str, shards: Optional[int] = None, reruns: Optional[int] = None,
+                      env: Optional[Dict[str, str]] = None, prefix: str = "", wrap: Wrap = None) -> Dict:
+    root = root.resolve()
+    shards = shards or default_shards()
+    reruns = int(os.environ.get("LABLAB_TEST_RERUNS", "2")) if reruns is None else reruns
+    started = time.monotonic()
+    runner = get_runner()
+
+    async def plain_test(project: Optional[str] = None) -> bool:
+        cmd = ["dotnet", "test", *([project] if project else []), "--configuration", CONFIG, "--no-build",
+               "--verbosity", "minimal"]
+        res = await runner.run(_wrapped(cmd, wrap), cwd=root, env=env, prefix=prefix, check=False)
+        return res.returncode == 0
+
+    async def plain_run() -> Dict:
+        return {"ok": await plain_test(), "sharded": False, "failed": [], "flaky": [],
+                "wall": round(time.monotonic() - started, 2)}
+
+    history = TestHistory(repo)
+    if history.unsharded:
+        return await plain_run()
+    listed, unlisted = await discover(root, env, wrap)
+    tests = {p: ts for p, ts in listed.items() if ts}
+    if not tests:
+        return await plain_run()
+
+    plan = plan_shards(tests, history, shards)
+    # A wrapped run only sees the worktree, so its TRX files are written inside it (removed below)
+    results_dir = Path(tempfile.mkdtemp(prefix=".lablab-tests-", dir=root if wrap else None))
+    try:
+        done = await runner.gather(*[run_shard(root, s, results_dir, env, prefix, wrap) for s in plan],
+                                   *[plain_test(p) for p in unlisted])
+        done, unlisted_ok = done[:len(plan)], dict(zip(unlisted, done[len(plan):]))
+        outcomes: Dict[str, Tuple[str, float]] = {}
+        for shard in done:
+            outcomes.update(shard.pop("results"))
+        missing = sorted(t for t, (o, _) in outcomes.items() if o == "Missing")
+        if missing:
+            print(f"[tests] {len(missing)} listed test(s) have no result under their listed name "
+                  f"(e.g. {missing[0]}); running unsharded from now on for {repo}")
+            history.unsharded = True
+            history.save()
+            return await plain_run()
+        project_of = {t: p for p, ts in tests.items() for t in ts}
+        failed = sorted(t for t, (o, _) in outcomes.items() if o not in ("Passed", "NotExecuted"))
+        flaky: List[str] = []
+        for attempt in range(1, reruns + 1):
+            if not failed:
+                break
+            by_project: Dict[str, List[str]] = {}
+            for t in failed:
+                by_project.setdefault(project_of.get(t) or next(iter(tests)), []).append(t)
+            again: Dict[str, Tuple[str, float]] = {}
+            for n, (project, ts) in enumerate(sorted(by_project.items())):
+                again.update(await run_filtered(root, project, ts, results_dir, f"rerun{attempt}-{n}", env,
+                                                f"{prefix} rerun {attempt}".strip(), wrap))
+            passed = [t for t in failed if again.get(t, ("Failed", 0))[0] == "Passed"]
+            flaky += passed
+            failed = [t for t in failed if t not in passed]
+        history.record({t: secs for t, (o, secs) in outcomes.items() if o == "Passed"}, flaky)
+        history.save()
+    finally:
+        shutil.rmtree(results_dir, ignore_errors=True)
+    return {
+        "ok": not failed and all(unlisted_ok.values()),
+        "sharded": True,
+        "tests": len(outcomes),
+        "failed": failed,
+        "unlisted": unlisted_ok,
+        "flaky": sorted(flaky),
+        "shards": done,
+        "wall": round(time.monotonic() - started, 2),
+        "serial_estimate": round(sum(s for _, s in outcomes.values()), 2),
+    }
+
+
+def print_report(report: Dict) -> None:
+    if not report.get("sharded"):
+        print(f"[tests] single run: {'ok' if report['ok'] else 'FAILED'} in {report['wall']}s")
+        return
+    for s in report["shards"]:
+        print(f"[tests] shard {s['index']}: {s['tests']} tests, est {s['estimate']}s, wall {s['wall']}s")
+    for t in report["flaky"]:
+        print(f"[tests] flaky (passed on rerun): {t}")
+    for t in report["failed"]:
+        print(f"[tests] FAILED: {t}")
+    for project, ok in report.get("unlisted", {}).items():
+        print(f"[tests] {project} (not listable, run whole): {'ok' if ok else 'FAILED'}")
+    print(f"[tests] {report['tests']} tests, {len(report['failed'])} failed, {len(report['flaky'])} flaky; "
+          f"wall {report['wall']}s vs {report['serial_estimate']}s of test time")
+
+
+def run_tests(root: Path, repo: str, env: Optional[Dict[str, str]] = None, prefix: str = "") -> Dict:
+    """Blocking entry point for apply_task and batch runs."""
+    report = asyncio.run(run_sharded(root, repo, env=env, prefix=prefix))
+    print_report(report)
+    return report
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Run dotnet tests in balanced parallel shards")
+    p.add_argument("--repo", required=True, help="history key (repo name)")
+    p.add_argument("--cwd", default=".")
+    p.add_argument("--shards", type=int, default=None)
+    p.add_argument("--reruns", type=int, default=None)
+    p.add_argument("--report", default=None, help="write the JSON report here")
+    args = p.parse_args(argv)
+    report = asyncio.run(run_sharded(Path(args.cwd), args.repo, args.shards, args.reruns))
+    print_report(report)
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -34,16 +34,16 @@ def check_push_permission(org: str, repo: str, token: str) -> Tuple[bool, int, s
     return bool(perms.get("push")), r.status_code, ""
 
 
-def parse_args():
+def parse_args(argv=None):
     p = argparse.ArgumentParser(description="Spec Dry Run via Python")
     p.add_argument("--repos", required=True, help="Comma-separated repo list")
     p.add_argument("--base", default="main", help="Base branch")
     p.add_argument("--org", default=os.environ.get("LABLAB_ORG"), help="GitHub org/user")
-    return p.parse_args()
+    return p.parse_args(argv)
 
 
-def main() -> int:
-    args = parse_args()
+def main(argv=None) -> int:
+    args = parse_args(argv)
     token = os.environ.get("LABLAB_GH_PAT") or os.environ.get("GH_TOKEN")
     if not token:
         print("ERROR: LABLAB_GH_PAT environment variable not set", file=sys.stderr)
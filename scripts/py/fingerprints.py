@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Fingerprint store used to skip spec start steps whose inputs have not changed.
+
+A fingerprint is a sha256 over the relative paths and contents of a step's inputs (spec folder,
+template set for the repo type, tiers files). Fingerprints are kept per {spec, repo} and step in
+${LABLAB_STATE_DIR:-~/.lablab/state}/fingerprints.json. Callers record a fingerprint only after the
+step succeeded, and pass --force to ignore the store.
+
+Usage (inspect/clear):
+  python3 scripts/py/fingerprints.py show
+  python3 scripts/py/fingerprints.py clear --key 003-tiered-architecture/lablab-bean-console
+"""
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+def repo_root() -> Path:
+    """Orchestrator checkout (configs/, specs/, templates/): LABLAB_ROOT, else the tree this file lives in.
+
+    From the zipapp build that tree is the .pyz itself, so the checkout is found from the working
+    directory instead.
+    """
+    if os.environ.get("LABLAB_ROOT"):
+        return Path(os.environ["LABLAB_ROOT"]).resolve()
+    here = Path(__file__).resolve().parents[2]
+    if here.is_dir():
+        return here
+    for d in (Path.cwd(), *Path.cwd().parents):
+        if (d / "configs" / "repos.json").is_file():
+            return d
+    return Path.cwd()
+
+
+ROOT = repo_root()
+
+
+def state_dir() -> Path:
+    return Path(os.environ.get("LABLAB_STATE_DIR", str(Path.home() / ".lablab" / "state")))
+
+
+def hash_paths(paths: Iterable[Path], base: Path = ROOT) -> str:
+    """Hash files (directories are walked) by path relative to `base` and content."""
+    h = hashlib.sha256()
+    files = []
+    for p in paths:
+        if p.is_dir():
+            files.extend(f for f in p.rglob("*") if f.is_file())
+        elif p.is_file():
+            files.append(p)
+        else:
+            h.update(f"missing:{p}\0".encode("utf-8"))
+    for f in sorted(set(files)):
+        try:
+            rel = f.resolve().relative_to(base.resolve()).as_posix()
+        except ValueError:
+            rel = f.as_posix()
+        h.update(rel.encode("utf-8") + b"\0")
+        h.update(hashlib.sha256(f.read_bytes()).digest())
+    return h.hexdigest()
+
+
+def template_inputs(rtype: str) -> list:
+    """Everything that determines what bootstrap writes for a repo type."""
+    return [
+        ROOT / "templates" / "manifest.json",
+        ROOT / "templates" / "common",
+        ROOT / "templates" / rtype,
+        ROOT / "scripts" / "py" / "bootstrap_repo.py",
+    ]
+
+
+def tiers_inputs() -> list:
+    return [ROOT / "templates" / "tiers" / "tiers.json", ROOT / "templates" / "tiers" / "tiers.schema.json"]
+
+
+class FingerprintStore:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or state_dir() / "fingerprints.json"
+        self.data: Dict[str, Dict[str, str]] = {}
+        if self.path.exists():
+            try:
+                self.data = json.loads(self.path.read_text(encoding="utf-8"))
+            except ValueError:
+                print(f"[fingerprint] ignoring unreadable store {self.path}")
+
+    @staticmethod
+    def key(spec: str, repo: str) -> str:
+        return f"{spec}/{repo}"
+
+    def is_current(self, key: str, step: str, fingerprint: str) -> bool:
+        return self.data.get(key, {}).get(step) == fingerprint
+
+    def record(self, key: str, step: str, fingerprint: str) -> None:
+        self.data.setdefault(key, {})[step] = fingerprint
+        self.save()
+
+    def forget(self, key: str) -> None:
+        if self.data.pop(key, None) is not None:
+            self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        tmp.replace(self.path)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Inspect or clear spec step fingerprints")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("show")
+    s = sub.add_parser("clear")
+    s.add_argument("--key", default=None, help="<spec>/<repo>; omit to clear everything")
+    args = p.parse_args()
+
+    store = FingerprintStore()
+    if args.cmd == "show":
+        print(json.dumps(store.data, indent=2, sort_keys=True))
+    elif args.key:
+        store.forget(args.key)
+        print(f"Cleared {args.key}")
+    else:
+        store.data = {}
+        store.save()
+        print(f"Cleared {store.path}")
+
+
+if __name__ == "__main__":
+    main()
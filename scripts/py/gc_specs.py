@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Garbage collection for spec worktrees, containers, bare repos and start_spec.py temp dirs.
+
+Inventory:
+- worktrees at ${LABLAB_SPECS_BASE}/<spec>/<repo>
+- `spec-*` docker compose projects (running or stopped)
+- bare repos at ${LABLAB_REPOS_BASE}/*.bare
+- temp dirs left by start_spec.py (`specstart-*` in the system temp dir)
+
+Worktrees whose spec is closed in specs/registry.json (done/closed/merged) are pruned together with
+their compose project; a `spec-*` compose project without a worktree is removed only when its compose
+working directory is gone (or with --include-unknown); old temp dirs are deleted.
+Bare repos then get `git worktree prune` and `git gc --auto`. Reclaimed bytes are reported, and
+--dry-run prints the plan without touching anything.
+"""
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+CLOSED_STATUSES = {"done", "closed", "merged"}
+
+
+def dir_size(path: Path) -> int:
+    total = 0
+    stack = [path]
+    while stack:
+        cur = stack.pop()
+        try:
+            with os.scandir(cur) as it:
+                for e in it:
+                    try:
+                        if e.is_dir(follow_symlinks=False):
+                            stack.append(Path(e.path))
+                        else:
+                            total += e.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        pass
+        except (NotADirectoryError, FileNotFoundError, PermissionError):
+            pass
+    return total
+
+
+def spec_statuses(registry_path: Path) -> Dict[str, str]:
+    """Map spec id (both '3' and '003' forms) to its registry status."""
+    if not registry_path.exists():
+        return {}
+    reg = json.loads(registry_path.read_text(encoding="utf-8"))
+    out: Dict[str, str] = {}
+    for s in reg.get("specs", []):
+        sid = str(s.get("id"))
+        status = str(s.get("status") or "").lower()
+        out[sid] = status
+        if sid.isdigit():
+            out[str(int(sid))] = status
+            out[f"{int(sid):03d}"] = status
+    return out
+
+
+def list_worktrees(specs_base: Path) -> List[Dict]:
+    out = []
+    if not specs_base.exists():
+        return out
+    for spec_dir in sorted(p for p in specs_base.iterdir() if p.is_dir() and not p.name.startswith(".")):
+        for wdir in sorted(p for p in spec_dir.iterdir() if p.is_dir()):
+            out.append({"spec": spec_dir.name, "repo": wdir.name, "path": wdir, "project": f"spec-{spec_dir.name}-{wdir.name}"})
+    return out
+
+
+def list_compose_projects() -> Optional[Dict[str, str]]:
+    """`spec-*` compose projects mapped to their compose working directory ('' when unlabeled)."""
+    if not shutil.which("docker"):
+        return None
+    p = subprocess.run(
+        ["docker", "ps", "-a", "--filter", "label=com.docker.compose.project",
+         "--format", '{{.Label "com.docker.compose.project"}}\t{{.Label "com.docker.compose.project.working_dir"}}'],
+        capture_output=True,
+    )
+    if p.returncode != 0:
+        return None
+    out: Dict[str, str] = {}
+    for line in p.stdout.decode("utf-8", "ignore").splitlines():
+        project, _, workdir = line.strip().partition("\t")
+        if project.startswith("spec-"):
+            out[project] = out.get(project) or workdir.strip()
+    return out
+
+
+def list_temp_dirs(max_age_hours: float) -> List[Path]:
+    cutoff = time.time() - max_age_hours * 3600
+    tmp = Path(tempfile.gettempdir())
+    return sorted(p for p in tmp.glob("specstart-*") if p.is_dir() and p.stat().st_mtime < cutoff)
+
+
+def _run(cmd: List[str], dry_run: bool, cwd: Optional[Path] = None) -> bool:
+    print(f"{'(dry-run) ' if dry_run else ''}$ {' '.join(cmd)}")
+    if dry_run:
+        return True
+    return subprocess.run(cmd, cwd=cwd).returncode == 0
+
+
+def collect(specs_base: Path, repos_base: Path, registry_path: Path, include_unknown: bool = False,
+            tmp_age_hours: float = 24.0, dry_run: bool = False, on_pruned=None) -> Dict:
+    statuses = spec_statuses(registry_path)
+    report: Dict = {"dry_run": dry_run, "worktrees": [], "projects": [], "temp_dirs": [], "bare": [], "reclaimed_bytes": 0}
+
+    worktrees = list_worktrees(specs_base)
+    live_projects, pruned_projects = set(), set()
+    for wt in worktrees:
+        status = statuses.get(wt["spec"])
+        prune = (status in CLOSED_STATUSES) or (status is None and include_unknown)
+        item = {"spec": wt["spec"], "repo": wt["repo"], "path": str(wt["path"]), "status": status or "unknown",
+                "action": "prune" if prune else "keep"}
+        report["worktrees"].append(item)
+        if not prune:
+            live_projects.add(wt["project"])
+            continue
+        pruned_projects.add(wt["project"])
+        size = dir_size(wt["path"])
+        if (wt["path"] / "docker-compose.yml").exists():
+            _run(["docker", "compose", "-p", wt["project"], "down", "--remove-orphans"], dry_run, cwd=wt["path"])
+        bare = repos_base / f"{wt['repo']}.bare"
+        if bare.exists():
+            _run(["git", "--git-dir", str(bare), "worktree", "remove", "--force", str(wt["path"])], dry_run)
+        if not dry_run and wt["path"].exists():
+            shutil.rmtree(wt["path"], ignore_errors=True)
+        if not dry_run and on_pruned:
+            on_pruned(wt["spec"], wt["repo"])
+        item["bytes"] = size
+        report["reclaimed_bytes"] += size
+
+    projects = list_compose_projects()
+    if projects is None:
+        report["projects"] = "docker unavailable"
+    else:
+        for project, workdir in sorted(projects.items()):
+            # Not every spec-* project is ours to judge: without --include-unknown only those whose
+            # compose directory no longer exists are torn down
+            gone = bool(workdir) and not Path(workdir).exists()
+            orphan = project not in live_projects and (project in pruned_projects or include_unknown or gone)
+            report["projects"].append({"project": project, "working_dir": workdir, "action": "remove" if orphan else "keep"})
+            if orphan:
+                _run(["docker", "compose", "-p", project, "down", "--remove-orphans"], dry_run)
+
+    for tmp in list_temp_dirs(tmp_age_hours):
+        size = dir_size(tmp)
+        report["temp_dirs"].append({"path": str(tmp), "bytes": size})
+        report["reclaimed_bytes"] += size
+        print(f"{'(dry-run) ' if dry_run else ''}rm -rf {tmp}")
+        if not dry_run:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    if repos_base.exists():
+        for bare in sorted(repos_base.glob("*.bare")):
+            before = dir_size(bare)
+            _run(["git", "--git-dir", str(bare), "worktree", "prune"], dry_run)
+            _run(["git", "--git-dir", str(bare), "gc", "--auto", "--quiet"], dry_run)
+            after = dir_size(bare) if not dry_run else before
+            report["bare"].append({"path": str(bare), "bytes_before": before, "bytes_after": after})
+            report["reclaimed_bytes"] += max(0, before - after)
+
+    for dirpath in sorted({Path(w["path"]).parent for w in report["worktrees"] if w["action"] == "prune"}):
+        if not dry_run and dirpath.exists() and not any(dirpath.iterdir()):
+            dirpath.rmdir()
+    return report
+
+
+def human_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def print_report(report: Dict) -> None:
+    for w in report["worktrees"]:
+        print(f"worktree {w['spec']}/{w['repo']}: {w['action']} (status={w['status']})")
+    if isinstance(report["projects"], str):
+        print(f"compose projects: {report['projects']}")
+    else:
+        for p in report["projects"]:
+            print(f"compose {p['project']}: {p['action']}")
+    for t in report["temp_dirs"]:
+        print(f"temp {t['path']}: remove ({human_bytes(t['bytes'])})")
+    for b in report["bare"]:
+        print(f"bare {b['path']}: {human_bytes(b['bytes_before'])} -> {human_bytes(b['bytes_after'])}")
+    verb = "would reclaim" if report["dry_run"] else "reclaimed"
+    print(f"\ngc: {verb} {human_bytes(report['reclaimed_bytes'])}")
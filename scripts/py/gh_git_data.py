@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Commit files to a GitHub repo through the Git Data API, without a local clone.
+
+Flow per repo: read the branch ref (or the base ref for a new branch) -> build a tree on top of its tree ->
+create commit -> create or fast-forward the branch ref. Re-runs therefore stack on the existing spec branch.
+UTF-8 text files are inlined into the tree request (no blob calls); binary files are uploaded as blobs
+once per repo. Files under the `prune` directory that the branch has but the file set lacks are deleted
+(`sha: null` entries), so the result matches a clone-mode copy of the folder. File contents are read and encoded once and reused across every repo in a run.
+"""
+import base64
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+GITHUB_API = "https://api.github.com"
+
+
+def headers(token: str) -> dict:
+    return {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/vnd.github+json",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+
+
+def git_blob_sha(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class FileSet:
+    """Files to commit, keyed by repo-relative path; contents are shared across repos."""
+
+    def __init__(self):
+        self.files: Dict[str, bytes] = {}
+        self._text: Dict[str, Optional[str]] = {}
+        self._b64: Dict[str, str] = {}
+
+    def add_file(self, src: Path, dst: str) -> None:
+        self.files[dst] = src.read_bytes()
+
+    def add_tree(self, src: Path, dst_prefix: str) -> None:
+        for p in sorted(src.rglob("*")):
+            if p.is_file():
+                self.add_file(p, f"{dst_prefix}/{p.relative_to(src).as_posix()}")
+
+    def subset(self, paths: List[str]) -> "FileSet":
+        fs = FileSet()
+        fs.files = {k: self.files[k] for k in paths}
+        fs._text, fs._b64 = self._text, self._b64
+        return fs
+
+    def text(self, data: bytes) -> Optional[str]:
+        key = git_blob_sha(data)
+        if key not in self._text:
+            try:
+                self._text[key] = None if b"\0" in data else data.decode("utf-8")
+            except UnicodeDecodeError:
+                self._text[key] = None
+        return self._text[key]
+
+    def b64(self, data: bytes) -> str:
+        key = git_blob_sha(data)
+        if key not in self._b64:
+            self._b64[key] = base64.b64encode(data).decode("ascii")
+        return self._b64[key]
+
+
+class GitDataClient:
+    def __init__(self, org: str, repo: str, token: str, session: Optional[requests.Session] = None):
+        self.base = f"{GITHUB_API}/repos/{org}/{repo}"
+        self.repo = repo
+        self.session = session or requests.Session()
+        self.session.headers.update(headers(token))
+        self.calls = 0
+        self._uploaded: Dict[str, str] = {}
+
+    def _req(self, method: str, path: str, ok: Tuple[int, ...] = (200, 201), **kw) -> requests.Response:
+        self.calls += 1
+        r = self.session.request(method, f"{self.base}{path}", timeout=60, **kw)
+        if r.status_code not in ok:
+            raise RuntimeError(f"{method} {path} failed for {self.repo}: {r.status_code} {r.text}")
+        return r
+
+    def head_commit(self, branch: str, missing_ok: bool = False) -> Optional[Tuple[str, str]]:
+        """Return (commit_sha, tree_sha) of `branch`; None when it doesn't exist and `missing_ok`."""
+        r = self._req("GET", f"/git/ref/heads/{branch}", ok=(200, 404) if missing_ok else (200,))
+        if r.status_code == 404:
+            return None
+        sha = r.json()["object"]["sha"]
+        commit = self._req("GET", f"/git/commits/{sha}").json()
+        return sha, commit["tree"]["sha"]
+
+    def blobs_under(self, tree_sha: str, prefix: str) -> Dict[str, str]:
+        """{path: mode} of every file below directory `prefix` in tree `tree_sha` ({} when it is absent)."""
+        sha = tree_sha
+        for part in prefix.strip("/").split("/"):
+            entries = self._req("GET", f"/git/trees/{sha}").json()["tree"]
+            sha = next((e["sha"] for e in entries if e["path"] == part and e["type"] == "tree"), None)
+            if sha is None:
+                return {}
+        listing = self._req("GET", f"/git/trees/{sha}", params={"recursive": "1"}).json()
+        if listing.get("truncated"):
+            raise RuntimeError(f"{self.repo}: tree listing of {prefix} is truncated; cannot tell which files to delete")
+        return {f"{prefix.strip('/')}/{e['path']}": e["mode"] for e in listing["tree"] if e["type"] == "blob"}
+
+    def blob(self, fileset: FileSet, data: bytes) -> str:
+        sha = git_blob_sha(data)
+        if sha not in self._uploaded:
+            body = {"content": fileset.b64(data), "encoding": "base64"}
+            self._uploaded[sha] = self._req("POST", "/git/blobs", json=body).json()["sha"]
+        return self._uploaded[sha]
+
+    def tree(self, base_tree: str, fileset: FileSet, deleted: Optional[Dict[str, str]] = None) -> str:
+        """Tree of `base_tree` with `fileset` written and `deleted` ({path: mode}) removed."""
+        entries = [{"path": path, "mode": mode, "type": "blob", "sha": None}
+                   for path, mode in sorted((deleted or {}).items())]
+        for path, data in sorted(fileset.files.items()):
+            entry = {"path": path, "mode": "100644", "type": "blob"}
+            text = fileset.text(data)
+            if text is not None:
+                entry["content"] = text
+            else:
+                entry["sha"] = self.blob(fileset, data)
+            entries.append(entry)
+        return self._req("POST", "/git/trees", json={"base_tree": base_tree, "tree": entries}).json()["sha"]
+
+    def commit(self, message: str, tree: str, parent: str, author: Optional[Dict] = None) -> str:
+        body = {"message": message, "tree": tree, "parents": [parent]}
+        if author:
+            body["author"] = author
+        return self._req("POST", "/git/commits", json=body).json()["sha"]
+
+    def set_branch(self, branch: str, sha: str) -> None:
+        r = self._req("POST", "/git/refs", ok=(201, 422), json={"ref": f"refs/heads/{branch}", "sha": sha})
+        if r.status_code == 422:
+            # Branch already exists; only move it forward (same as a non-forced push)
+            self._req("PATCH", f"/git/refs/heads/{branch}", json={"sha": sha, "force": False})
+
+
+def commit_files(client: GitDataClient, base: str, branch: str, fileset: FileSet, message: str,
+                 author: Optional[Dict] = None, prune: Optional[str] = None) -> Optional[str]:
+    """Commit `fileset` on top of `branch` (created from `base` if missing). Returns the commit sha, or None if no-op.
+
+    Files below directory `prune` that are not in `fileset` are deleted.
+    """
+    existing = client.head_commit(branch, missing_ok=True)
+    parent, parent_tree = existing or client.head_commit(base)
+    stale = {}
+    if prune:
+        stale = {p: m for p, m in client.blobs_under(parent_tree, prune).items() if p not in fileset.files}
+        if stale:
+            print(f"[api] {client.repo}: removing {len(stale)} file(s) no longer in {prune}")
+    tree = client.tree(parent_tree, fileset, stale)
+    if tree == parent_tree:
+        if existing:
+            print(f"[api] {client.repo}: {branch} already has these files; nothing to commit")
+        else:
+            print(f"[api] {client.repo}: files already match {base}; creating branch without a commit")
+            client.set_branch(branch, parent)
+        return None
+    sha = client.commit(message, tree, parent, author)
+    client.set_branch(branch, sha)
+    return sha
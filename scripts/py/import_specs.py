@@ -14,6 +14,8 @@ import re
 import shutil
 from pathlib import Path
 
+from fingerprints import repo_root
+
 
 def slugify(name: str) -> str:
     s = name.strip().lower()
@@ -37,14 +39,14 @@ def save_registry(path: Path, reg: dict):
     path.write_text(json.dumps(reg, indent=2) + "\n", encoding="utf-8")
 
 
-def main():
+def main(argv=None):
     p = argparse.ArgumentParser()
     p.add_argument("--src", required=True, help="Folder with .md files to import")
     p.add_argument("--default-repos", default="lablab-bean", help="Comma-separated repos for meta")
     p.add_argument("--prefix", default="", help="Optional ID prefix for grouping (ignored in folder name)")
-    args = p.parse_args()
+    args = p.parse_args(argv)
 
-    root = Path(__file__).resolve().parents[2]
+    root = repo_root()
     specs_dir = root / "specs"
     reg_path = specs_dir / "registry.json"
     reg = load_registry(reg_path)
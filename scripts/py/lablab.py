@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the orchestrator scripts.
+
+  lablab <command> [args...]     e.g. lablab start --spec 003 ..., lablab apply --spec 003 --repo ...
+
+Each command is the existing script's main(argv); its module is imported only when that command runs,
+so `lablab --help` and `lablab status` never load requests/yaml/langgraph. Shared setup done once here:
+the orchestrator checkout is located (fingerprints.repo_root) and its .env is loaded without
+overriding variables already exported in the shell.
+
+`lablab status` is answered natively from specs/registry.json, the event log and the spec worktrees'
+HEAD files (no git or docker calls). `lablab zipapp` packs scripts/py and agents/langgraph into a single
+dist/lablab.pyz that runs with any python3 (third-party deps are still needed for the commands using them):
+
+  python3 scripts/py/lablab.py zipapp && scp dist/lablab.pyz mac:~/bin/lablab
+  cd ~/lablab-bean-orchestrator && lablab status
+"""
+import os
+import sys
+from pathlib import Path
+
+CODE_ROOT = Path(__file__).resolve().parents[2]  # the checkout, or the .pyz when running from the zipapp
+SCRIPTS = CODE_ROOT / "scripts" / "py"
+
+# name -> (module, summary); modules under agents/ are imported as packages, the rest from scripts/py
+COMMANDS = {
+    "start": ("start_spec", "create spec docs/branches in the target repos"),
+    "specctl": ("specctl", "start/stop/status/bootstrap/check spec worktrees and containers"),
+    "import": ("import_specs", "import spec folders from another tree"),
+    "new": ("new_spec", "scaffold a new spec folder and registry entry"),
+    "kit": ("spec_kit_compat", "Spec-Kit compatible create/plan/tasks commands"),
+    "resolve": ("resolve_apply", "resolve which spec tasks still need applying"),
+    "apply": ("agents.langgraph.apply_task", "apply one spec task to a repo (LLM patch, build, test, push)"),
+    "tasks": ("agents.langgraph.run_tasks", "run the tasks of a spec through the LLM"),
+    "batch": ("batch_apply", "apply tasks across repos in batches"),
+    "dry-run": ("dry_run", "preview what an apply would do"),
+    "sync": ("sync_spec_to_repo", "copy spec docs into a repo worktree"),
+    "events": ("spec_events", "event-driven spec lifecycle: scan/watch/queue/run"),
+    "bootstrap": ("bootstrap_repo", "apply repo-type templates to a worktree"),
+    "tiers": ("tiers", "check/lookup/order the plugin tier index"),
+    "prefetch": ("prefetch_images", "pull missing or stale container images"),
+    "cache": ("build_cache", "inspect or trim the host build cache"),
+    "container": ("container_exec", "build servers in a spec container: status/shutdown"),
+    "tests": ("dotnet_shards", "run dotnet tests in history-balanced shards"),
+    "workers": ("workers", "build/test worker pool status and selftest"),
+    "llm": ("agents.langgraph.scheduler", "LLM scheduler selftest against a mock server"),
+    "speculate": ("agents.langgraph.speculate", "speculative apply win rates"),
+    "transplant": ("agents.langgraph.transplant", "stored cross-repo patches"),
+}
+NATIVE = {
+    "status": "registered specs, event queue and worktrees (fast, read-only)",
+    "zipapp": "build dist/lablab.pyz",
+}
+
+
+def usage() -> str:
+    lines = ["usage: lablab <command> [args...]", "", "commands:"]
+    for name, summary in sorted([(n, s) for n, (_, s) in COMMANDS.items()] + list(NATIVE.items())):
+        lines.append(f"  {name:<11} {summary}")
+    lines += ["", "Run `lablab <command> --help` for the command's options."]
+    return "\n".join(lines)
+
+
+def load_env(root: Path) -> None:
+    """KEY=VALUE lines from <root>/.env; exported variables win."""
+    path = root / ".env"
+    if not path.is_file():
+        return
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.removeprefix("export ").split("=", 1)
+        os.environ.setdefault(key.strip(), value.strip().strip("'\""))
+
+
+# ---- native commands ----
+
+def _head(worktree: Path) -> str:
+    git = worktree / ".git"
+    if git.is_file():  # linked worktree: "gitdir: <path>"
+        git = Path(git.read_text(encoding="utf-8").split(":", 1)[1].strip())
+    try:
+        head = (git / "HEAD").read_text(encoding="utf-8").strip()
+    except OSError:
+        return "?"
+    return head.removeprefix("ref: refs/heads/") if head.startswith("ref: ") else head[:12]
+
+
+def cmd_status(argv) -> int:
+    import argparse
+    import json
+
+    from fingerprints import repo_root, state_dir
+
+    p = argparse.ArgumentParser(prog="lablab status", description=NATIVE["status"])
+    p.add_argument("--spec", help="only this spec id")
+    p.add_argument("--json", action="store_true")
+    args = p.parse_args(argv)
+
+    root = repo_root()
+    registry = root / "specs" / "registry.json"
+    specs = json.loads(registry.read_text(encoding="utf-8")).get("specs", []) if registry.exists() else []
+    events_path = state_dir() / "events.jsonl"
+    state = {"specs": {}, "pending": []}
+    if events_path.exists():
+        from spec_events import EventLog, reduce_events
+
+        state = reduce_events(EventLog(events_path).read())
+    base_specs = Path(os.environ.get("LABLAB_SPECS_BASE", "/srv/specs"))
+
+    rows = []
+    for s in specs:
+        sid = int(s["id"])
+        if args.spec and int(args.spec) != sid:
+            continue
+        key = next((k for k in state["specs"] if k.split("-", 1)[0].isdigit() and int(k.split("-", 1)[0]) == sid),
+                   f"{sid:03d}-{s['slug']}")
+        ev = state["specs"].get(key, {})
+        repos = {}
+        for repo, r in sorted(ev.get("repos", {}).items()):
+            repos[repo] = {"applied": len(r.get("applied", [])), "tasks": len(r.get("task_ids", [])),
+                           "verified": bool(r.get("sha")) and r.get("sha") == r.get("verified_sha")}
+        for spec_dir in {base_specs / str(sid), base_specs / f"{sid:03d}"}:
+            if spec_dir.is_dir():
+                for wt in sorted(d for d in spec_dir.iterdir() if (d / ".git").exists()):
+                    repos.setdefault(wt.name, {})["worktree"] = {"path": str(wt), "head": _head(wt)}
+        rows.append({"id": sid, "slug": s["slug"], "status": ev.get("status") or s.get("status"), "repos": repos,
+                     "pending": [i for i in state["pending"] if i["spec"] == key]})
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    if not rows:
+        print(f"No specs registered in {registry}")
+    for row in rows:
+        print(f"{row['id']:>03} {row['slug']}  [{row['status']}]")
+        for repo, r in row["repos"].items():
+            parts = []
+            if "tasks" in r:
+                parts.append(f"applied {r['applied']}/{r['tasks']}" + (", verified" if r["verified"] else ""))
+            if "worktree" in r:
+                parts.append(f"worktree {r['worktree']['head']}")
+            print(f"    {repo:<28} {'; '.join(parts) or '-'}")
+        for item in row["pending"]:
+            print(f"    pending {item['step']} {item.get('repo') or '*'}")
+    return 0
+
+
+def cmd_zipapp(argv) -> int:
+    import argparse
+    import shutil
+    import tempfile
+    import zipapp
+
+    p = argparse.ArgumentParser(prog="lablab zipapp", description=NATIVE["zipapp"])
+    p.add_argument("--output", default=None, help="default: dist/lablab.pyz in the checkout")
+    p.add_argument("--python", default="/usr/bin/env python3", help="shebang interpreter")
+    args = p.parse_args(argv)
+
+    from fingerprints import repo_root
+
+    out = Path(args.output or repo_root() / "dist" / "lablab.pyz").resolve()
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        stage = Path(tmp)
+        # The package directories end up as zip directory entries, which zipimport needs to find
+        # scripts/ and agents/ as namespace packages
+        for pkg in ("scripts/py", "agents/langgraph"):
+            (stage / pkg).mkdir(parents=True)
+            for src in sorted((CODE_ROOT / pkg).glob("*.py")):
+                shutil.copy2(src, stage / pkg / src.name)
+        # zipapp's generated __main__ would drop main()'s exit code
+        (stage / "__main__.py").write_text("import sys\n\nfrom scripts.py.lablab import main\n\nsys.exit(main())\n",
+                                           encoding="utf-8")
+        zipapp.create_archive(stage, out, interpreter=args.python, compressed=True)
+    print(f"Wrote {out} ({out.stat().st_size // 1024} KiB)")
+    return 0
+
+
+# ---- dispatch ----
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help", "help"):
+        print(usage())
+        return 0
+    cmd, rest = argv[0], argv[1:]
+    if cmd not in COMMANDS and cmd not in NATIVE:
+        print(f"lablab: unknown command {cmd!r}\n\n{usage()}", file=sys.stderr)
+        return 2
+
+    # scripts/py modules import their siblings top-level; agents modules import scripts.py.* from the root.
+    # Only one of the two is put on sys.path so shared modules (proc_runner's runner) load once.
+    module = COMMANDS.get(cmd, ("",))[0]
+    as_package = module.startswith("agents.")
+    sys.path[:] = [p for p in sys.path if Path(p or ".").resolve() not in (SCRIPTS, CODE_ROOT)]
+    sys.path.insert(0, str(CODE_ROOT if as_package else SCRIPTS))
+    if as_package:
+        from scripts.py.fingerprints import repo_root
+    else:
+        from fingerprints import repo_root
+
+    load_env(repo_root())
+    if cmd == "status":
+        return cmd_status(rest)
+    if cmd == "zipapp":
+        return cmd_zipapp(rest)
+
+    import importlib
+
+    sys.argv = [f"lablab {cmd}"] + rest  # argparse prog name
+    code = importlib.import_module(module).main(rest)
+    return code if isinstance(code, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
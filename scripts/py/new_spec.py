@@ -4,6 +4,8 @@ import json
 from pathlib import Path
 from datetime import datetime
 
+from fingerprints import repo_root
+
 
 def load_registry(path: Path) -> dict:
     if path.exists():
@@ -16,14 +18,14 @@ def next_id(registry: dict) -> int:
     return (max(ids) + 1) if ids else 1
 
 
-def main():
+def main(argv=None):
     p = argparse.ArgumentParser()
     p.add_argument("--slug", required=True)
     p.add_argument("--repos", required=True, help="comma-separated repos")
     p.add_argument("--title", default="")
-    args = p.parse_args()
+    args = p.parse_args(argv)
 
-    root = Path(__file__).resolve().parents[2]
+    root = repo_root()
     specs_dir = root / "specs"
     reg_path = specs_dir / "registry.json"
     reg = load_registry(reg_path)
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Prefetch container images listed in configs/repos.json so `specctl start` never pulls inline.
+
+For each configured image:
+- Ask the registry for the current manifest digest (HEAD /v2/<name>/manifests/<tag>, anonymous
+  bearer token when challenged) and compare it with the local image's RepoDigests.
+- Pull only when the image is missing locally or upstream has moved; digest-pinned refs are pulled
+  only when missing.
+- Pulls run with bounded parallelism; digests and check times are recorded in
+  ${LABLAB_STATE_DIR:-~/.lablab/state}/images.json so scheduled runs can skip recently checked images.
+
+Registries on localhost/127.0.0.1 (or listed in LABLAB_INSECURE_REGISTRIES, comma-separated) are
+spoken to over plain HTTP, so a local `registry:2` container works as a stand-in (`--selftest`).
+Failures (registry errors, a non-JSON token response, no docker binary) are reported per image and
+never end the pass or the --loop.
+
+Usage:
+  python3 scripts/py/prefetch_images.py                 # one pass over every configured image
+  python3 scripts/py/prefetch_images.py --loop 3600      # keep warming on a schedule
+  python3 scripts/py/prefetch_images.py --dry-run       # report what would be pulled
+  python3 scripts/py/prefetch_images.py --selftest      # missing/unchanged/moved round trip on a local registry:2
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from clone_strategy import load_repos_config
+from fingerprints import repo_root, state_dir
+
+ROOT = repo_root()
+MANIFEST_ACCEPT = ", ".join([
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+])
+
+
+def configured_images(repos_cfg: Dict) -> List[str]:
+    return sorted({cfg["image"] for cfg in repos_cfg.values() if isinstance(cfg, dict) and cfg.get("image")})
+
+
+def parse_ref(ref: str) -> Tuple[str, str, str, Optional[str]]:
+    """Split an image ref into (registry, repository, tag, digest)."""
+    name, _, digest = ref.partition("@")
+    tag = "latest"
+    head, _, last = name.rpartition("/")
+    if ":" in last:
+        last, tag = last.split(":", 1)
+        name = f"{head}/{last}" if head else last
+    parts = name.split("/", 1)
+    if len(parts) == 2 and ("." in parts[0] or ":" in parts[0] or parts[0] == "localhost"):
+        registry, repo = parts
+    else:
+        registry, repo = "docker.io", name
+        if "/" not in repo:
+            repo = f"library/{repo}"
+    return registry, repo, tag, digest or None
+
+
+def registry_base(registry: str) -> str:
+    insecure = {r.strip() for r in os.environ.get("LABLAB_INSECURE_REGISTRIES", "").split(",") if r.strip()}
+    host = registry.split(":")[0]
+    scheme = "http" if host in ("localhost", "127.0.0.1") or registry in insecure else "https"
+    if registry == "docker.io":
+        registry = "registry-1.docker.io"
+    return f"{scheme}://{registry}"
+
+
+def remote_digest(ref: str, session: requests.Session, timeout: float = 20.0) -> Optional[str]:
+    registry, repo, tag, digest = parse_ref(ref)
+    if digest:
+        return digest
+    url = f"{registry_base(registry)}/v2/{repo}/manifests/{tag}"
+    hdrs = {"Accept": MANIFEST_ACCEPT}
+    r = session.head(url, headers=hdrs, timeout=timeout)
+    if r.status_code == 401 and "bearer" in r.headers.get("WWW-Authenticate", "").lower():
+        params = dict(re.findall(r'(\w+)="([^"]*)"', r.headers["WWW-Authenticate"]))
+        realm = params.pop("realm", None)
+        if realm:
+            params.setdefault("scope", f"repository:{repo}:pull")
+            tok = session.get(realm, params=params, timeout=timeout).json()
+            hdrs["Authorization"] = f"Bearer {tok.get('token') or tok.get('access_token')}"
+            r = session.head(url, headers=hdrs, timeout=timeout)
+    if r.status_code != 200:
+        return None
+    return r.headers.get("Docker-Content-Digest")
+
+
+def local_digests(ref: str) -> Optional[List[str]]:
+    """RepoDigests of the local image (possibly empty), or None when it isn't present."""
+    p = subprocess.run(["docker", "image", "inspect", "--format", "{{json .RepoDigests}}", ref],
+                       capture_output=True)
+    if p.returncode != 0:
+        return None
+    try:
+        return [d.split("@", 1)[1] for d in json.loads(p.stdout.decode("utf-8", "ignore") or "[]") if "@" in d]
+    except ValueError:
+        return []
+
+
+def plan_image(ref: str, state: Dict, session: requests.Session, min_interval: float) -> Dict:
+    entry = dict(state.get(ref, {}))
+    try:
+        local = local_digests(ref)
+    except OSError as e:
+        return {"image": ref, "action": "failed", "reason": "docker unavailable", "error": str(e), **entry}
+    now = time.time()
+    if local is not None and now - entry.get("checked_at", 0) < min_interval:
+        return {"image": ref, "action": "skip", "reason": "checked recently", **entry}
+    try:
+        upstream = remote_digest(ref, session)
+    except (requests.RequestException, ValueError) as e:  # ValueError: token endpoint answered non-JSON
+        upstream = None
+        entry["error"] = str(e)
+    entry["remote_digest"] = upstream
+    entry["checked_at"] = now
+    if local is None:
+        action, reason = "pull", "missing locally"
+    elif upstream and upstream not in local:
+        action, reason = "pull", "upstream digest changed"
+    else:
+        action, reason = "skip", "up to date" if upstream else "registry unreachable; keeping local"
+    return {"image": ref, "action": action, "reason": reason, **entry}
+
+
+def pull(item: Dict) -> Dict:
+    ref = item["image"]
+    started = time.monotonic()
+    print(f"[prefetch] pulling {ref} ({item['reason']})")
+    try:
+        p = subprocess.run(["docker", "pull", "--quiet", ref], capture_output=True)
+        error = p.stderr.decode("utf-8", "ignore").strip() if p.returncode != 0 else None
+    except OSError as e:
+        error = str(e)
+    item["seconds"] = round(time.monotonic() - started, 1)
+    if error is not None:
+        item["action"] = "failed"
+        item["error"] = error
+        print(f"[prefetch] {ref} failed: {item['error']}")
+    else:
+        item["action"] = "pulled"
+        item["local_digests"] = local_digests(ref) or []
+        print(f"[prefetch] {ref} pulled in {item['seconds']}s")
+    return item
+
+
+def prefetch(images: List[str], parallel: int = 2, min_interval: float = 0.0, dry_run: bool = False,
+             state_path: Optional[Path] = None) -> List[Dict]:
+    state_path = state_path or state_dir() / "images.json"
+    state = json.loads(state_path.read_text(encoding="utf-8")) if state_path.exists() else {}
+    session = requests.Session()
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        plans = list(pool.map(lambda ref: plan_image(ref, state, session, min_interval), images))
+        todo = [p for p in plans if p["action"] == "pull"]
+        if dry_run:
+            results = plans
+        else:
+            pulled = {p["image"]: p for p in pool.map(pull, todo)}
+            results = [pulled.get(p["image"], p) for p in plans]
+    for item in results:
+        if item["action"] in ("pulled", "skip"):
+            state[item["image"]] = {k: item[k] for k in ("remote_digest", "checked_at") if k in item}
+    if not dry_run:
+        state_path.parent.mkdir(parents=True, exist_ok=True)
+        state_path.write_text(json.dumps(state, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    for item in results:
+        print(f"[prefetch] {item['image']}: {item['action']} ({item['reason']})")
+    return results
+
+
+def spawn_background(log_path: Optional[Path] = None) -> Path:
+    """Start a detached prefetch pass (used by `specctl check --prefetch`); returns the log path."""
+    log_path = log_path or state_dir() / "prefetch.log"
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "ab") as log:
+        # By module name (not file path) so this also works from inside the zipapp build
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(Path(__file__).parent),
+                                                                        os.environ.get("PYTHONPATH")])))
+        subprocess.Popen([sys.executable, "-c", "import sys, prefetch_images; sys.exit(prefetch_images.main([]))"],
+                         cwd=str(ROOT), env=env, stdout=log, stderr=subprocess.STDOUT,
+                         stdin=subprocess.DEVNULL, start_new_session=True)
+    return log_path
+
+
+class _HtmlTokenRegistry(BaseHTTPRequestHandler):
+    """Registry that challenges for a bearer token whose endpoint answers with an HTML error page."""
+
+    def do_HEAD(self) -> None:
+        self.send_response(401)
+        host, port = self.server.server_address[:2]
+        self.send_header("WWW-Authenticate", f'Bearer realm="http://{host}:{port}/token",service="selftest"')
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(b"<html>login required</html>")
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def selftest() -> Dict:
+    """Round trip against a throwaway registry:2 on localhost, plus a registry with a broken token endpoint."""
+    docker = lambda *a, **kw: subprocess.run(["docker", *a], capture_output=True, text=True, check=True, **kw)  # noqa: E731
+    name = f"lablab-prefetch-selftest-{os.getpid()}"
+    tmp = Path(tempfile.mkdtemp(prefix="lablab-prefetch-"))
+    state = tmp / "images.json"
+    checks: Dict[str, Dict] = {}
+    ref = None
+    try:
+        docker("run", "-d", "--rm", "--name", name, "-p", "127.0.0.1::5000", "registry:2")
+        port = docker("port", name, "5000/tcp").stdout.splitlines()[0].rsplit(":", 1)[1].strip()
+        ref = f"localhost:{port}/lablab/selftest:latest"
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                if requests.get(f"http://localhost:{port}/v2/", timeout=2).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("registry:2 did not come up")
+            time.sleep(0.3)
+
+        def publish(label: str) -> None:
+            docker("build", "-q", "-t", ref, "-", input=f"FROM registry:2\nLABEL lablab.selftest={label}\n")
+            docker("push", "-q", ref)
+
+        publish("1")
+        docker("rmi", ref)
+        r = prefetch([ref], state_path=state)[0]
+        checks["missing_is_pulled"] = {"ok": r["action"] == "pulled", "action": r["action"], "reason": r["reason"]}
+        r = prefetch([ref], state_path=state)[0]
+        checks["unchanged_is_skipped"] = {"ok": r["action"] == "skip" and r["reason"] == "up to date",
+                                          "action": r["action"], "reason": r["reason"]}
+        old = docker("image", "inspect", "--format", "{{.Id}}", ref).stdout.strip()
+        publish("2")
+        docker("tag", old, ref)  # local copy is the old image again; upstream has moved
+        r = prefetch([ref], state_path=state)[0]
+        checks["moved_is_pulled"] = {"ok": r["action"] == "pulled" and r["reason"] == "upstream digest changed",
+                                     "action": r["action"], "reason": r["reason"]}
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _HtmlTokenRegistry)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            bad = f"127.0.0.1:{server.server_port}/lablab/selftest:latest"
+            r = plan_image(bad, {}, requests.Session(), 0.0)
+            checks["non_json_token_is_per_image"] = {"ok": "error" in r, "action": r["action"],
+                                                     "error": r.get("error", "")[:200]}
+        finally:
+            server.shutdown()
+    except (OSError, subprocess.CalledProcessError, RuntimeError) as e:
+        detail = getattr(e, "stderr", None) or str(e)
+        checks["setup"] = {"ok": False, "error": detail.strip()[:500]}
+    finally:
+        if shutil.which("docker"):
+            subprocess.run(["docker", "rm", "-f", name], capture_output=True)
+            if ref:
+                subprocess.run(["docker", "rmi", "-f", ref], capture_output=True)
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {"ok": all(c["ok"] for c in checks.values()), "checks": checks}
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Prefetch configured container images")
+    p.add_argument("--parallel", type=int, default=int(os.environ.get("LABLAB_PREFETCH_PARALLEL", "2")))
+    p.add_argument("--min-interval", type=float, default=0.0,
+                   help="skip the registry check for local images checked within this many seconds")
+    p.add_argument("--loop", type=float, default=0.0, help="repeat every N seconds (0 = run once)")
+    p.add_argument("--dry-run", action="store_true")
+    p.add_argument("--images", default=None, help="comma-separated refs (default: all in configs/repos.json)")
+    p.add_argument("--selftest", action="store_true", help="exercise a pass against a local registry:2 container")
+    args = p.parse_args(argv)
+
+    if args.selftest:
+        report = selftest()
+        print(json.dumps(report, indent=2))
+        return 0 if report["ok"] else 1
+
+    if args.images:
+        images = [i.strip() for i in args.images.split(",") if i.strip()]
+    else:
+        images = configured_images(load_repos_config(ROOT))
+    if not images:
+        print("[prefetch] no images configured")
+        return 0
+    while True:
+        results = prefetch(images, parallel=args.parallel, min_interval=args.min_interval, dry_run=args.dry_run)
+        if not args.loop:
+            return 1 if any(r["action"] == "failed" for r in results) else 0
+        time.sleep(args.loop)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
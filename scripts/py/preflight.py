@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Concurrent preflight for `specctl check`.
+
+- One targeted `git ls-remote --exit-code <url> refs/heads/<base>` per repo answers both "is the
+  remote reachable" and "does the base branch exist" (exit 2 = reachable, branch missing).
+- All repos are probed in parallel, each with its own timeout. Probes go through proc_runner, which
+  starts them in their own session and kills the whole process group on timeout, so an ssh grandchild
+  holding the pipes cannot stretch a probe past it.
+- Image presence for every configured image comes from a single `docker image ls` listing.
+- Results are returned as a structured report (also written as JSON with --report).
+"""
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+from proc_runner import CommandTimeout, get_runner
+
+DEFAULT_TIMEOUT = 20.0
+
+
+def probe_remote(url: str, base: str, timeout: float = DEFAULT_TIMEOUT) -> Dict:
+    started = time.monotonic()
+    cmd = ["git", "ls-remote", "--exit-code", url, f"refs/heads/{base}"]
+    try:
+        # Called from a pool thread: a private event loop per probe
+        p = asyncio.run(get_runner().run(cmd, prefix="", timeout=timeout, check=False, quiet=True,
+                                         env=_noninteractive_env()))
+        if p.returncode == 0:
+            remote, branch = "OK", "OK"
+        elif p.returncode == 2:
+            remote, branch = "OK", "NOT FOUND"
+        else:
+            remote, branch = "UNREACHABLE", "UNKNOWN"
+        error = p.stderr.strip() if p.returncode not in (0, 2) else ""
+    except CommandTimeout:
+        remote, branch, error = "TIMEOUT", "UNKNOWN", f"ls-remote exceeded {timeout:.0f}s"
+    except OSError as e:
+        remote, branch, error = "UNREACHABLE", "UNKNOWN", str(e)
+    return {
+        "url": url,
+        "remote": remote,
+        "base_branch": branch,
+        "base": base,
+        "error": error,
+        "seconds": round(time.monotonic() - started, 3),
+    }
+
+
+def _noninteractive_env() -> Dict[str, str]:
+    # Never block on credential/host-key prompts inside a parallel probe
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    env.setdefault("GIT_SSH_COMMAND", "ssh -o BatchMode=yes")
+    return env
+
+
+def normalize_image(ref: str) -> str:
+    """Canonical repo:tag so `dotnet/sdk:8.0` and `docker.io/library/...:latest` forms compare equal."""
+    name, _, digest = ref.partition("@")
+    last = name.rsplit("/", 1)[-1]
+    if ":" not in last and not digest:
+        name += ":latest"
+    for prefix in ("docker.io/library/", "docker.io/", "index.docker.io/library/", "index.docker.io/"):
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+            break
+    if name.startswith("library/"):
+        name = name[len("library/"):]
+    return name + (f"@{digest}" if digest else "")
+
+
+def local_images(timeout: float = DEFAULT_TIMEOUT) -> Optional[Set[str]]:
+    """All local image refs from one `docker image ls`; None when docker is unavailable."""
+    if not shutil.which("docker"):
+        return None
+    try:
+        p = subprocess.run(
+            ["docker", "image", "ls", "--no-trunc", "--format", "{{.Repository}}:{{.Tag}}|{{.Repository}}@{{.Digest}}"],
+            capture_output=True, timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return None
+    if p.returncode != 0:
+        return None
+    refs: Set[str] = set()
+    for line in p.stdout.decode("utf-8", "ignore").splitlines():
+        for ref in line.split("|"):
+            if ref and "<none>" not in ref:
+                refs.add(normalize_image(ref))
+    return refs
+
+
+def run_preflight(repos: List[str], repos_cfg: Dict, url_for, default_base: str,
+                  timeout: float = DEFAULT_TIMEOUT, workers: int = 8) -> Dict:
+    started = time.monotonic()
+    report: Dict = {"ok": True, "repos": {}}
+    probes = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(repos) or 1))) as pool:
+        images_future = pool.submit(local_images, timeout)
+        for repo in repos:
+            cfg = repos_cfg.get(repo)
+            if cfg:
+                probes[repo] = pool.submit(probe_remote, url_for(repo), cfg.get("base_branch") or default_base, timeout)
+        images = images_future.result()
+
+        for repo in repos:
+            cfg = repos_cfg.get(repo)
+            entry: Dict = {"config": "OK" if cfg else "MISSING"}
+            report["repos"][repo] = entry
+            if not cfg:
+                report["ok"] = False
+                continue
+            entry["type"] = cfg.get("type") or "MISSING"
+            entry.update(probes[repo].result())
+            if entry["type"] == "MISSING" or entry["remote"] != "OK" or entry["base_branch"] != "OK":
+                report["ok"] = False
+            if not cfg.get("container"):
+                entry["container"] = "disabled"
+                continue
+            image = cfg.get("image")
+            if not image:
+                entry["image"] = "MISSING"
+                report["ok"] = False
+            elif images is None:
+                entry["image"] = "DOCKER UNAVAILABLE"
+                report["ok"] = False
+            else:
+                entry["image"] = "PRESENT" if normalize_image(image) in images else "NOT LOCAL"
+            entry["image_ref"] = image
+    report["seconds"] = round(time.monotonic() - started, 3)
+    return report
+
+
+def print_report(report: Dict) -> None:
+    for repo, e in report["repos"].items():
+        print(f"--- {repo} ---")
+        print(f"config: {e['config']}")
+        if e["config"] != "OK":
+            continue
+        print(f"type: {e['type']}")
+        if e["remote"] == "OK":
+            print(f"remote: OK ({e['url']}) [{e['seconds']}s]")
+            print(f"base_branch: {e['base_branch']} ({e['base']})")
+        else:
+            print(f"remote: {e['remote']} ({e['url']}) {e['error']}".rstrip())
+        if "container" in e:
+            print(f"container: {e['container']}")
+        elif e["image"] == "NOT LOCAL":
+            print(f"image: NOT LOCAL ({e['image_ref']}) — will pull on start")
+        elif e["image"] == "MISSING":
+            print("image: MISSING while container=true")
+        else:
+            print(f"image: {e['image']} ({e['image_ref']})")
+    print(f"\npreflight: {'OK' if report['ok'] else 'FAILED'} in {report['seconds']}s")
+
+
+def write_report(report: Dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Shared asyncio process runner for specctl.py, start_spec.py and apply_task.py.
+
+- Per-command timeouts (LABLAB_CMD_TIMEOUT seconds by default, LABLAB_NET_TIMEOUT for git network
+  commands, 0 = none); a command that overruns is terminated, then killed after a short grace period,
+  and raises CommandTimeout.
+- Cancelling the awaiting task kills the child process.
+- Output is streamed line by line as it arrives, prefixed with the current repo/task label, and also
+  written to a rotating log (${LABLAB_STATE_DIR:-~/.lablab/state}/logs/commands.log).
+- At most LABLAB_MAX_PROCS commands run at once per runner.
+
+Async callers use `await get_runner().run(...)` / `gather(...)`; blocking scripts use the `run()` and
+`output()` wrappers, which raise CommandError (a CalledProcessError) on failure like `check=True` did.
+Label output with `with label("lablab-bean"):` or pass prefix= explicitly.
+"""
+import asyncio
+import contextlib
+import contextvars
+import logging
+import logging.handlers
+import os
+import shlex
+import subprocess
+import sys
+import weakref
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    from fingerprints import state_dir
+except ImportError:  # imported as scripts.py.proc_runner from the agents package
+    from .fingerprints import state_dir
+
+# Default cap for commands that talk to a remote (fetch/pull/push over SSH can hang on the network)
+NETWORK_TIMEOUT = float(os.environ.get("LABLAB_NET_TIMEOUT", "300") or 0)
+PUMP_CHUNK = 64 * 1024  # bytes per read of a child's stdout/stderr
+
+_label: contextvars.ContextVar = contextvars.ContextVar("proc_label", default="")
+
+
+class CommandError(subprocess.CalledProcessError):
+    def __str__(self) -> str:
+        text = "\n".join(t for t in (self.output, self.stderr) if t)
+        tail = f"\n{text.strip()[-2000:]}" if text else ""
+        return f"Command {shlex.join(self.cmd)} exited with {self.returncode}{tail}"
+
+
+class CommandTimeout(CommandError):
+    def __init__(self, cmd: List[str], timeout: float, output: str = ""):
+        super().__init__(-9, cmd, output=output, stderr="")
+        self.timeout = timeout
+
+    def __str__(self) -> str:
+        return f"Command {shlex.join(self.cmd)} timed out after {self.timeout:.0f}s"
+
+
+@contextlib.contextmanager
+def label(prefix: str):
+    """Prefix streamed output of commands started in this block (threads and tasks inherit it)."""
+    token = _label.set(prefix)
+    try:
+        yield
+    finally:
+        _label.reset(token)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class ProcessRunner:
+    def __init__(self, concurrency: int = 4, timeout: Optional[float] = None, log_path: Optional[Path] = None,
+                 max_log_bytes: int = 5 * 1024 * 1024, backups: int = 3, echo: bool = True, grace: float = 5.0):
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout or None
+        self.echo = echo
+        self.grace = grace
+        self._sems: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.log = logging.getLogger(f"lablab.proc.{id(self)}")
+        self.log.propagate = False
+        self.log.setLevel(logging.INFO)
+        if log_path:
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=max_log_bytes, backupCount=backups,
+                                                           encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.log.addHandler(handler)
+
+    def _sem(self) -> asyncio.Semaphore:
+        # asyncio primitives are bound to one loop; blocking callers run each command in a fresh loop
+        loop = asyncio.get_running_loop()
+        sem = self._sems.get(loop)
+        if sem is None:
+            sem = self._sems[loop] = asyncio.Semaphore(self.concurrency)
+        return sem
+
+    def _emit(self, prefix: str, line: str, echo: bool = True) -> None:
+        text = f"[{prefix}] {line}" if prefix else line
+        if echo and self.echo:
+            print(text, flush=True)
+        self.log.info(text)
+
+    async def _pump(self, stream: asyncio.StreamReader, prefix: str, lines: List[str], echo: bool) -> None:
+        # Chunked reads split on newlines here: StreamReader.readline() raises past its 64 KiB line limit
+        pending = b""
+        while True:
+            chunk = await stream.read(PUMP_CHUNK)
+            if not chunk:
+                break
+            *complete, pending = (pending + chunk).split(b"\n")
+            for raw in complete:
+                self._emit_line(prefix, raw, lines, echo)
+        if pending:
+            self._emit_line(prefix, pending, lines, echo)
+
+    def _emit_line(self, prefix: str, raw: bytes, lines: List[str], echo: bool) -> None:
+        line = raw.decode("utf-8", "replace").rstrip("\r")
+        lines.append(line)
+        self._emit(prefix, line, echo)
+
+    async def _feed(self, stream: asyncio.StreamWriter, data: bytes) -> None:
+        with contextlib.suppress(BrokenPipeError, ConnectionResetError):
+            stream.write(data)
+            await stream.drain()
+        stream.close()
+
+    async def run(self, cmd: List[str], cwd: Optional[Path] = None, prefix: Optional[str] = None,
+                  timeout: Optional[float] = None, check: bool = True, env: Optional[Dict[str, str]] = None,
+                  quiet: bool = False, input: Optional[bytes] = None) -> subprocess.CompletedProcess:
+        """Run `cmd`, streaming stdout/stderr; returns CompletedProcess with both captured as text.
+
+        `quiet` keeps the output off the console (it is still captured and logged), for commands whose
+        output the caller parses. `input` is written to the child's stdin (otherwise stdin is /dev/null).
+        """
+        prefix = _label.get() if prefix is None else prefix
+        timeout = self.timeout if timeout is None else (timeout or None)
+        cmd = [str(c) for c in cmd]
+        async with self._sem():
+            self._emit(prefix, f"$ {' '.join(cmd)}" + (f"  (in {cwd})" if cwd else ""), not quiet)
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, cwd=str(cwd) if cwd else None, env=env,
+                stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, start_new_session=True,
+            )
+            out: List[str] = []
+            err: List[str] = []
+            pumps = [self._pump(proc.stdout, prefix, out, not quiet), self._pump(proc.stderr, prefix, err, not quiet)]
+            if input is not None:
+                pumps.append(self._feed(proc.stdin, input))
+            io = asyncio.gather(*pumps, proc.wait())
+            try:
+                await asyncio.wait_for(io, timeout)
+            except asyncio.TimeoutError:
+                await self._stop(proc)
+                self._emit(prefix, f"timed out after {timeout:.0f}s: {' '.join(cmd)}")
+                raise CommandTimeout(cmd, timeout, "\n".join(out + err))
+            except BaseException:
+                # Cancellation or a failing pump: never leave the child (or its process group) behind
+                await self._stop(proc)
+                io.cancel()
+                await asyncio.gather(io, return_exceptions=True)
+                raise
+        stdout, stderr = "\n".join(out), "\n".join(err)
+        if check and proc.returncode != 0:
+            raise CommandError(proc.returncode, cmd, output=stdout, stderr=stderr)
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout=stdout, stderr=stderr)
+
+    async def _stop(self, proc: asyncio.subprocess.Process) -> None:
+        if proc.returncode is not None:
+            return
+        # The child runs in its own session; signal the whole group so grandchildren (ssh, msbuild) go too
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(proc.pid, 15)
+        try:
+            await asyncio.wait_for(proc.wait(), self.grace)
+        except asyncio.TimeoutError:
+            with contextlib.suppress(ProcessLookupError):
+                os.killpg(proc.pid, 9)
+            await proc.wait()
+
+    async def gather(self, *coros):
+        """Run coroutines concurrently; the first failure cancels (and kills) the rest, then re-raises."""
+        tasks = [asyncio.ensure_future(c) for c in coros]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+
+_runner: Optional[ProcessRunner] = None
+
+
+def get_runner() -> ProcessRunner:
+    global _runner
+    if _runner is None:
+        _runner = ProcessRunner(
+            concurrency=int(_env_float("LABLAB_MAX_PROCS", 4)),
+            timeout=_env_float("LABLAB_CMD_TIMEOUT", 1800),
+            log_path=state_dir() / "logs" / "commands.log",
+        )
+    return _runner
+
+
+def run(cmd: List[str], cwd: Optional[Path] = None, check: bool = True, timeout: Optional[float] = None,
+        prefix: Optional[str] = None, env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
+    """Blocking wrapper around ProcessRunner.run for scripts that aren't async."""
+    prefix = _label.get() if prefix is None else prefix
+    return asyncio.run(get_runner().run(cmd, cwd=cwd, prefix=prefix, timeout=timeout, check=check, env=env))
+
+
+def output(cmd: List[str], cwd: Optional[Path] = None, timeout: Optional[float] = None) -> str:
+    """Stripped output of a successful command (not echoed to the console)."""
+    res = asyncio.run(get_runner().run(cmd, cwd=cwd, prefix=_label.get(), timeout=timeout, quiet=True))
+    return res.stdout.strip()
+
+
+if __name__ == "__main__":
+    # Ad-hoc use: python3 scripts/py/proc_runner.py --timeout 60 -- git fetch --all
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Run one command through the shared process runner")
+    ap.add_argument("--timeout", type=float, default=None)
+    ap.add_argument("--prefix", default="")
+    ap.add_argument("cmd", nargs=argparse.REMAINDER)
+    a = ap.parse_args()
+    argv = a.cmd[1:] if a.cmd[:1] == ["--"] else a.cmd
+    try:
+        sys.exit(run(argv, timeout=a.timeout, prefix=a.prefix, check=False).returncode)
+    except CommandTimeout as e:
+        print(e, file=sys.stderr)
+        sys.exit(124)
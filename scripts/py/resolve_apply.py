@@ -2,11 +2,12 @@
 import argparse
 import json
 import os
-from pathlib import Path
 from typing import Dict, List, Optional
 
 import requests
-import yaml
+
+from fingerprints import repo_root
+from spec_docs import load_tasks
 
 GITHUB_API = "https://api.github.com"
 
@@ -32,18 +33,18 @@ def branch_exists(org: str, repo: str, branch: str, token: str) -> bool:
     return r.status_code == 200
 
 
-def main() -> int:
+def main(argv=None) -> int:
     p = argparse.ArgumentParser(description="Resolve apply matrix from spec")
     p.add_argument("--spec-id", required=True)
     p.add_argument("--org", required=True)
     p.add_argument("--repos", default=None, help="Optional comma-separated filter list")
-    args = p.parse_args()
+    args = p.parse_args(argv)
 
     token = os.environ.get("LABLAB_GH_PAT") or os.environ.get("GH_TOKEN")
     if not token:
         raise SystemExit("LABLAB_GH_PAT not set")
 
-    root = Path(__file__).resolve().parents[2]
+    root = repo_root()
     # Find slug from registry
     reg = json.loads((root / "specs" / "registry.json").read_text(encoding="utf-8"))
     slug: Optional[str] = None
@@ -62,11 +63,9 @@ def main() -> int:
     spec_dir = root / "specs" / f"{spec_id_p}-{slug}"
     tasks_yaml = spec_dir / "tasks.yaml"
     repos: List[str] = []
-    if tasks_yaml.exists():
-        data = yaml.safe_load(tasks_yaml.read_text(encoding="utf-8")) or []
-        for t in data:
-            if isinstance(t, dict) and t.get("repo"):
-                repos.append(t["repo"])
+    for t in load_tasks(tasks_yaml):
+        if t.get("repo"):
+            repos.append(t["repo"])
     # fallback to meta.json repos
     if not repos and (spec_dir / "meta.json").exists():
         meta = json.loads((spec_dir / "meta.json").read_text(encoding="utf-8"))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Shared loader for spec documents (tasks.yaml).
+
+- Parses with libyaml's CSafeLoader when PyYAML was built with it, else the pure-Python SafeLoader.
+- Validates the task list once, at parse time; only valid documents are cached.
+- Caches parsed tasks in-process and on disk under ${LABLAB_STATE_DIR:-~/.lablab/state}/spec-cache,
+  keyed on the file's path, mtime and size, so repeat loads across scripts skip YAML entirely.
+- `append_task` appends one block-style item to the file instead of re-serializing every task.
+
+Importable from scripts/py (`from spec_docs import load_tasks`) and from the agents package run via
+`python -m` at the repo root (`from scripts.py.spec_docs import load_tasks`).
+"""
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# Known task fields and their expected type; `id` is required, other keys are passed through
+TASK_FIELDS = {"id": str, "title": str, "repo": str, "stage": str, "type": str, "detail": str}
+
+_memo: Dict[str, Tuple[int, int, List[Dict]]] = {}
+
+
+class SpecDocError(ValueError):
+    pass
+
+
+def cache_dir() -> Path:
+    return Path(os.environ.get("LABLAB_STATE_DIR", str(Path.home() / ".lablab" / "state"))) / "spec-cache"
+
+
+def validate_tasks(data, path: Path) -> List[Dict]:
+    if data is None:
+        return []
+    if not isinstance(data, list):
+        raise SpecDocError(f"{path}: tasks.yaml must be a list of task objects")
+    seen = set()
+    for i, t in enumerate(data):
+        if not isinstance(t, dict):
+            raise SpecDocError(f"{path}: item {i} is not a mapping")
+        if t.get("id") in (None, ""):
+            raise SpecDocError(f"{path}: item {i} has no id")
+        t["id"] = str(t["id"])
+        if t["id"] in seen:
+            raise SpecDocError(f"{path}: duplicate task id {t['id']}")
+        seen.add(t["id"])
+        for key, typ in TASK_FIELDS.items():
+            if key in t and t[key] is not None and not isinstance(t[key], typ):
+                raise SpecDocError(f"{path}: {t['id']}.{key} must be a {typ.__name__}")
+    return data
+
+
+def _disk_entry(path: Path) -> Path:
+    return cache_dir() / (hashlib.sha256(str(path).encode("utf-8")).hexdigest()[:32] + ".json")
+
+
+def _store(path: Path, st: os.stat_result, tasks: List[Dict]) -> None:
+    _memo[str(path)] = (st.st_mtime_ns, st.st_size, tasks)
+    entry = _disk_entry(path)
+    try:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"mtime_ns": st.st_mtime_ns, "size": st.st_size, "tasks": tasks}), encoding="utf-8")
+        tmp.replace(entry)
+    except (OSError, TypeError):
+        # Cache is best-effort (read-only home, non-JSON scalars such as dates)
+        pass
+
+
+def _cached(path: Path, st: os.stat_result) -> Optional[List[Dict]]:
+    hit = _memo.get(str(path))
+    if hit and hit[:2] == (st.st_mtime_ns, st.st_size):
+        return hit[2]
+    try:
+        entry = json.loads(_disk_entry(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if (entry.get("mtime_ns"), entry.get("size")) != (st.st_mtime_ns, st.st_size):
+        return None
+    _memo[str(path)] = (st.st_mtime_ns, st.st_size, entry["tasks"])
+    return entry["tasks"]
+
+
+def load_tasks(path: Path) -> List[Dict]:
+    """Validated task list from a tasks.yaml; [] when the file does not exist. Raises SpecDocError."""
+    path = Path(path).resolve()
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return []
+    tasks = _cached(path, st)
+    if tasks is None:
+        try:
+            data = yaml.load(path.read_text(encoding="utf-8"), Loader=SafeLoader)
+        except yaml.YAMLError as e:
+            raise SpecDocError(f"Failed to parse {path}: {e}")
+        tasks = validate_tasks(data, path)
+        _store(path, st, tasks)
+    # Callers filter and annotate tasks; hand out copies so the cache stays clean
+    return [dict(t) for t in tasks]
+
+
+def next_task_id(tasks: List[Dict]) -> str:
+    n = 0
+    for t in tasks:
+        m = re.search(r"(\d+)$", str(t.get("id", "")))
+        if m:
+            n = max(n, int(m.group(1)))
+    return f"T-{n + 1}"
+
+
+def append_task(path: Path, task: Dict) -> Dict:
+    """Append one task (assigning the next T-<n> id when missing) without rewriting existing items."""
+    path = Path(path).resolve()
+    tasks = load_tasks(path)
+    task = dict(task)
+    task.setdefault("id", next_task_id(tasks))
+    validate_tasks(tasks + [task], path)
+    item = yaml.dump([task], Dumper=SafeDumper, sort_keys=False, allow_unicode=True)
+    text = path.read_text(encoding="utf-8") if path.exists() else ""
+    if text.strip() in ("", "[]") or text.lstrip().startswith("["):
+        # Empty or flow-style list: a block item can't be appended, so write the full list once
+        path.write_text(yaml.dump(tasks + [task], Dumper=SafeDumper, sort_keys=False, allow_unicode=True),
+                        encoding="utf-8")
+    else:
+        with path.open("a", encoding="utf-8") as f:
+            f.write(("" if text.endswith("\n") else "\n") + item)
+    _store(path, path.stat(), tasks + [task])
+    return task
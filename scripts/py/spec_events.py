@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Event-driven spec lifecycle engine.
+
+Instead of re-resolving everything per manual workflow run, a local watcher turns changes into events:
+  spec_files  spec folder content changed            -> enqueue `sync` for each repo of the spec
+  tasks       task ids listed for a repo in tasks.yaml -> enqueue `apply` for ids not applied yet
+  worktree    the spec worktree appeared/disappeared   -> sync/apply wait for it (held back until it exists)
+  status      meta.json status changed               -> enqueue `start` (in-progress) or `gc` (done/closed/merged)
+  branch      spec branch head moved on the remote   -> enqueue `verify` for that repo
+  step_done   a queued step finished                 -> record its outputs (synced fingerprint, applied ids, ...)
+
+Events are appended to ${LABLAB_STATE_DIR:-~/.lablab/state}/events.jsonl. State is a pure fold over the
+log (`reduce_events`), so replaying the log rebuilds the same per-{spec, repo} state and pending queue.
+The watcher only re-hashes/re-parses spec folders whose file stat signature changed.
+
+Usage:
+  python3 scripts/py/spec_events.py scan              # one pass: detect changes, append events, show queue
+  python3 scripts/py/spec_events.py watch --interval 5 [--exec] [--branches]
+  python3 scripts/py/spec_events.py queue | replay
+  python3 scripts/py/spec_events.py run               # execute pending steps, recording step_done events
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from container_exec import container_name, inspect, spec_worktree
+from fingerprints import hash_paths, repo_root, state_dir
+from spec_docs import load_tasks
+
+ROOT = repo_root()
+SPECS = ROOT / "specs"
+SPEC_DIR_RE = re.compile(r"^(\d+)-(.+)$")
+CLOSED_STATUSES = {"done", "closed", "merged"}
+
+
+# ---- state model (pure) ----
+
+def empty_state() -> Dict:
+    return {"seq": 0, "specs": {}, "pending": []}
+
+
+def _spec(state: Dict, key: str) -> Dict:
+    return state["specs"].setdefault(key, {"status": None, "fingerprint": None, "repos": {}})
+
+
+def _repo(spec: Dict, repo: str) -> Dict:
+    return spec["repos"].setdefault(repo, {
+        "synced_fp": None, "task_ids": [], "applied": [], "branch": None, "sha": None, "verified_sha": None,
+        "worktree": False,
+    })
+
+
+def _enqueue_work(state: Dict, key: str, repo: str) -> None:
+    """Queue the sync/apply still owed to a repo; both run in its spec worktree, so none until it exists."""
+    spec = state["specs"][key]
+    r = _repo(spec, repo)
+    if not r["worktree"]:
+        return
+    if spec["fingerprint"] and r["synced_fp"] != spec["fingerprint"]:
+        _enqueue(state, "sync", key, repo, fingerprint=spec["fingerprint"])
+    left = [t for t in r["task_ids"] if t not in r["applied"]]
+    if left:
+        _enqueue(state, "apply", key, repo, task_ids=left)
+
+
+def _enqueue(state: Dict, step: str, spec: str, repo: Optional[str] = None, **extra) -> None:
+    for item in state["pending"]:
+        if item["step"] == step and item["spec"] == spec and item.get("repo") == repo:
+            if "task_ids" in extra:
+                item["task_ids"] = sorted(set(item.get("task_ids", [])) | set(extra["task_ids"]), key=_task_sort)
+            else:
+                item.update(extra)
+            return
+    state["pending"].append({"step": step, "spec": spec, "repo": repo, **extra})
+
+
+def _dequeue(state: Dict, step: str, spec: str, repo: Optional[str]) -> None:
+    state["pending"] = [p for p in state["pending"]
+                        if not (p["step"] == step and p["spec"] == spec and p.get("repo") == repo)]
+
+
+def _task_sort(tid: str):
+    m = re.search(r"(\d+)$", str(tid))
+    return (int(m.group(1)) if m else 0, str(tid))
+
+
+def apply_event(state: Dict, ev: Dict) -> Dict:
+    """Fold one event into the state. Pure apart from mutating `state`; no clocks, no I/O."""
+    state["seq"] = ev.get("seq", state["seq"] + 1)
+    kind, key = ev["type"], ev["spec"]
+    spec = _spec(state, key)
+    if kind == "spec_files":
+        spec["fingerprint"] = ev["fingerprint"]
+        for repo in ev.get("repos", []):
+            _enqueue_work(state, key, repo)
+    elif kind == "tasks":
+        _repo(spec, ev["repo"])["task_ids"] = list(ev["task_ids"])
+        _enqueue_work(state, key, ev["repo"])
+    elif kind == "worktree":
+        _repo(spec, ev["repo"])["worktree"] = ev["exists"]
+        if ev["exists"]:
+            _enqueue_work(state, key, ev["repo"])
+        else:
+            _dequeue(state, "sync", key, ev["repo"])
+            _dequeue(state, "apply", key, ev["repo"])
+    elif kind == "status":
+        prev, spec["status"] = spec["status"], ev["status"]
+        if ev["status"] != prev:
+            if ev["status"] == "in-progress":
+                _enqueue(state, "start", key, None)
+            elif ev["status"] in CLOSED_STATUSES:
+                _enqueue(state, "gc", key, None)
+    elif kind == "branch":
+        r = _repo(spec, ev["repo"])
+        r["branch"], r["sha"] = ev["branch"], ev["sha"]
+        if ev["sha"] and r["verified_sha"] != ev["sha"]:
+            _enqueue(state, "verify", key, ev["repo"], sha=ev["sha"])
+    elif kind == "step_done":
+        step, repo = ev["step"], ev.get("repo")
+        if step == "sync":
+            _repo(spec, repo)["synced_fp"] = ev.get("fingerprint")
+        elif step == "apply":
+            r = _repo(spec, repo)
+            r["applied"] = sorted(set(r["applied"]) | set(ev.get("task_ids", [])), key=_task_sort)
+            left = [t for t in r["task_ids"] if t not in r["applied"]]
+            _dequeue(state, step, key, repo)
+            if left:
+                _enqueue(state, "apply", key, repo, task_ids=left)
+            return state
+        elif step == "verify":
+            _repo(spec, repo)["verified_sha"] = ev.get("sha")
+        _dequeue(state, step, key, repo)
+    else:
+        raise ValueError(f"Unknown event type: {kind}")
+    return state
+
+
+def reduce_events(events: List[Dict]) -> Dict:
+    state = empty_state()
+    for ev in events:
+        apply_event(state, ev)
+    return state
+
+
+# ---- event log ----
+
+class EventLog:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or state_dir() / "events.jsonl"
+
+    def read(self) -> List[Dict]:
+        if not self.path.exists():
+            return []
+        with self.path.open(encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def append(self, state: Dict, events: List[Dict]) -> None:
+        if not events:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            for ev in events:
+                ev = dict(ev, seq=state["seq"] + 1, ts=round(time.time(), 3))
+                apply_event(state, ev)
+                f.write(json.dumps(ev, sort_keys=True) + "\n")
+
+
+# ---- change detection ----
+
+def _stat_signature(folder: Path) -> Tuple:
+    return tuple(sorted((str(p.relative_to(folder)), p.stat().st_mtime_ns, p.stat().st_size)
+                        for p in folder.rglob("*") if p.is_file()))
+
+
+class Watcher:
+    def __init__(self, log: EventLog, specs_root: Path = SPECS):
+        self.log = log
+        self.specs_root = specs_root
+        self.state = reduce_events(log.read())
+        self._sigs: Dict[str, Tuple] = {}
+
+    def scan_specs(self) -> List[Dict]:
+        events: List[Dict] = []
+        for folder in sorted(p for p in self.specs_root.iterdir() if p.is_dir() and SPEC_DIR_RE.match(p.name)):
+            key = folder.name
+            sig = _stat_signature(folder)
+            if self._sigs.get(key) == sig:
+                continue
+            self._sigs[key] = sig
+            spec = self.state["specs"].get(key, {})
+            meta_path = folder / "meta.json"
+            meta = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() else {}
+            tasks = load_tasks(folder / "tasks.yaml")
+            by_repo: Dict[str, List[str]] = {}
+            for t in tasks:
+                if t.get("repo") and t.get("id"):
+                    by_repo.setdefault(t["repo"], []).append(str(t["id"]))
+            repos = sorted(set(meta.get("repos", [])) | set(by_repo))
+
+            status = meta.get("status")
+            if status and status != spec.get("status"):
+                events.append({"type": "status", "spec": key, "status": status})
+            fp = hash_paths([folder], self.specs_root.parent)
+            if fp != spec.get("fingerprint"):
+                events.append({"type": "spec_files", "spec": key, "fingerprint": fp, "repos": repos})
+            for repo, ids in sorted(by_repo.items()):
+                known = spec.get("repos", {}).get(repo, {}).get("task_ids")
+                if ids != known:
+                    events.append({"type": "tasks", "spec": key, "repo": repo, "task_ids": ids})
+        return events
+
+    def scan_worktrees(self) -> List[Dict]:
+        """Worktrees created by `specctl start` (or removed by gc) since the last pass; one stat per repo."""
+        events: List[Dict] = []
+        for key, spec in sorted(self.state["specs"].items()):
+            spec_id = SPEC_DIR_RE.match(key).group(1)
+            for repo, r in sorted(spec["repos"].items()):
+                exists = spec_worktree(spec_id, repo).is_dir()
+                if exists != r.get("worktree", False):
+                    events.append({"type": "worktree", "spec": key, "repo": repo, "exists": exists})
+        return events
+
+    def scan_branches(self, org: str) -> List[Dict]:
+        events: List[Dict] = []
+        env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+        for key, spec in sorted(self.state["specs"].items()):
+            if spec.get("status") in CLOSED_STATUSES:
+                continue
+            for repo, r in sorted(spec["repos"].items()):
+                url = f"git@github.com:{org}/{repo}.git"
+                # Exact refs: a glob on spec/<key>/<repo>* would also pick up sibling repos sharing the prefix
+                refs = [f"refs/heads/spec/{key}/{repo}", f"refs/heads/spec/{key}/{repo}-gh"]
+                p = subprocess.run(["git", "ls-remote", url, *refs], capture_output=True, env=env, timeout=30)
+                if p.returncode != 0:
+                    continue
+                for line in p.stdout.decode("utf-8", "ignore").splitlines():
+                    sha, ref = line.split("\t", 1)
+                    if ref not in refs:
+                        continue
+                    branch = ref[len("refs/heads/"):]
+                    if sha != r.get("sha") or branch != r.get("branch"):
+                        events.append({"type": "branch", "spec": key, "repo": repo, "branch": branch, "sha": sha})
+        return events
+
+    def tick(self, org: Optional[str] = None) -> List[Dict]:
+        events = self.scan_specs()
+        # Folded first so repos first seen in this pass get their worktree checked too
+        self.log.append(self.state, events)
+        later = self.scan_worktrees()
+        if org:
+            later += self.scan_branches(org)
+        self.log.append(self.state, later)
+        return events + later
+
+
+# ---- step execution ----
+
+def step_command(item: Dict, state: Dict) -> List[Tuple[Optional[str], List[str]]]:
+    """(task id or None, command) pairs to run for a queued step."""
+    m = SPEC_DIR_RE.match(item["spec"])
+    spec_id, slug = m.group(1), m.group(2)
+    repo = item.get("repo")
+    py = sys.executable
+    scripts = ROOT / "scripts" / "py"
+    if item["step"] == "sync":
+        return [(None, [py, str(scripts / "sync_spec_to_repo.py"), "--spec", spec_id, "--slug", slug, "--repo", repo])]
+    if item["step"] == "apply":
+        branch = state["specs"][item["spec"]]["repos"][repo].get("branch") or f"spec/{spec_id}-{slug}/{repo}"
+        # Apply in the spec worktree specctl started, building in its container when one is running
+        target = ["--target", str(spec_worktree(spec_id, repo))]
+        info = inspect(container_name(spec_id, repo))
+        if info and info.get("State", {}).get("Running"):
+            target.append("--container")
+        return [(tid, [py, "-m", "agents.langgraph.apply_task", "--spec", spec_id, "--slug", slug, "--repo", repo,
+                       "--branch", branch, "--task-id", tid, *target]) for tid in item["task_ids"]]
+    if item["step"] == "verify":
+        return [(None, [py, str(scripts / "specctl.py"), "check", "--spec", spec_id, "--slug", slug, "--repos", repo])]
+    repos = ",".join(sorted(state["specs"][item["spec"]]["repos"])) or "none"
+    if item["step"] == "start":
+        return [(None, [py, str(scripts / "specctl.py"), "start", "--spec", spec_id, "--slug", slug, "--repos", repos])]
+    if item["step"] == "gc":
+        return [(None, [py, str(scripts / "specctl.py"), "gc"])]
+    raise ValueError(f"Unknown step: {item['step']}")
+
+
+def run_pending(log: EventLog, state: Dict, dry_run: bool = False) -> int:
+    failures = 0
+    for item in list(state["pending"]):
+        done_ids: List[str] = []
+        ok = True
+        for tid, cmd in step_command(item, state):
+            print(f"{'(dry-run) ' if dry_run else ''}$ {' '.join(cmd)}")
+            if dry_run:
+                continue
+            if subprocess.run(cmd, cwd=ROOT).returncode != 0:
+                ok = False
+                break
+            if item["step"] == "apply":
+                done_ids.append(tid)
+        if dry_run:
+            continue
+        extra = {k: item[k] for k in ("fingerprint", "sha") if k in item}
+        if item["step"] == "apply" and done_ids:
+            log.append(state, [{"type": "step_done", "step": "apply", "spec": item["spec"], "repo": item["repo"],
+                                "task_ids": done_ids}])
+        elif ok and item["step"] != "apply":
+            log.append(state, [{"type": "step_done", "step": item["step"], "spec": item["spec"],
+                                "repo": item.get("repo"), **extra}])
+        if not ok:
+            failures += 1
+            print(f"[events] {item['step']} failed for {item['spec']}/{item.get('repo') or '*'}; left queued")
+    return failures
+
+
+def print_queue(state: Dict) -> None:
+    if not state["pending"]:
+        print("[events] queue empty")
+    for item in state["pending"]:
+        extra = f" tasks={','.join(item['task_ids'])}" if item.get("task_ids") else ""
+        print(f"[queue] {item['step']:<6} {item['spec']}/{item.get('repo') or '*'}{extra}")
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Event-driven spec lifecycle engine")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    for name in ("scan", "watch"):
+        s = sub.add_parser(name)
+        s.add_argument("--branches", action="store_true", help="also poll spec branch heads (needs LABLAB_ORG)")
+        s.add_argument("--exec", action="store_true", help="run pending steps after each pass")
+        if name == "watch":
+            s.add_argument("--interval", type=float, default=5.0)
+    sub.add_parser("queue")
+    sub.add_parser("replay")
+    s = sub.add_parser("run")
+    s.add_argument("--dry-run", action="store_true")
+    args = p.parse_args(argv)
+
+    log = EventLog()
+    if args.cmd == "replay":
+        print(json.dumps(reduce_events(log.read()), indent=2, sort_keys=True))
+        return 0
+    if args.cmd == "queue":
+        print_queue(reduce_events(log.read()))
+        return 0
+    if args.cmd == "run":
+        state = reduce_events(log.read())
+        return 1 if run_pending(log, state, dry_run=args.dry_run) else 0
+
+    org = os.environ.get("LABLAB_ORG") if args.branches else None
+    if args.branches and not org:
+        raise SystemExit("LABLAB_ORG is required with --branches")
+    watcher = Watcher(log)
+    while True:
+        events = watcher.tick(org)
+        for ev in events:
+            print(f"[event] {ev['type']} {ev['spec']}{'/' + ev['repo'] if ev.get('repo') else ''}")
+        if events or args.cmd == "scan":
+            print_queue(watcher.state)
+        if args.exec and watcher.state["pending"]:
+            run_pending(log, watcher.state)
+        if args.cmd == "scan":
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,54 +8,33 @@ Subcommands:
 """
 import argparse
 import json
-from pathlib import Path
-import yaml
 
-
-def load_yaml(path: Path):
-    if path.exists():
-        return yaml.safe_load(path.read_text(encoding="utf-8")) or []
-    return []
-
-
-def save_yaml(path: Path, data):
-    path.write_text(yaml.safe_dump(data, sort_keys=False), encoding="utf-8")
+from fingerprints import repo_root
+from spec_docs import append_task
 
 
 def cmd_create(args):
     from new_spec import main as new_spec_main  # type: ignore
 
-    import sys
-    sys.argv = [sys.argv[0], "--slug", args.slug, "--repos", args.repos, "--title", args.title or ""]
-    new_spec_main()
+    new_spec_main(["--slug", args.slug, "--repos", args.repos, "--title", args.title or ""])
 
 
 def cmd_add_task(args):
-    root = Path(__file__).resolve().parents[2]
+    root = repo_root()
     spec_dir = root / "specs" / f"{args.spec}-{args.slug}"
     tasks_path = spec_dir / "tasks.yaml"
-    tasks = load_yaml(tasks_path)
-    next_id = 1
-    for t in tasks:
-        try:
-            n = int(str(t.get("id", "0")).split("-")[-1])
-            next_id = max(next_id, n + 1)
-        except Exception:
-            pass
-    tasks.append({
-        "id": f"T-{next_id}",
+    task = append_task(tasks_path, {
         "title": args.title,
         "repo": args.repo,
         "stage": args.stage,
         "type": "code",
         "detail": args.detail,
     })
-    save_yaml(tasks_path, tasks)
-    print(f"Added task T-{next_id} to {tasks_path}")
+    print(f"Added task {task['id']} to {tasks_path}")
 
 
 def cmd_add_plan(args):
-    root = Path(__file__).resolve().parents[2]
+    root = repo_root()
     spec_dir = root / "specs" / f"{args.spec}-{args.slug}"
     plan_path = spec_dir / "plan.md"
     with plan_path.open("a", encoding="utf-8") as f:
@@ -63,7 +42,7 @@ def cmd_add_plan(args):
     print(f"Appended section to {plan_path}")
 
 
-def main():
+def main(argv=None):
     p = argparse.ArgumentParser()
     sub = p.add_subparsers(dest="cmd", required=True)
 
@@ -89,7 +68,7 @@ def main():
     s.add_argument("--text", required=True)
     s.set_defaults(fn=cmd_add_plan)
 
-    args = p.parse_args()
+    args = p.parse_args(argv)
     args.fn(args)
 
 
@@ -6,18 +6,24 @@ Uses env vars: LABLAB_ORG, LABLAB_REPOS_BASE, LABLAB_SPECS_BASE
 import argparse
 import json
 import os
-import subprocess
 import sys
 from pathlib import Path
 
+from bootstrap_repo import bootstrap as apply_templates
+from clone_strategy import clone, load_repos_config
+from fingerprints import FingerprintStore, hash_paths, repo_root, template_inputs
+import gc_specs
+from preflight import DEFAULT_TIMEOUT, print_report, run_preflight, write_report
+from proc_runner import NETWORK_TIMEOUT, CommandError, label, output, run
+from sync_spec_to_repo import main as sync_spec
 
-def sh(cmd, cwd=None, check=True):
-    print(f"$ {' '.join(cmd)}")
-    return subprocess.run(cmd, cwd=cwd, check=check)
+
+def sh(cmd, cwd=None, check=True, timeout=None):
+    return run(cmd, cwd=cwd, check=check, timeout=timeout)
 
 
 def out(cmd, cwd=None):
-    return subprocess.check_output(cmd, cwd=cwd).decode("utf-8", "ignore").strip()
+    return output(cmd, cwd=cwd)
 
 
 def ensure_dirs(base_repos: Path, base_specs: Path):
@@ -29,11 +35,11 @@ def repo_url(org: str, repo: str) -> str:
     return f"git@github.com:{org}/{repo}.git"
 
 
-def ensure_bare(org: str, repo: str, base_repos: Path):
+def ensure_bare(org: str, repo: str, base_repos: Path, cfg: dict):
     bare = base_repos / f"{repo}.bare"
     if not bare.exists():
-        sh(["git", "clone", "--bare", repo_url(org, repo), str(bare)])
-    sh(["git", "--git-dir", str(bare), "fetch", "--all", "--prune"])
+        clone(cfg, "worktree", repo_url(org, repo), bare, bare=True)
+    sh(["git", "--git-dir", str(bare), "fetch", "--all", "--prune"], timeout=NETWORK_TIMEOUT)
     return bare
 
 
@@ -45,13 +51,13 @@ def ensure_worktree_branch(bare: Path, specs_base: Path, repo: str, spec_id: str
     if not (wdir / ".git").exists():
         sh(git_dir + ["worktree", "add", "-B", branch, str(wdir), f"origin/{base_branch}"])
     else:
-        sh(["git", "fetch"], cwd=wdir)
+        sh(["git", "fetch"], cwd=wdir, timeout=NETWORK_TIMEOUT)
         # try checkout existing, else create
         try:
             sh(["git", "checkout", branch], cwd=wdir)
-        except subprocess.CalledProcessError:
+        except CommandError:
             sh(["git", "checkout", "-b", branch], cwd=wdir)
-        sh(["git", "pull", "--rebase"], cwd=wdir)
+        sh(["git", "pull", "--rebase"], cwd=wdir, timeout=NETWORK_TIMEOUT)
     return wdir, branch
 
 
@@ -73,6 +79,20 @@ def render_compose(wdir: Path, image: str, project: str, ports: list[str]):
         for p in ports:
             lines.append(f"      - \"{p}\"")
     compose.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    exclude_generated(wdir, compose.name)
+
+
+def exclude_generated(wdir: Path, name: str) -> None:
+    """Keep a file specctl writes into the worktree out of `git add` (info/exclude is shared by worktrees)."""
+    try:
+        rel = out(["git", "rev-parse", "--git-path", "info/exclude"], cwd=wdir)
+    except CommandError:
+        return
+    exclude = Path(rel) if Path(rel).is_absolute() else wdir / rel
+    lines = exclude.read_text(encoding="utf-8").splitlines() if exclude.exists() else []
+    if f"/{name}" not in lines:
+        exclude.parent.mkdir(parents=True, exist_ok=True)
+        exclude.write_text("\n".join(lines + [f"/{name}"]) + "\n", encoding="utf-8")
 
 
 def docker_compose_up(wdir: Path, project: str):
@@ -91,60 +111,91 @@ def cmd_start(args):
     if not org:
         print("LABLAB_ORG is required")
         sys.exit(1)
-    repos_cfg = json.loads(Path("configs/repos.json").read_text(encoding="utf-8"))
+    repos_cfg = load_repos_config()
     base_repos = Path(os.environ.get("LABLAB_REPOS_BASE", "/srv/repos"))
     base_specs = Path(os.environ.get("LABLAB_SPECS_BASE", "/srv/specs"))
     ensure_dirs(base_repos, base_specs)
 
+    root = repo_root()
+    store = FingerprintStore()
     repos = [r.strip() for r in args.repos.split(",") if r.strip()]
     for repo in repos:
-        cfg = repos_cfg.get(repo, {})
-        base_branch = cfg.get("base_branch") or args.base
-        bare = ensure_bare(org, repo, base_repos)
-        wdir, _ = ensure_worktree_branch(bare, base_specs, repo, args.spec, args.slug, base_branch)
-        # Bootstrap templates based on repo type
-        rtype = cfg.get("type")
-        if rtype:
-            root = Path(__file__).resolve().parents[2]  # repo root
-            bootstrap = root / "scripts" / "mac" / "bootstrap-repo.sh"
-            if bootstrap.exists():
-                print(f"[bootstrap] applying templates for {repo} (type={rtype})")
-                sh(["bash", str(bootstrap), "--type", rtype, "--path", str(wdir)])
+        with label(repo):
+            cfg = repos_cfg.get(repo, {})
+            base_branch = cfg.get("base_branch") or args.base
+            bare = ensure_bare(org, repo, base_repos, cfg)
+            # A fresh worktree has none of the previous outputs, so fingerprints don't apply to it
+            fresh = not (base_specs / args.spec / repo / ".git").exists()
+            wdir, _ = ensure_worktree_branch(bare, base_specs, repo, args.spec, args.slug, base_branch)
+            key = store.key(f"{args.spec}-{args.slug}", repo)
+            if fresh:
+                store.forget(key)
+            # Bootstrap templates based on repo type
+            rtype = cfg.get("type")
+            if rtype:
+                fp = hash_paths(template_inputs(rtype))
+                if not args.force and store.is_current(key, "bootstrap", fp):
+                    print(f"[bootstrap] templates unchanged for {repo}; skipping (use --force to re-run)")
+                else:
+                    print(f"[bootstrap] applying templates for {repo} (type={rtype})")
+                    apply_templates(rtype, wdir)
+                    store.record(key, "bootstrap", fp)
+            # Sync spec docs into repo worktree to align with Spec-Kit
+            fp = hash_paths([root / "specs" / f"{args.spec}-{args.slug}"])
+            if not args.force and store.is_current(key, "sync", fp):
+                print(f"[sync] spec docs unchanged for {repo}; skipping (use --force to re-run)")
             else:
-                print("[warn] bootstrap script not found; skipping")
-        # Sync spec docs into repo worktree to align with Spec-Kit
-        sync = Path(__file__).resolve().parents[0] / "sync_spec_to_repo.py"
-        if sync.exists():
-            print(f"[sync] copying spec docs to {repo} worktree")
-            sh(["python3", str(sync), "--spec", args.spec, "--slug", args.slug, "--repo", repo])
-        else:
-            print("[warn] sync_spec_to_repo.py not found; skipping")
-        if cfg.get("container"):
-            image = cfg.get("image")
-            if image:
-                project = f"spec-{args.spec}-{repo}"
-                ports = cfg.get("ports", [])
-                render_compose(wdir, image, project, ports)
-                docker_compose_up(wdir, project)
+                print(f"[sync] copying spec docs to {repo} worktree")
+                sync_spec(["--spec", args.spec, "--slug", args.slug, "--repo", repo])
+                store.record(key, "sync", fp)
+            if cfg.get("container"):
+                image = cfg.get("image")
+                if image:
+                    project = f"spec-{args.spec}-{repo}"
+                    ports = cfg.get("ports", [])
+                    render_compose(wdir, image, project, ports)
+                    docker_compose_up(wdir, project)
+                else:
+                    print(f"[warn] container true but no image for {repo}")
             else:
-                print(f"[warn] container true but no image for {repo}")
-        else:
-            print(f"[info] container disabled for {repo}")
+                print(f"[info] container disabled for {repo}")
 
 
 def cmd_stop(args):
+    base_repos = Path(os.environ.get("LABLAB_REPOS_BASE", "/srv/repos"))
     base_specs = Path(os.environ.get("LABLAB_SPECS_BASE", "/srv/specs"))
+    store = FingerprintStore()
     repos = [r.strip() for r in args.repos.split(",") if r.strip()]
     for repo in repos:
-        wdir = base_specs / args.spec / repo
-        project = f"spec-{args.spec}-{repo}"
-        if wdir.exists():
-            docker_compose_down(wdir, project)
-            # remove worktree
-            try:
-                sh(["git", "worktree", "remove", str(wdir), "--force"])
-            except Exception:
-                pass
+        with label(repo):
+            wdir = base_specs / args.spec / repo
+            project = f"spec-{args.spec}-{repo}"
+            store.forget(store.key(f"{args.spec}-{args.slug}", repo))
+            if wdir.exists():
+                docker_compose_down(wdir, project)
+                # remove worktree through the bare repo that owns it
+                try:
+                    sh(["git", "--git-dir", str(base_repos / f"{repo}.bare"), "worktree", "remove", str(wdir), "--force"])
+                except Exception:
+                    pass
+
+
+def cmd_gc(args):
+    base_repos = Path(os.environ.get("LABLAB_REPOS_BASE", "/srv/repos"))
+    base_specs = Path(os.environ.get("LABLAB_SPECS_BASE", "/srv/specs"))
+    registry = repo_root() / "specs" / "registry.json"
+    store = FingerprintStore()
+
+    def forget(spec, repo):
+        for key in [k for k in store.data if k.startswith(f"{spec}-") and k.endswith(f"/{repo}")]:
+            store.forget(key)
+
+    report = gc_specs.collect(base_specs, base_repos, registry, include_unknown=args.include_unknown,
+                              tmp_age_hours=args.tmp_age, dry_run=args.dry_run, on_pruned=forget)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        gc_specs.print_report(report)
 
 
 def cmd_status(args):
@@ -165,9 +216,8 @@ def cmd_status(args):
 
 def cmd_bootstrap(args):
     base_specs = Path(os.environ.get("LABLAB_SPECS_BASE", "/srv/specs"))
-    repos_cfg = json.loads(Path("configs/repos.json").read_text(encoding="utf-8"))
-    root = Path(__file__).resolve().parents[2]
-    bootstrap = root / "scripts" / "mac" / "bootstrap-repo.sh"
+    repos_cfg = load_repos_config()
+    store = FingerprintStore()
     repos = [r.strip() for r in args.repos.split(",") if r.strip()]
     for repo in repos:
         rtype = repos_cfg.get(repo, {}).get("type")
@@ -178,11 +228,9 @@ def cmd_bootstrap(args):
         if not wdir.exists():
             print(f"[bootstrap] worktree not found for {repo} at {wdir}; run start first")
             continue
-        if not bootstrap.exists():
-            print("[warn] bootstrap script not found; skipping")
-            continue
         print(f"[bootstrap] {repo} -> {rtype} at {wdir}")
-        sh(["bash", str(bootstrap), "--type", rtype, "--path", str(wdir)])
+        apply_templates(rtype, wdir)
+        store.record(store.key(f"{args.spec}-{args.slug}", repo), "bootstrap", hash_paths(template_inputs(rtype)))
 
 
 def cmd_check(args):
@@ -190,48 +238,26 @@ def cmd_check(args):
     if not org:
         print("LABLAB_ORG is required")
         sys.exit(1)
-    repos_cfg = json.loads(Path("configs/repos.json").read_text(encoding="utf-8"))
+    repos_cfg = load_repos_config()
     repos = [r.strip() for r in args.repos.split(",") if r.strip()]
-    for repo in repos:
-        print(f"--- {repo} ---")
-        cfg = repos_cfg.get(repo)
-        if not cfg:
-            print("config: MISSING")
-            continue
-        print("config: OK")
-        rtype = cfg.get("type") or ""
-        if not rtype:
-            print("type: MISSING")
-        else:
-            print(f"type: {rtype}")
-        url = repo_url(org, repo)
-        try:
-            out(["git", "ls-remote", url])
-            print(f"remote: OK ({url})")
-            base = cfg.get("base_branch") or args.base
-            try:
-                heads = out(["git", "ls-remote", "--heads", url, base])
-                if f"refs/heads/{base}" in heads:
-                    print(f"base_branch: OK ({base})")
-                else:
-                    print(f"base_branch: NOT FOUND ({base})")
-            except subprocess.CalledProcessError:
-                print(f"base_branch: NOT FOUND ({base})")
-        except subprocess.CalledProcessError:
-            print(f"remote: UNREACHABLE ({url})")
-        if cfg.get("container"):
-            image = cfg.get("image")
-            if not image:
-                print("image: MISSING while container=true")
-            else:
-                try:
-                    sh(["docker", "image", "inspect", image], check=True)
-                    print(f"image: PRESENT ({image})")
-                except Exception:
-                    print(f"image: NOT LOCAL ({image}) — will pull on start")
+    report = run_preflight(repos, repos_cfg, lambda r: repo_url(org, r), args.base, timeout=args.timeout)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    if args.report:
+        write_report(report, args.report)
+    if args.prefetch:
+        # Warm missing/stale images in the background so the next start doesn't pull inline
+        from prefetch_images import spawn_background  # needs requests; keep check stdlib-only otherwise
+
+        log = spawn_background()
+        print(f"[prefetch] started in background; log: {log}")
+    if not report["ok"]:
+        sys.exit(1)
 
 
-def main():
+def main(argv=None):
     p = argparse.ArgumentParser()
     sub = p.add_subparsers(dest="cmd", required=True)
     common = argparse.ArgumentParser(add_help=False)
@@ -241,17 +267,28 @@ def main():
     common.add_argument("--base", default="main")
 
     s = sub.add_parser("start", parents=[common])
+    s.add_argument("--force", action="store_true", help="re-run bootstrap/sync even if inputs are unchanged")
     s.set_defaults(fn=cmd_start)
     s = sub.add_parser("stop", parents=[common])
     s.set_defaults(fn=cmd_stop)
     s = sub.add_parser("status", parents=[common])
     s.set_defaults(fn=cmd_status)
+    s = sub.add_parser("gc", help="prune worktrees/containers of closed specs, temp dirs, and gc bare repos")
+    s.add_argument("--dry-run", action="store_true")
+    s.add_argument("--include-unknown", action="store_true", help="also prune worktrees of specs missing from the registry and spec-* compose projects without a worktree")
+    s.add_argument("--tmp-age", type=float, default=24.0, help="remove specstart-* temp dirs older than N hours")
+    s.add_argument("--json", action="store_true")
+    s.set_defaults(fn=cmd_gc)
     s = sub.add_parser("bootstrap", parents=[common])
     s.set_defaults(fn=cmd_bootstrap)
     s = sub.add_parser("check", parents=[common])
+    s.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="per-probe timeout in seconds")
+    s.add_argument("--json", action="store_true", help="print the report as JSON")
+    s.add_argument("--report", default=None, help="also write the JSON report to this path")
+    s.add_argument("--prefetch", action="store_true", help="pull missing/stale configured images in the background")
     s.set_defaults(fn=cmd_check)
 
-    args = p.parse_args()
+    args = p.parse_args(argv)
     args.fn(args)
 
 
@@ -3,7 +3,6 @@ import os
 import sys
 import argparse
 import shutil
-import subprocess
 import tempfile
 from pathlib import Path
 import json
@@ -11,7 +10,17 @@ from typing import List
 
 import requests
 
+from clone_strategy import clone, load_repos_config
+from fingerprints import FingerprintStore, hash_paths, repo_root
+from gh_git_data import FileSet, GitDataClient, commit_files
+from proc_runner import NETWORK_TIMEOUT, CommandError
+from proc_runner import run as run_cmd
+from tiers import TierIndex
+
 GITHUB_API = "https://api.github.com"
+BOT_AUTHOR = {"name": "automation-bot", "email": "automation-bot@example.com"}
+# App repos that get tiers.json/tiers.schema.json seeded at the root
+TIER_REPOS = {"lablab-bean-console", "lablab-bean-windows", "lablab-bean-unity"}
 
 
 def headers(token: str) -> dict:
@@ -22,9 +31,9 @@ def headers(token: str) -> dict:
     }
 
 
-def run(cmd: List[str], cwd: Path | None = None) -> None:
-    print(f"$ {' '.join(cmd)}")
-    subprocess.run(cmd, cwd=cwd, check=True)
+def run(cmd: List[str], cwd: Path | None = None, timeout: float | None = None) -> None:
+    # Clone-mode checkouts are named after their repo, which makes a good output prefix
+    run_cmd(cmd, cwd=cwd, timeout=timeout, prefix=cwd.name if cwd else None)
 
 
 def pad_id(spec_id: str) -> str:
@@ -44,21 +53,30 @@ def create_pr(org: str, repo: str, base: str, head: str, title: str, body: str,
         "draft": True,
     }
     r = requests.post(url, headers=headers(token), json=payload, timeout=60)
+    if r.status_code == 422 and "already exists" in r.text:
+        # Re-running start on an updated spec pushes to the same branch; its PR is still open
+        return f"(existing PR for {head})"
+    if r.status_code == 422 and "No commits between" in r.text:
+        # Spec docs already match the base branch: nothing to review
+        return f"(no changes against {base}; no PR)"
     if r.status_code not in (200, 201):
         raise RuntimeError(f"Create PR failed for {repo}: {r.status_code} {r.text}")
     pr = r.json()
     return pr.get("html_url", "")
 
 
-def main() -> int:
+def main(argv=None) -> int:
     parser = argparse.ArgumentParser(description="Start Spec via Python")
     parser.add_argument("--spec-id", required=True)
     parser.add_argument("--slug", required=True)
     parser.add_argument("--repos", required=True, help="Comma-separated repos")
     parser.add_argument("--base", default="main")
     parser.add_argument("--org", default=os.environ.get("LABLAB_ORG"))
-    parser.add_argument("--work", default=None, help="Optional working dir (default: temp)")
-    args = parser.parse_args()
+    parser.add_argument("--work", default=None, help="Optional working dir for --mode clone (default: temp)")
+    parser.add_argument("--mode", choices=["api", "clone"], default="api",
+                        help="api: commit via the Git Data API (no clone, no SSH); clone: clone, commit and push")
+    parser.add_argument("--force", action="store_true", help="re-run repos whose spec/tiers inputs are unchanged")
+    args = parser.parse_args(argv)
 
     token = os.environ.get("LABLAB_GH_PAT") or os.environ.get("GH_TOKEN")
     if not token:
@@ -71,8 +89,7 @@ def main() -> int:
     repos = [r.strip() for r in args.repos.split(",") if r.strip()]
 
     # Determine orchestrator root and source spec folder
-    script_path = Path(__file__).resolve()
-    root = script_path.parents[2]  # repo root
+    root = repo_root()
 
     # Compute padded ID before using it
     id_padded = pad_id(args.spec_id)
@@ -84,49 +101,90 @@ def main() -> int:
 
     tiers_json = root / "templates" / "tiers" / "tiers.json"
     tiers_schema = root / "templates" / "tiers" / "tiers.schema.json"
-
-    if args.work:
-        work = Path(args.work)
-        work.mkdir(parents=True, exist_ok=True)
+    repos_cfg = load_repos_config(root)
+
+    if any(repo in TIER_REPOS for repo in repos):
+        # Never seed app repos with overlapping ranges or unreachable rules
+        tiers_report = TierIndex.load(tiers_json).report()
+        if not tiers_report["ok"]:
+            for problem in tiers_report["problems"]:
+                print(f"ERROR: tiers.json: {problem}", file=sys.stderr)
+            return 1
+        for gap in tiers_report["gaps"]:
+            print(f"[tiers] gap {gap['range']} between {gap['after']} and {gap['before']}")
+
+    spec_prefix = f"specs/{id_padded}-{args.slug}"
+    message = f"chore(spec): {args.spec_id}-{args.slug} sync spec docs and config"
+
+    if args.mode == "api":
+        # Read and encode every file once; each repo only gets the paths it needs
+        files = FileSet()
+        files.add_tree(spec_src, spec_prefix)
+        files.add_file(tiers_json, "tiers.json")
+        files.add_file(tiers_schema, "tiers.schema.json")
+        session = requests.Session()
     else:
-        work = Path(tempfile.mkdtemp(prefix="specstart-"))
-
-    print(f"Workdir: {work}")
+        if args.work:
+            work = Path(args.work)
+            work.mkdir(parents=True, exist_ok=True)
+        else:
+            work = Path(tempfile.mkdtemp(prefix="specstart-"))
+        print(f"Workdir: {work}")
 
     failed: List[str] = []
     pr_links: List[str] = []
+    store = FingerprintStore()
 
     for repo in repos:
+        branch = f"spec/{id_padded}-{args.slug}/{repo}"
+        key = store.key(f"{id_padded}-{args.slug}", repo)
+        inputs = [spec_src] + ([tiers_json, tiers_schema] if repo in TIER_REPOS else [])
+        fp = f"{args.org}:{args.base}:{hash_paths(inputs, root)}"
+        if not args.force and store.is_current(key, "start", fp):
+            print(f"[skip] {repo}: spec docs and tiers unchanged since last start (use --force to re-run)")
+            continue
         try:
-            target = work / repo
-            if target.exists():
-                shutil.rmtree(target)
-
-            # Clone using bearer token in header to avoid printing token
-            clone_url = f"git@github.com:{args.org}/{repo}.git"
-            run(["git", "clone", "--branch", args.base, "--single-branch", clone_url, str(target)])
-
-            # Create spec branch
-            branch = f"spec/{id_padded}-{args.slug}/{repo}"
-            run(["git", "checkout", "-b", branch], cwd=target)
-
-            # Copy spec docs
-            dst = target / "specs" / f"{id_padded}-{args.slug}"
-            dst.parent.mkdir(parents=True, exist_ok=True)
-            if dst.exists():
-                shutil.rmtree(dst)
-            shutil.copytree(spec_src, dst)
-
-            # Seed tiers for app repos
-            if repo in {"lablab-bean-console", "lablab-bean-windows", "lablab-bean-unity"}:
-                shutil.copy2(tiers_json, target / "tiers.json")
-                shutil.copy2(tiers_schema, target / "tiers.schema.json")
-
-            # Commit & push
-            run(["git", "add", "."], cwd=target)
-            run(["git", "-c", "user.name=automation-bot", "-c", "user.email=automation-bot@example.com",
-                 "commit", "-m", f"chore(spec): {args.spec_id}-{args.slug} sync spec docs and config"], cwd=target)
-            run(["git", "push", "-u", "origin", branch], cwd=target)
+            if args.mode == "api":
+                paths = [k for k in files.files if k.startswith(spec_prefix + "/")]
+                if repo in TIER_REPOS:
+                    paths += ["tiers.json", "tiers.schema.json"]
+                client = GitDataClient(args.org, repo, token, session=session)
+                # Like clone mode's copytree: files dropped from the spec folder are deleted on the branch
+                commit_files(client, args.base, branch, files.subset(paths), message, author=BOT_AUTHOR,
+                             prune=spec_prefix)
+                print(f"[api] {repo}: {branch} ready ({client.calls} API calls)")
+            else:
+                target = work / repo
+                if target.exists():
+                    shutil.rmtree(target)
+
+                # Only specs/** and root files change, so take the cheapest clone that supports that
+                clone_url = f"git@github.com:{args.org}/{repo}.git"
+                clone(repos_cfg.get(repo, {}), "spec-docs", clone_url, target, branch=args.base)
+
+                # Create spec branch
+                run(["git", "checkout", "-b", branch], cwd=target)
+
+                # Copy spec docs
+                dst = target / "specs" / f"{id_padded}-{args.slug}"
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                if dst.exists():
+                    shutil.rmtree(dst)
+                shutil.copytree(spec_src, dst)
+
+                # Seed tiers for app repos
+                if repo in TIER_REPOS:
+                    shutil.copy2(tiers_json, target / "tiers.json")
+                    shutil.copy2(tiers_schema, target / "tiers.schema.json")
+
+                # Commit & push (an unchanged tree still pushes the branch so the PR can be opened)
+                run(["git", "add", "."], cwd=target)
+                if run_cmd(["git", "diff", "--cached", "--quiet"], cwd=target, check=False, prefix=repo).returncode == 0:
+                    print(f"[skip] {repo}: no changes to commit")
+                else:
+                    run(["git", "-c", f"user.name={BOT_AUTHOR['name']}", "-c", f"user.email={BOT_AUTHOR['email']}",
+                         "commit", "-m", message], cwd=target)
+                run(["git", "push", "-u", "origin", branch], cwd=target, timeout=NETWORK_TIMEOUT)
 
             # Create Draft PR
             pr_url = create_pr(
@@ -139,8 +197,9 @@ def main() -> int:
                 token=token,
             )
             pr_links.append(f"{repo}: {pr_url}")
+            store.record(key, "start", fp)
 
-        except subprocess.CalledProcessError as e:
+        except CommandError as e:
             failed.append(f"{repo}: git error {e}")
         except Exception as e:
             failed.append(f"{repo}: {e}")
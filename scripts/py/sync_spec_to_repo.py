@@ -13,6 +13,8 @@ import os
 import shutil
 from pathlib import Path
 
+from fingerprints import repo_root
+
 
 def copy_tree(src: Path, dst: Path):
     dst.mkdir(parents=True, exist_ok=True)
@@ -26,14 +28,14 @@ def copy_tree(src: Path, dst: Path):
             shutil.copy2(p, target)
 
 
-def main():
+def main(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument('--spec', required=True)
     ap.add_argument('--slug', required=True)
     ap.add_argument('--repo', required=True)
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
-    root = Path(__file__).resolve().parents[2]
+    root = repo_root()
     spec_src = root / 'specs' / f"{args.spec}-{args.slug}"
     if not spec_src.exists():
         raise SystemExit(f"Spec not found: {spec_src}")
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Tiers toolkit for templates/tiers/tiers.json.
+
+- Compiles the tier ranges into a sorted interval index: priority -> tier is a bisect over range starts
+  (O(log n)), and compiling reports overlapping ranges, gaps between ranges and inverted ranges.
+- Rules (`{"from": "Essential", "to": "GameGeneral"}`) connect tier groups (the part of a tier name
+  before the first dot). They are checked for unknown groups, cycles and groups that no rule path
+  reaches from the base group(s). A plugin may depend on plugins in its own group or in any group that
+  reaches it through rules.
+- Plugin manifests ({"plugins": [{"id", "priority", "deps": [...], "tier"?}]} or a bare list) are
+  validated and ordered deterministically: topological order of deps, ties broken by tier, then
+  priority (ascending), then name. Kahn's algorithm over a heap keeps it O((n + e) log n).
+
+Usage:
+  python3 scripts/py/tiers.py check                      # validate templates/tiers/tiers.json
+  python3 scripts/py/tiers.py lookup 15010 42
+  python3 scripts/py/tiers.py order --manifest plugins.json
+  python3 scripts/py/tiers.py bench --plugins 100000
+All subcommands print JSON; check/order exit 1 when problems are found.
+"""
+import argparse
+import heapq
+import json
+import random
+import sys
+import time
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from fingerprints import repo_root
+
+ROOT = repo_root()
+DEFAULT_TIERS = ROOT / "templates" / "tiers" / "tiers.json"
+
+
+def group_of(tier: str) -> str:
+    return tier.split(".", 1)[0]
+
+
+class TierIndex:
+    def __init__(self, config: Dict):
+        self.errors: List[str] = []
+        self.overlaps: List[Dict] = []
+        self.gaps: List[Dict] = []
+        tiers = []
+        for t in config.get("tiers", []):
+            lo, hi = t["range"]
+            if lo > hi:
+                self.errors.append(f"tier {t['name']} has inverted range [{lo}, {hi}]")
+                continue
+            tiers.append((lo, hi, t["name"]))
+        tiers.sort()
+        self.starts = [t[0] for t in tiers]
+        self.ends = [t[1] for t in tiers]
+        self.names = [t[2] for t in tiers]
+        # Declaration order is the tier order used for sorting plugins
+        self.order = {t["name"]: i for i, t in enumerate(config.get("tiers", []))}
+        for i in range(1, len(tiers)):
+            prev_lo, prev_hi, prev = tiers[i - 1]
+            lo, hi, name = tiers[i]
+            if lo <= prev_hi:
+                self.overlaps.append({"tiers": [prev, name], "range": [lo, min(hi, prev_hi)]})
+            elif lo > prev_hi + 1:
+                self.gaps.append({"after": prev, "before": name, "range": [prev_hi + 1, lo - 1]})
+        self.rules = [(r["from"], r["to"]) for r in config.get("rules", [])]
+        self._check_rules()
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_TIERS) -> "TierIndex":
+        return cls(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def lookup(self, priority: int) -> Optional[str]:
+        i = bisect_right(self.starts, priority) - 1
+        if i >= 0 and priority <= self.ends[i]:
+            return self.names[i]
+        return None
+
+    def _check_rules(self) -> None:
+        groups = sorted({group_of(n) for n in self.names})
+        self.rule_errors: List[str] = []
+        edges: Dict[str, List[str]] = {g: [] for g in groups}
+        indeg = {g: 0 for g in groups}
+        for src, dst in self.rules:
+            unknown = [g for g in (src, dst) if g not in edges]
+            if unknown:
+                self.rule_errors.append(f"rule {src} -> {dst} names unknown group(s): {', '.join(unknown)}")
+                continue
+            edges[src].append(dst)
+            indeg[dst] += 1
+        # Cycle check (Kahn); whatever is left over sits on a cycle
+        deg = dict(indeg)
+        queue = [g for g in groups if deg[g] == 0]
+        seen = 0
+        while queue:
+            g = queue.pop()
+            seen += 1
+            for d in edges[g]:
+                deg[d] -= 1
+                if deg[d] == 0:
+                    queue.append(d)
+        if seen != len(groups):
+            self.rule_errors.append("rules contain a cycle through: " + ", ".join(g for g in groups if deg[g] > 0))
+        # Everything should be reachable from the base group(s) when rules are given at all
+        self.reach: Dict[str, set] = {}
+        for g in groups:
+            stack, seen_g = [g], {g}
+            while stack:
+                for d in edges[stack.pop()]:
+                    if d not in seen_g:
+                        seen_g.add(d)
+                        stack.append(d)
+            self.reach[g] = seen_g
+        roots = [g for g in groups if indeg[g] == 0]
+        if self.rules and roots:
+            base = roots[0] if len(roots) == 1 else None
+            if base is None:
+                self.rule_errors.append(f"rules have several base groups: {', '.join(roots)}")
+            else:
+                for g in groups:
+                    if g not in self.reach[base]:
+                        self.rule_errors.append(f"group {g} is not reachable from {base} through rules")
+
+    def may_depend(self, tier: str, dep_tier: str) -> bool:
+        """True when a plugin in `tier` may depend on one in `dep_tier`."""
+        return group_of(tier) in self.reach.get(group_of(dep_tier), {group_of(dep_tier)})
+
+    def report(self) -> Dict:
+        problems = self.errors + self.rule_errors + [
+            f"tiers {o['tiers'][0]} and {o['tiers'][1]} overlap on {o['range']}" for o in self.overlaps
+        ]
+        return {
+            "ok": not problems,
+            "problems": problems,
+            "tiers": [{"name": n, "range": [lo, hi]} for lo, hi, n in zip(self.starts, self.ends, self.names)],
+            "overlaps": self.overlaps,
+            "gaps": self.gaps,
+        }
+
+
+def load_manifest(path: Path) -> List[Dict]:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return data.get("plugins", []) if isinstance(data, dict) else data
+
+
+def order_plugins(index: TierIndex, plugins: List[Dict]) -> Dict:
+    """Validate a manifest and return {"ok", "order", "errors"} with a deterministic load order."""
+    errors: List[str] = []
+    by_id: Dict[str, Dict] = {}
+    tier_of: Dict[str, Optional[str]] = {}
+    for p in plugins:
+        pid = str(p.get("id") or p.get("name"))
+        if pid in by_id:
+            errors.append(f"duplicate plugin id {pid}")
+            continue
+        by_id[pid] = p
+        tier = index.lookup(int(p["priority"]))
+        if tier is None:
+            errors.append(f"{pid}: priority {p['priority']} is outside every tier")
+        elif p.get("tier") and p["tier"] != tier:
+            errors.append(f"{pid}: declared tier {p['tier']} but priority {p['priority']} is in {tier}")
+        tier_of[pid] = tier
+
+    n_tiers = len(index.order)
+
+    def key(pid: str) -> Tuple:
+        p = by_id[pid]
+        tier = tier_of[pid]
+        return (index.order.get(tier, n_tiers) if tier else n_tiers, int(p["priority"]),
+                str(p.get("name") or pid), pid)
+
+    dependents: Dict[str, List[str]] = {pid: [] for pid in by_id}
+    indeg = {pid: 0 for pid in by_id}
+    for pid, p in by_id.items():
+        for dep in p.get("deps") or []:
+            dep = str(dep)
+            if dep not in by_id:
+                errors.append(f"{pid}: unknown dependency {dep}")
+                continue
+            if tier_of[pid] and tier_of[dep] and not index.may_depend(tier_of[pid], tier_of[dep]):
+                errors.append(f"{pid} ({tier_of[pid]}) may not depend on {dep} ({tier_of[dep]})")
+            dependents[dep].append(pid)
+            indeg[pid] += 1
+
+    heap = [key(pid) for pid, d in indeg.items() if d == 0]
+    heapq.heapify(heap)
+    order: List[str] = []
+    while heap:
+        pid = heapq.heappop(heap)[-1]
+        order.append(pid)
+        for nxt in dependents[pid]:
+            indeg[nxt] -= 1
+            if indeg[nxt] == 0:
+                heapq.heappush(heap, key(nxt))
+    if len(order) != len(by_id):
+        stuck = sorted(pid for pid, d in indeg.items() if d > 0)
+        errors.append(f"dependency cycle among {len(stuck)} plugin(s): {', '.join(stuck[:20])}")
+    return {"ok": not errors, "order": order, "errors": errors}
+
+
+def synthetic_manifest(index: TierIndex, n: int, max_deps: int = 3, seed: int = 0) -> List[Dict]:
+    """n plugins spread over the tiers; deps only point at earlier plugins in allowed groups."""
+    rng = random.Random(seed)
+    tiers = list(zip(index.starts, index.ends, index.names))
+    plugins: List[Dict] = []
+    for i in range(n):
+        lo, hi, name = tiers[i * len(tiers) // n]
+        deps = []
+        if i:
+            for _ in range(rng.randint(0, max_deps)):
+                j = rng.randrange(max(0, i - 1000), i)
+                if index.may_depend(name, index.lookup(plugins[j]["priority"])):
+                    deps.append(plugins[j]["id"])
+        plugins.append({"id": f"p{i:06d}", "priority": rng.randint(lo, hi), "deps": sorted(set(deps))})
+    rng.shuffle(plugins)
+    return plugins
+
+
+def bench(index: TierIndex, n: int) -> Dict:
+    plugins = synthetic_manifest(index, n)
+    priorities = [p["priority"] for p in plugins]
+    t0 = time.perf_counter()
+    TierIndex({"tiers": [{"name": nm, "range": [lo, hi]} for lo, hi, nm in zip(index.starts, index.ends, index.names)],
+               "rules": [{"from": a, "to": b} for a, b in index.rules]})
+    t1 = time.perf_counter()
+    for pr in priorities:
+        index.lookup(pr)
+    t2 = time.perf_counter()
+    res = order_plugins(index, plugins)
+    t3 = time.perf_counter()
+    return {
+        "plugins": n,
+        "edges": sum(len(p["deps"]) for p in plugins),
+        "compile_ms": round((t1 - t0) * 1000, 3),
+        "lookup_total_ms": round((t2 - t1) * 1000, 1),
+        "lookup_ns_each": round((t2 - t1) * 1e9 / max(1, n)),
+        "order_ms": round((t3 - t2) * 1000, 1),
+        "ok": res["ok"],
+    }
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Validate tiers.json, look up tiers and order plugin manifests")
+    p.add_argument("--tiers", default=str(DEFAULT_TIERS))
+    sub = p.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("check")
+    s = sub.add_parser("lookup")
+    s.add_argument("priority", type=int, nargs="+")
+    s = sub.add_parser("order")
+    s.add_argument("--manifest", required=True)
+    s = sub.add_parser("bench")
+    s.add_argument("--plugins", type=int, default=100000)
+    args = p.parse_args(argv)
+
+    index = TierIndex.load(Path(args.tiers))
+    if args.cmd == "check":
+        result = index.report()
+        code = 0 if result["ok"] else 1
+    elif args.cmd == "lookup":
+        result, code = {str(pr): index.lookup(pr) for pr in args.priority}, 0
+    elif args.cmd == "order":
+        result = order_plugins(index, load_manifest(Path(args.manifest)))
+        code = 0 if result["ok"] else 1
+    else:
+        result, code = bench(index, args.plugins), 0
+    print(json.dumps(result, indent=2))
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Worker side of the build/test pool (scripts/py/workers.py). Standard library only: the coordinator
+streams this file to `python3 -` on the worker (over ssh, docker exec or locally) with a `JOB = ...`
+line prepended, so nothing has to be installed on worker hosts beyond git, python3 and the toolchain.
+
+For a job {repo, url, base, patch, commands, slot} it:
+  1. keeps a blobless bare mirror of the repo under ~/.lablab/worker/mirrors (fetched only when the base
+     commit is missing),
+  2. resets a persistent per-slot worktree to the base commit (ignored build outputs survive),
+  3. applies the binary diff with `git apply --index`,
+  4. runs the commands in order, streaming their output, and stops at the first failure,
+  5. prints one `@@lablab-result {json}` line with the outcome and per-step timings.
+
+Can also be run by hand: python3 scripts/py/worker_job.py job.json
+"""
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+RESULT_MARKER = "@@lablab-result "
+
+
+def sh(args, cwd=None, stdin=None):
+    print("$ " + " ".join(args), flush=True)
+    proc = subprocess.run(args, cwd=cwd, input=stdin, stdout=sys.stdout, stderr=subprocess.STDOUT)
+    if proc.returncode:
+        raise RuntimeError(f"{' '.join(args[:3])} exited with {proc.returncode}")
+
+
+def has_commit(git_dir, sha):
+    return subprocess.run(["git", "--git-dir", str(git_dir), "cat-file", "-e", f"{sha}^{{commit}}"],
+                          capture_output=True).returncode == 0
+
+
+def prepare(job, root):
+    mirror = root / "mirrors" / f"{job['repo']}.git"
+    mirror.parent.mkdir(parents=True, exist_ok=True)
+    wt = root / "wt" / f"{job['repo']}-{job.get('slot', 0)}"
+    # Slots of one host share the mirror: clone/fetch/worktree registration happen under a lock
+    with open(f"{mirror}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not mirror.exists():
+            sh(["git", "clone", "--bare", "--filter=blob:none", job["url"], str(mirror)])
+        if not has_commit(mirror, job["base"]):
+            sh(["git", "--git-dir", str(mirror), "fetch", "--prune", job["url"], "+refs/heads/*:refs/heads/*"])
+            if not has_commit(mirror, job["base"]):
+                sh(["git", "--git-dir", str(mirror), "fetch", job["url"], job["base"]])
+        if not (wt / ".git").exists():
+            subprocess.run(["git", "--git-dir", str(mirror), "worktree", "prune"], capture_output=True)
+            wt.parent.mkdir(parents=True, exist_ok=True)
+            sh(["git", "--git-dir", str(mirror), "worktree", "add", "--force", "--detach", str(wt), job["base"]])
+            return wt
+    sh(["git", "checkout", "--force", "--detach", job["base"]], cwd=wt)
+    sh(["git", "clean", "-fdq"], cwd=wt)
+    return wt
+
+
+def main(job):
+    root = Path(os.path.expanduser(job.get("work_root") or "~/.lablab/worker"))
+    result = {"id": job.get("id"), "host": os.uname().nodename, "ok": False, "steps": []}
+    started = time.monotonic()
+    try:
+        step = time.monotonic()
+        wt = prepare(job, root)
+        result["steps"].append({"step": "checkout", "seconds": round(time.monotonic() - step, 2)})
+        if job.get("patch"):
+            step = time.monotonic()
+            sh(["git", "apply", "--index", "--whitespace=nowarn", "-"], cwd=wt, stdin=job["patch"].encode("utf-8"))
+            result["steps"].append({"step": "apply", "seconds": round(time.monotonic() - step, 2)})
+        for cmd in job.get("commands") or []:
+            step = time.monotonic()
+            sh(cmd, cwd=wt)
+            result["steps"].append({"step": " ".join(cmd[:2]), "seconds": round(time.monotonic() - step, 2)})
+        result["ok"] = True
+    except (RuntimeError, OSError) as e:
+        result["error"] = str(e)
+    result["seconds"] = round(time.monotonic() - started, 2)
+    print(RESULT_MARKER + json.dumps(result), flush=True)
+    return 0 if result["ok"] else 1
+
+
+if __name__ == "__main__":
+    if "JOB" not in globals():
+        JOB = json.loads(Path(sys.argv[1]).read_text(encoding="utf-8"))
+    sys.exit(main(JOB))
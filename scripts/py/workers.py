@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Build/test worker pool over SSH.
+
+Ships a task's staged patch and base commit to registered worker hosts; each worker fetches from the
+shared mirror, applies, builds and tests (scripts/py/worker_job.py, streamed to `python3 -`), and its
+output is streamed back line by line, prefixed with the host.
+
+Hosts come from LABLAB_WORKERS (default configs/workers.json, see configs/workers.example.json):
+  {"hosts": [{"name": "mini2", "ssh": "ci@mini2.local", "slots": 2},
+             {"name": "box", "docker": "lablab-worker", "slots": 1},
+             {"name": "here", "local": true, "slots": 2}]}
+`local` and `docker` hosts are stand-ins that run the same job script without SSH, so the pool can be
+exercised (`selftest`) without remote machines.
+
+Scheduling:
+- a job goes to the queue of the least-loaded live host ((running + queued) / slots, then the host's
+  load average per CPU); a host that already built the same repo is preferred when it is within one job
+  of the least-loaded one, since its mirror and build outputs are warm;
+- each host slot takes from its own queue first and, when that is empty, steals the newest job from
+  the longest queue of another live host;
+- heartbeats (every LABLAB_WORKER_HEARTBEAT seconds, default 15) record load and liveness; a host that
+  misses two is marked down, its queue is redistributed and its running jobs are cancelled and retried
+  elsewhere (at most LABLAB_WORKER_RETRIES times, default 1).
+
+Usage:
+  python3 scripts/py/workers.py status
+  python3 scripts/py/workers.py run --cwd ./target --repo lablab-bean       # verify the staged change
+  python3 scripts/py/workers.py selftest --hosts 3 --jobs 8
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+try:
+    import worker_job
+    from build_cache import is_dotnet
+    from fingerprints import repo_root, state_dir
+    from proc_runner import CommandError, CommandTimeout, ProcessRunner
+except ImportError:  # imported as scripts.py.workers from the agents package
+    from . import worker_job
+    from .build_cache import is_dotnet
+    from .fingerprints import repo_root, state_dir
+    from .proc_runner import CommandError, CommandTimeout, ProcessRunner
+
+ROOT = repo_root()
+RESULT_MARKER = "@@lablab-result "
+DOTNET_COMMANDS = [
+    ["dotnet", "restore"],
+    ["dotnet", "build", "--configuration", "Release", "--no-restore"],
+    ["dotnet", "test", "--configuration", "Release", "--no-build", "--verbosity", "minimal"],
+]
+
+
+class Host:
+    def __init__(self, spec: Dict):
+        self.name = spec["name"]
+        self.slots = max(1, int(spec.get("slots", 1)))
+        self.work_root = spec.get("work_root")
+        if spec.get("ssh"):
+            self.prefix = ["ssh", "-o", "BatchMode=yes", "-o", "ConnectTimeout=10", spec["ssh"]]
+        elif spec.get("docker"):
+            self.prefix = ["docker", "exec", "-i", spec["docker"]]
+        elif spec.get("local"):
+            self.prefix = []
+        else:
+            raise ValueError(f"worker {self.name}: needs one of ssh, docker or local")
+        self.queue: Deque[Dict] = deque()
+        self.running: Dict[str, asyncio.Task] = {}
+        self.repos: set = set()
+        self.alive = True
+        self.misses = 0
+        self.load = 0.0
+        self.last_seen: Optional[float] = None
+
+    def pressure(self) -> tuple:
+        return ((len(self.running) + len(self.queue)) / self.slots, self.load)
+
+    def status(self) -> Dict:
+        return {"name": self.name, "alive": self.alive, "slots": self.slots, "running": sorted(self.running),
+                "queued": len(self.queue), "load_per_cpu": round(self.load, 2), "last_seen": self.last_seen}
+
+
+def load_hosts(path: Optional[Path] = None) -> List[Host]:
+    path = path or Path(os.environ.get("LABLAB_WORKERS", str(ROOT / "configs" / "workers.json")))
+    if not path.exists():
+        raise SystemExit(f"No worker config at {path} (copy configs/workers.example.json)")
+    return [Host(h) for h in json.loads(path.read_text(encoding="utf-8"))["hosts"]]
+
+
+def make_job(worktree: Path, repo: str, commands: Optional[List[List[str]]] = None) -> Dict:
+    """Job for the change staged in `worktree`: base commit, binary diff against it and the mirror URL."""
+    def git(*args: str) -> str:
+        return subprocess.run(["git", *args], cwd=worktree, capture_output=True, text=True, check=True).stdout
+    url = os.environ.get("LABLAB_WORKER_MIRROR", "").format(repo=repo) or git("remote", "get-url", "origin").strip()
+    return {"id": f"{repo}-{int(time.time() * 1000) % 10 ** 8}", "repo": repo, "url": url,
+            "base": git("rev-parse", "HEAD").strip(), "patch": git("diff", "--cached", "--binary", "HEAD"),
+            "commands": commands if commands is not None else DOTNET_COMMANDS}
+
+
+class WorkerPool:
+    def __init__(self, hosts: List[Host], heartbeat: Optional[float] = None, retries: Optional[int] = None,
+                 job_timeout: Optional[float] = None):
+        if not hosts:
+            raise ValueError("WorkerPool needs at least one host")
+        self.hosts = hosts
+        self.heartbeat = heartbeat or float(os.environ.get("LABLAB_WORKER_HEARTBEAT", "15"))
+        self.retries = int(os.environ.get("LABLAB_WORKER_RETRIES", "1")) if retries is None else retries
+        self.job_timeout = job_timeout or float(os.environ.get("LABLAB_CMD_TIMEOUT", "1800") or 0)
+        self.runner = ProcessRunner(concurrency=sum(h.slots for h in hosts) + len(hosts),
+                                    log_path=state_dir() / "logs" / "workers.log")
+        self.results: Dict[str, Dict] = {}
+        self._wake: Optional[asyncio.Condition] = None
+        # Through the loader rather than the file so the zipapp build works too
+        self._script = inspect.getsource(worker_job)
+
+    # ---- placement ----
+    def _live(self) -> List[Host]:
+        return [h for h in self.hosts if h.alive]
+
+    def place(self, job: Dict) -> Host:
+        live = self._live() or self.hosts
+        best = min(live, key=Host.pressure)
+        warm = [h for h in live if job["repo"] in h.repos and h.pressure()[0] <= best.pressure()[0] + 1 / h.slots]
+        host = min(warm, key=Host.pressure) if warm else best
+        host.queue.append(job)
+        return host
+
+    def _take(self, host: Host) -> Optional[Dict]:
+        if host.queue:
+            return host.queue.popleft()
+        victims = [h for h in self.hosts if h is not host and h.queue]
+        if not victims:
+            return None
+        victim = max(victims, key=lambda h: (not h.alive, len(h.queue)))
+        job = victim.queue.pop()
+        print(f"[workers] {host.name} stole {job['id']} from {victim.name}")
+        return job
+
+    # ---- execution ----
+    async def _execute(self, host: Host, slot: int, job: Dict) -> Dict:
+        payload = dict(job, slot=slot, work_root=host.work_root)
+        source = f"JOB = __import__('json').loads({json.dumps(payload)!r})\n{self._script}"
+        started = time.monotonic()
+        try:
+            res = await self.runner.run([*host.prefix, "python3", "-"], prefix=f"{host.name}/{job['id']}",
+                                        timeout=self.job_timeout, check=False, input=source.encode("utf-8"))
+        except (CommandTimeout, OSError) as e:
+            return {"id": job["id"], "host": host.name, "ok": False, "error": str(e)}
+        result = {"id": job["id"], "ok": False, "error": f"worker exited with {res.returncode} without a result"}
+        for line in res.stdout.splitlines():
+            if line.startswith(RESULT_MARKER):
+                result = json.loads(line[len(RESULT_MARKER):])
+        result.update(host=host.name, wall=round(time.monotonic() - started, 2), attempts=job.get("attempts", 0) + 1)
+        return result
+
+    async def _slot_loop(self, host: Host, slot: int, total: int) -> None:
+        while len(self.results) < total:
+            job = self._take(host) if host.alive else None
+            if job is None:
+                async with self._wake:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), 1.0)
+                    except asyncio.TimeoutError:
+                        pass
+                continue
+            task = asyncio.ensure_future(self._execute(host, slot, job))
+            host.running[job["id"]] = task
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                if not host.alive and job.get("attempts", 0) < self.retries:
+                    job["attempts"] = job.get("attempts", 0) + 1
+                    target = self.place(job)
+                    print(f"[workers] {host.name} is down; {job['id']} requeued on {target.name}")
+                    continue
+                if not host.alive:
+                    result = {"id": job["id"], "host": host.name, "ok": False, "error": "host went down"}
+                else:
+                    raise
+            finally:
+                host.running.pop(job["id"], None)
+            host.repos.add(job["repo"])
+            self.results[job["id"]] = result
+            async with self._wake:
+                self._wake.notify_all()
+
+    async def _ping(self, host: Host) -> None:
+        probe = [*host.prefix, "python3", "-c", "import os; print(os.getloadavg()[0] / (os.cpu_count() or 1))"]
+        try:
+            res = await self.runner.run(probe, prefix=host.name, timeout=10, quiet=True)
+            host.load = float(res.stdout.strip() or 0)
+            host.misses, host.last_seen = 0, time.time()
+            if not host.alive:
+                print(f"[workers] {host.name} is back")
+            host.alive = True
+        except (CommandError, ValueError, OSError):
+            host.misses += 1
+            # A host that never answered is down right away; a known one gets a second chance
+            if host.alive and (host.misses >= 2 or host.last_seen is None):
+                host.alive = False
+                print(f"[workers] {host.name} missed {host.misses} heartbeats; marking down")
+                while host.queue:
+                    self.place(host.queue.popleft())
+                for task in list(host.running.values()):
+                    task.cancel()
+                async with self._wake:
+                    self._wake.notify_all()
+
+    async def _heartbeats(self) -> None:
+        while True:
+            await asyncio.gather(*[self._ping(h) for h in self.hosts])
+            if not self._live():
+                # Nothing left to run queued jobs on: fail them instead of waiting forever
+                for h in self.hosts:
+                    while h.queue:
+                        job = h.queue.popleft()
+                        self.results[job["id"]] = {"id": job["id"], "host": None, "ok": False, "error": "no live workers"}
+                async with self._wake:
+                    self._wake.notify_all()
+            await asyncio.sleep(self.heartbeat)
+
+    async def run_jobs(self, jobs: List[Dict]) -> List[Dict]:
+        self._wake = asyncio.Condition()
+        self.results = {}
+        await asyncio.gather(*[self._ping(h) for h in self.hosts])
+        for job in jobs:
+            host = self.place(job)
+            print(f"[workers] {job['id']} -> {host.name}")
+        beats = asyncio.ensure_future(self._heartbeats())
+        loops = [asyncio.ensure_future(self._slot_loop(h, s, len(jobs))) for h in self.hosts for s in range(h.slots)]
+        try:
+            await asyncio.gather(*loops)
+        finally:
+            beats.cancel()
+            for t in loops:
+                t.cancel()
+            await asyncio.gather(beats, *loops, return_exceptions=True)
+        return [self.results[j["id"]] for j in jobs]
+
+    def status(self) -> List[Dict]:
+        return [h.status() for h in self.hosts]
+
+
+async def build_and_test_remote(worktree: Path, repo: str, prefix: str = "",
+                                commands: Optional[List[List[str]]] = None) -> bool:
+    """Build and test the change staged in `worktree` on the least-loaded worker."""
+    # Like verify/verify_in: the default job is the .NET build, and anything else passes
+    if commands is None and not await asyncio.to_thread(is_dotnet, worktree):
+        return True
+    job = await asyncio.to_thread(make_job, worktree, repo, commands)
+    result = (await WorkerPool(load_hosts()).run_jobs([job]))[0]
+    print(f"[workers] {f'{prefix} ' if prefix else ''}{result['id']} on {result['host']}: "
+          f"{'ok' if result['ok'] else 'FAILED'} in {result.get('wall')}s"
+          + (f" ({result['error']})" if result.get("error") else ""))
+    return result["ok"]
+
+
+def verify_remote(worktree: Path, repo: str, commands: Optional[List[List[str]]] = None) -> bool:
+    return asyncio.run(build_and_test_remote(worktree, repo, commands=commands))
+
+
+def selftest(n_hosts: int, n_jobs: int) -> Dict:
+    """Run synthetic jobs against local stand-in hosts and a throwaway mirror."""
+    tmp = Path(tempfile.mkdtemp(prefix="lablab-workers-"))
+    try:
+        origin, src = tmp / "origin.git", tmp / "src"
+        git = lambda *a, cwd=None: subprocess.run(["git", *a], cwd=cwd, check=True, capture_output=True)  # noqa: E731
+        git("init", "-q", "--bare", str(origin))
+        git("clone", "-q", str(origin), str(src))
+        (src / "app.txt").write_text("v1\n", encoding="utf-8")
+        git("add", ".", cwd=src)
+        git("-c", "user.name=selftest", "-c", "user.email=selftest@example.com", "commit", "-qm", "init", cwd=src)
+        git("push", "-q", "origin", "HEAD", cwd=src)
+        jobs = []
+        for i in range(n_jobs):
+            (src / "app.txt").write_text(f"v{i + 2}\n", encoding="utf-8")
+            git("add", ".", cwd=src)
+            job = make_job(src, "selftest", [["python3", "-c", f"import time; time.sleep({0.2 + 0.1 * (i % 3)})"],
+                                             ["grep", "-q", f"v{i + 2}", "app.txt"]])
+            job["id"] = f"job{i}"
+            jobs.append(job)
+        git("reset", "-q", "--hard", cwd=src)
+        hosts = [Host({"name": f"local{i}", "local": True, "slots": 1 + i % 2, "work_root": str(tmp / f"w{i}")})
+                 for i in range(n_hosts)]
+        started = time.monotonic()
+        results = asyncio.run(WorkerPool(hosts, heartbeat=2).run_jobs(jobs))
+        return {"ok": all(r["ok"] for r in results), "wall": round(time.monotonic() - started, 2),
+                "per_host": {h.name: sum(1 for r in results if r["host"] == h.name) for h in hosts},
+                "results": [{k: r.get(k) for k in ("id", "host", "ok", "wall", "error")} for r in results]}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Distributed build/test worker pool")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("status")
+    s = sub.add_parser("run")
+    s.add_argument("--cwd", default=".")
+    s.add_argument("--repo", required=True)
+    s = sub.add_parser("selftest")
+    s.add_argument("--hosts", type=int, default=3)
+    s.add_argument("--jobs", type=int, default=8)
+    args = p.parse_args(argv)
+    if args.cmd == "status":
+        pool = WorkerPool(load_hosts())
+        asyncio.run(asyncio.wait_for(asyncio.gather(*[pool._ping(h) for h in pool.hosts]), 30))
+        print(json.dumps(pool.status(), indent=2))
+        return 0
+    if args.cmd == "run":
+        return 0 if verify_remote(Path(args.cwd), args.repo) else 1
+    report = selftest(args.hosts, args.jobs)
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,174 @@
 #!/usr/bin/env python3
+"""
+Large files must go through LFS.
+
+Default (pre-commit): tracked files in the working tree over the threshold without the lfs filter.
+
+--pre-push: every blob the push would send, so a binary committed and later deleted is still caught
+before it lands in history. Objects of the pushed range only (`git rev-list --objects <local>
+--not <remote shas> --remotes=<remote>`) are streamed into one `git cat-file --batch-check`, and a
+single `git log --raw` over the same range names the commit that added each offender; all three are
+linear in the size of the push. LFS pointers are tiny, so any blob over the threshold was committed
+without LFS. Ranges come from git's pre-push stdin, from pre-commit's PRE_COMMIT_FROM_REF/TO_REF, or
+default to @{upstream}..HEAD.
+
+Usage:
+  python3 scripts/precommit/common/check_lfs.py                     # working tree
+  python3 scripts/precommit/common/check_lfs.py --pre-push origin   # as a git pre-push hook
+LFS_THRESHOLD_BYTES overrides the 5 MB threshold.
+"""
+import argparse
 import os
 import subprocess
 import sys
 
 THRESHOLD_BYTES = int(os.environ.get('LFS_THRESHOLD_BYTES', str(5 * 1024 * 1024)))
+FIX = 'Fix: git lfs track <pattern> and commit .gitattributes; then re-add files.'
+
 
 def git_ls_files():
     out = subprocess.check_output(['git', 'ls-files', '-z'])
     return out.decode('utf-8', 'ignore').split('\x00')[:-1]
 
+
 def file_size(path):
     try:
         return os.path.getsize(path)
     except OSError:
         return 0
 
-def has_lfs(path):
-    try:
-        out = subprocess.check_output(['git', 'check-attr', 'filter', '--', path])
-        return b'lfs' in out
-    except subprocess.CalledProcessError:
-        return False
-
-large_not_lfs = []
-for f in git_ls_files():
-    if not os.path.isfile(f):
-        continue
-    sz = file_size(f)
-    if sz >= THRESHOLD_BYTES and not has_lfs(f):
-        large_not_lfs.append((f, sz))
-
-if large_not_lfs:
-    print('Large files not tracked by LFS (threshold={} MB):'.format(THRESHOLD_BYTES // (1024*1024)))
-    for f, sz in large_not_lfs:
-        print('  {:>8.2f} MB  {}'.format(sz / (1024*1024), f))
-    print('\nFix: git lfs track <pattern> and commit .gitattributes; then re-add files.')
-    sys.exit(1)
-
-print('LFS check OK')
+
+def lfs_paths(paths):
+    """Subset of `paths` with the lfs filter attribute, from one batched `git check-attr --stdin`."""
+    if not paths:
+        return set()
+    out = subprocess.run(['git', 'check-attr', '-z', '--stdin', 'filter'], input='\0'.join(paths).encode('utf-8'),
+                         capture_output=True).stdout.decode('utf-8', 'ignore').split('\0')
+    return {out[i] for i in range(0, len(out) - 2, 3) if out[i + 2] == 'lfs'}
+
+
+def check_worktree():
+    sizes = ((f, file_size(f)) for f in git_ls_files() if os.path.isfile(f))
+    large = [(f, sz) for f, sz in sizes if sz >= THRESHOLD_BYTES]
+    tracked = lfs_paths([f for f, _ in large])
+    return [(f, sz) for f, sz in large if f not in tracked]
+
+
+def push_ranges(remote):
+    """(includes, excludes) commit lists for the refs being pushed."""
+    includes, excludes, from_git = [], [], False
+    if not sys.stdin.isatty():
+        for line in sys.stdin:
+            parts = line.split()
+            if len(parts) != 4:
+                continue
+            from_git = True
+            _, local_sha, _, remote_sha = parts
+            if local_sha.strip('0') == '':
+                continue  # branch deletion sends nothing
+            includes.append(local_sha)
+            if remote_sha.strip('0') != '':
+                excludes.append(remote_sha)
+    if not from_git:
+        to_ref = os.environ.get('PRE_COMMIT_TO_REF') or os.environ.get('PRE_COMMIT_ORIGIN') or 'HEAD'
+        from_ref = os.environ.get('PRE_COMMIT_FROM_REF') or os.environ.get('PRE_COMMIT_SOURCE')
+        if not from_ref and remote is None:
+            upstream = subprocess.run(['git', 'rev-parse', '--verify', '-q', '@{upstream}'],
+                                      capture_output=True, text=True).stdout.strip()
+            from_ref = upstream or None
+        includes.append(to_ref)
+        if from_ref:
+            excludes.append(from_ref)
+    return includes, excludes
+
+
+def rev_args(includes, excludes, remote):
+    args = includes + ['^' + sha for sha in excludes]
+    if remote:
+        # Anything already on the remote (e.g. the base of a new branch) is not re-sent
+        args += ['--not', f'--remotes={remote}']
+    return args
+
+
+def large_blobs(revs):
+    """{blob sha: (size, path)} for blobs over the threshold, from rev-list piped into one cat-file."""
+    rev_list = subprocess.Popen(['git', 'rev-list', '--objects', *revs], stdout=subprocess.PIPE)
+    cat_file = subprocess.Popen(['git', 'cat-file', '--batch-check=%(objecttype) %(objectname) %(objectsize) %(rest)'],
+                                stdin=rev_list.stdout, stdout=subprocess.PIPE)
+    rev_list.stdout.close()  # cat-file owns the pipe now
+    found = {}
+    for line in cat_file.stdout:
+        kind, sha, size, path = (line.decode('utf-8', 'replace').rstrip('\n').split(' ', 3) + [''])[:4]
+        if kind == 'blob' and int(size) >= THRESHOLD_BYTES and sha not in found:
+            found[sha] = (int(size), path)
+    cat_file.wait()
+    if rev_list.wait() != 0:
+        raise SystemExit('git rev-list failed for the pushed range')
+    return found
+
+
+def introducing_commits(revs, blobs):
+    """{blob sha: short commit} of the commit in the range whose diff adds or changes to that blob."""
+    log = subprocess.Popen(['git', 'log', '--raw', '--no-abbrev', '--no-renames', '--format=@%H', *revs],
+                           stdout=subprocess.PIPE)
+    commits, current = {}, '?'
+    for line in log.stdout:
+        line = line.decode('utf-8', 'replace')
+        if line.startswith('@'):
+            current = line[1:12]
+        elif line.startswith(':'):
+            dst = line.split()[3]
+            if dst in blobs:
+                commits[dst] = current  # log is newest first: the last hit is the oldest commit
+    log.wait()
+    return commits
+
+
+def check_push(remote):
+    includes, excludes = push_ranges(remote)
+    if not includes:
+        return []  # only deletions
+    revs = rev_args(includes, excludes, remote)
+    blobs = large_blobs(revs)
+    if not blobs:
+        return []
+    commits = introducing_commits(revs, blobs)
+    tracked = lfs_paths(sorted({path for _, path in blobs.values() if path}))
+    return [(path or sha, size, commits.get(sha, '?'), path in tracked)
+            for sha, (size, path) in sorted(blobs.items(), key=lambda kv: -kv[1][0])]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Fail when large files bypass Git LFS')
+    ap.add_argument('--pre-push', action='store_true', help='check every blob in the pushed commit range')
+    ap.add_argument('remote', nargs='?', default=None, help='remote name (passed by git to pre-push hooks)')
+    ap.add_argument('url', nargs='?', default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+    mb = THRESHOLD_BYTES // (1024 * 1024)
+
+    if args.pre_push:
+        offenders = check_push(args.remote or os.environ.get('PRE_COMMIT_REMOTE_NAME'))
+        if offenders:
+            print('Pushed commits add large blobs not stored in LFS (threshold={} MB):'.format(mb))
+            for path, sz, commit, lfs_attr in offenders:
+                note = '  (matches an lfs pattern but was committed without LFS)' if lfs_attr else ''
+                print('  {:>8.2f} MB  {}  {}{}'.format(sz / (1024 * 1024), commit, path, note))
+            print('\nThe blobs stay in history even if the files were deleted later: rewrite the commits\n'
+                  '(git lfs migrate import --include=<pattern> <range>) before pushing.')
+            return 1
+        print('LFS pre-push check OK')
+        return 0
+
+    large_not_lfs = check_worktree()
+    if large_not_lfs:
+        print('Large files not tracked by LFS (threshold={} MB):'.format(mb))
+        for f, sz in large_not_lfs:
+            print('  {:>8.2f} MB  {}'.format(sz / (1024 * 1024), f))
+        print('\n' + FIX)
+        return 1
+    print('LFS check OK')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
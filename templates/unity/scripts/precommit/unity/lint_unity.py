@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Single-pass Unity lint runner.
+
+Builds one in-memory inventory of the repo and runs every registered check against it in parallel:
+- tracked files from `git ls-files -z` with their sizes and `filter` attribute (one batched
+  `git check-attr --stdin`, not one process per file)
+- one walk of Assets/ (tracked or not, since Unity writes .meta files next to new assets)
+- file contents read on demand and cached
+
+Checks are plain functions registered with @check(name); they get the Inventory and return a list of
+problem lines (empty = pass). Extra checks are loaded from scripts/precommit/unity/lint_checks/*.py
+(or --plugins DIR); those modules import `check` from lint_unity and register themselves.
+
+Usage:
+  python3 scripts/precommit/unity/lint_unity.py               # all checks, text report
+  python3 scripts/precommit/unity/lint_unity.py --only meta-pairs,lfs --json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+SKIP_DIRS = ('Library', 'Temp', 'Logs', 'Build')
+THRESHOLD_BYTES = int(os.environ.get('LFS_THRESHOLD_BYTES', str(5 * 1024 * 1024)))
+EDITOR_SETTINGS = 'ProjectSettings/EditorSettings.asset'
+
+CHECKS = {}
+
+
+def check(name, hint=''):
+    def register(fn):
+        CHECKS[name] = {'fn': fn, 'hint': hint}
+        return fn
+    return register
+
+
+class Inventory:
+    def __init__(self, root='.'):
+        self.root = Path(root)
+        self.tracked = {}   # path -> size in bytes (None when missing from the working tree)
+        self.filters = {}   # path -> git `filter` attribute value
+        self.assets = {}    # dir relative to root -> (subdir names, file names)
+        self._text = {}
+        self._lock = threading.Lock()
+
+    def build(self):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            walk = pool.submit(self._walk_assets)
+            self._load_tracked()
+            walk.result()
+        return self
+
+    def _load_tracked(self):
+        try:
+            out = subprocess.check_output(['git', 'ls-files', '-z'], cwd=self.root)
+        except (OSError, subprocess.CalledProcessError):
+            return
+        paths = [p for p in out.decode('utf-8', 'ignore').split('\x00') if p]
+        for p in paths:
+            try:
+                self.tracked[p] = os.stat(self.root / p).st_size
+            except OSError:
+                self.tracked[p] = None
+        if not paths:
+            return
+        # One check-attr process for every path; output is NUL-separated path, attr, value triples
+        proc = subprocess.run(['git', 'check-attr', '-z', '--stdin', 'filter'], cwd=self.root,
+                              input=('\x00'.join(paths) + '\x00').encode('utf-8'), capture_output=True)
+        fields = proc.stdout.decode('utf-8', 'ignore').split('\x00')
+        for i in range(0, len(fields) - 2, 3):
+            self.filters[fields[i]] = fields[i + 2]
+
+    def _walk_assets(self):
+        assets = self.root / 'Assets'
+        for base, dirs, files in os.walk(assets):
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+            rel = os.path.relpath(base, self.root)
+            self.assets[rel] = (list(dirs), list(files))
+
+    def text(self, path):
+        with self._lock:
+            if path not in self._text:
+                try:
+                    self._text[path] = (self.root / path).read_text(encoding='utf-8', errors='ignore')
+                except OSError:
+                    self._text[path] = None
+            return self._text[path]
+
+
+@check('meta-pairs', 'In Unity, reimport the folder or right-click -> Reimport to regenerate .meta files; '
+                     'delete or correct orphan metas.')
+def check_meta_pairs(inv):
+    missing, orphan = [], []
+    for base, (dirs, files) in sorted(inv.assets.items()):
+        names = set(files)
+        for f in files:
+            if f.endswith('.meta'):
+                stem = f[:-5]
+                # Folder metas pair with a directory, not a file
+                if stem not in names and stem not in dirs:
+                    orphan.append(os.path.join(base, f))
+            elif f + '.meta' not in names:
+                missing.append(os.path.join(base, f + '.meta'))
+    return ([f'missing .meta: {p}' for p in missing] + [f'orphan .meta: {p}' for p in orphan])
+
+
+@check('editor-settings', 'Open Unity: Edit > Project Settings > Editor\n- Asset Serialization: Force Text\n'
+                          '- Version Control: Visible Meta Files')
+def check_editor_settings(inv):
+    content = inv.text(EDITOR_SETTINGS)
+    if content is None:
+        return []
+    errs = []
+    if 'm_SerializationMode: 2' not in content:
+        errs.append('EditorSettings: m_SerializationMode should be 2 (Force Text).')
+    if 'Visible Meta Files' not in content:
+        errs.append('EditorSettings: Version control should be "Visible Meta Files".')
+    return errs
+
+
+@check('lfs', 'git lfs track <pattern> and commit .gitattributes; then re-add files.')
+def check_lfs(inv):
+    errs = []
+    for path, size in sorted(inv.tracked.items()):
+        if size is not None and size >= THRESHOLD_BYTES and inv.filters.get(path) != 'lfs':
+            errs.append('{} ({:.2f} MB) is not LFS-tracked'.format(path, size / (1024 * 1024)))
+    return errs
+
+
+def load_plugins(directory):
+    directory = Path(directory)
+    if not directory.is_dir():
+        return
+    sys.modules.setdefault('lint_unity', sys.modules[__name__])
+    for path in sorted(directory.glob('*.py')):
+        spec = importlib.util.spec_from_file_location(f'lint_checks.{path.stem}', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+
+def run_checks(inv, names):
+    def timed(name):
+        started = time.perf_counter()
+        try:
+            problems = CHECKS[name]['fn'](inv)
+        except Exception as e:  # a broken plugin fails its own check, not the whole run
+            problems = [f'check crashed: {e!r}']
+        return {'check': name, 'ok': not problems, 'problems': problems,
+                'hint': CHECKS[name]['hint'] if problems else '',
+                'ms': round((time.perf_counter() - started) * 1000, 1)}
+
+    with ThreadPoolExecutor(max_workers=max(1, len(names))) as pool:
+        return list(pool.map(timed, names))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Run all Unity lint checks over one shared file inventory')
+    ap.add_argument('--only', default=None, help='comma-separated check names')
+    ap.add_argument('--plugins', default=str(Path(__file__).resolve().parent / 'lint_checks'))
+    ap.add_argument('--json', action='store_true')
+    args = ap.parse_args(argv)
+
+    load_plugins(args.plugins)
+    names = [n.strip() for n in args.only.split(',')] if args.only else list(CHECKS)
+    unknown = [n for n in names if n not in CHECKS]
+    if unknown:
+        ap.error(f'unknown check(s): {", ".join(unknown)}; available: {", ".join(CHECKS)}')
+
+    started = time.perf_counter()
+    inv = Inventory().build()
+    inventory_ms = round((time.perf_counter() - started) * 1000, 1)
+    results = run_checks(inv, names)
+    report = {
+        'ok': all(r['ok'] for r in results),
+        'inventory_ms': inventory_ms,
+        'tracked_files': len(inv.tracked),
+        'asset_dirs': len(inv.assets),
+        'checks': results,
+        'total_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for r in results:
+            print(f"[{'OK' if r['ok'] else 'FAIL'}] {r['check']} ({r['ms']} ms)")
+            for p in r['problems']:
+                print(f'    {p}')
+            if r['hint']:
+                print('    Fix: ' + r['hint'].replace('\n', '\n    '))
+        print(f"\ninventory: {report['tracked_files']} tracked files, {report['asset_dirs']} Assets dirs "
+              f"in {inventory_ms} ms; total {report['total_ms']} ms")
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())